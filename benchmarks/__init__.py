@@ -0,0 +1,5 @@
+"""
+Reproducible benchmarks of the framework on synthetic data and a local Polygon.io stand-in.
+
+Run from the repository root with `python -m benchmarks.run`, see `benchmarks/run.py` for the options.
+"""
@@ -0,0 +1,196 @@
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import MARKET_EPOCH, generate_bars, generate_grouped_daily, ticker_seed
+
+AGGS_PATH = re.compile(r'^/v2/aggs/ticker/(?P<ticker>[^/]+)/range/(?P<multiplier>\d+)/(?P<timespan>\w+)/(?P<start>[^/]+)/(?P<end>[^/]+)$')
+SNAPSHOT_PATH = re.compile(r'^/v2/snapshot/locale/(?:us/markets/stocks|global/markets/crypto)/tickers(?:/(?P<ticker>[^/]+))?$')
+GROUPED_PATH = re.compile(r'^/v2/aggs/grouped/locale/(?:us/market/stocks|global/market/(?P<crypto>crypto))/(?P<date>\d{4}-\d{2}-\d{2})$')
+
+TIMESPAN_FREQUENCIES = {'minute': 'min', 'hour': 'h', 'day': 'D', 'week': 'W', 'month': 'MS', 'quarter': 'QS', 'year': 'YS'}
+
+
+class PolygonStub:
+    """
+    A local stand-in for the Polygon.io endpoints used by `FetchData` and `WatchlistItem`, serving deterministic
+    synthetic data (see `generate_bars`) over HTTP. Point a FetchData or a Watchlist at `base_url` to run them
+    without an API key or network access.
+
+    Served endpoints:
+    - /v2/aggs/ticker/{ticker}/range/{multiplier}/{timespan}/{from}/{to}: The bars between the two dates (both
+      inclusive), up to the `limit` query parameter.
+    - /v2/snapshot/locale/us/markets/stocks/tickers/{ticker} and the crypto equivalent: A single ticker snapshot.
+    - /v2/snapshot/locale/us/markets/stocks/tickers?tickers=A,B and the crypto equivalent: Several snapshots.
+    - /v2/aggs/grouped/locale/us/market/stocks/{date} and the crypto equivalent: The daily bars of a synthetic
+      market of `universe` tickers on a date (see `generate_grouped_daily`).
+
+    Attributes:
+    - latency (float): Seconds every request is delayed by before it is answered.
+    - fail_every (int): If set, every n-th request is answered with a 429 and a `Retry-After` header.
+    - retry_after (int): The `Retry-After` value of the 429 responses, in seconds.
+    - seed (int): Seed shared by all tickers' data; the same seed always serves the same data.
+    - universe (int): The number of tickers of the grouped daily endpoint's market.
+    - requests (dict): The number of requests received by endpoint ('aggs', 'snapshot', 'snapshots', 'grouped', 'unknown')
+      plus 'rate_limited' for the requests answered with a 429.
+
+    Methods:
+    - start(): Starts serving on a free local port in a background thread.
+    - stop(): Stops serving.
+    - reset(): Resets the request counters.
+    """
+    def __init__(self, latency=0.0, fail_every=None, retry_after=0, seed=0, port=0, universe=8000):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.retry_after = retry_after
+        self.seed = seed
+        self.port = port
+        self.universe = universe
+        self.requests = {}
+        self._received = 0
+        self._lock = threading.Lock()
+        self._bodies = {}
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self._server.server_address[1]}'
+
+    def start(self):
+        self._server = ThreadingHTTPServer(('127.0.0.1', self.port), _StubHandler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def reset(self):
+        with self._lock:
+            self.requests = {}
+            self._received = 0
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def respond(self, path, query):
+        """
+        Returns the (status code, headers, body) of a request, counting it and applying the configured failures.
+        """
+        with self._lock:
+            self._received += 1
+            rate_limited = bool(self.fail_every) and self._received % self.fail_every == 0
+            if rate_limited:
+                self.requests['rate_limited'] = self.requests.get('rate_limited', 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+        if rate_limited:
+            return 429, {'Retry-After': str(self.retry_after)}, b'{"status":"ERROR","error":"You\'ve exceeded the maximum requests per minute."}'
+
+        match = AGGS_PATH.match(path)
+        if match:
+            self._count('aggs')
+            return 200, {}, self._aggs_body(**match.groupdict(), limit=int(query.get('limit', ['5000'])[0]))
+
+        match = SNAPSHOT_PATH.match(path)
+        if match and match.group('ticker'):
+            self._count('snapshot')
+            return 200, {}, json.dumps({'status': 'OK', 'ticker': self.snapshot(match.group('ticker'))}).encode()
+        if match:
+            self._count('snapshots')
+            tickers = [ticker for ticker in query.get('tickers', [''])[0].split(',') if ticker]
+            return 200, {}, json.dumps({'status': 'OK', 'count': len(tickers), 'tickers': [self.snapshot(ticker) for ticker in tickers]}).encode()
+
+        match = GROUPED_PATH.match(path)
+        if match:
+            self._count('grouped')
+            return 200, {}, self._grouped_body(match.group('date'), 'Crypto' if match.group('crypto') else 'Stock')
+
+        self._count('unknown')
+        return 404, {}, json.dumps({'status': 'NOT_FOUND', 'message': f'Unknown endpoint {path}'}).encode()
+
+    def bars(self, ticker, multiplier, timespan, start, end, limit=50000):
+        """Returns the synthetic bars of a range request as a DataFrame."""
+        freq = f'{int(multiplier)}{TIMESPAN_FREQUENCIES[timespan]}'
+        start, end = max(pd.Timestamp(start), MARKET_EPOCH), pd.Timestamp(end) + pd.Timedelta(days=1)
+        # Slices of one path per ticker and timeframe, so overlapping requests receive the same bars
+        return generate_bars(ticker, freq, start, end, self.seed).iloc[:limit]
+
+    def snapshot(self, ticker):
+        """Returns the synthetic snapshot of a ticker, shaped like Polygon.io's ticker snapshots."""
+        rng = np.random.default_rng(ticker_seed(ticker, self.seed))
+        price = float(np.round(rng.uniform(5, 500), 2))
+        now = pd.Timestamp.now(tz='UTC').tz_localize(None)
+        minute = now.floor('min') - pd.Timedelta(minutes=1)
+        return {'ticker': ticker,
+                'min': {'o': price, 'h': price, 'l': price, 'c': price, 'v': 100, 't': minute.value // 10 ** 6},
+                'lastTrade': {'p': price, 's': 100, 't': now.value},
+                'day': {'o': price, 'h': price, 'l': price, 'c': price, 'v': 10000},
+                'updated': now.value}
+
+    def _aggs_body(self, ticker, multiplier, timespan, start, end, limit):
+        key = (ticker, multiplier, timespan, start, end, limit)
+        if key not in self._bodies:
+            if timespan not in TIMESPAN_FREQUENCIES:
+                return json.dumps({'status': 'ERROR', 'error': f'Unknown timespan {timespan}'}).encode()
+            df = self.bars(ticker, multiplier, timespan, start, end, limit)
+            results = pd.DataFrame({'v': df['volume'], 'vw': df['vw'], 'o': df['open'], 'c': df['close'], 'h': df['high'],
+                                    'l': df['low'], 't': df.index.as_unit('ms').asi8, 'n': df['n']}).to_dict('records')
+            # Encoding large responses dominates the stub's own time, so bodies are kept for repeated requests
+            self._bodies[key] = json.dumps({'ticker': ticker, 'status': 'OK', 'resultsCount': len(results), 'results': results}).encode()
+        return self._bodies[key]
+
+    def _grouped_body(self, date, asset_type):
+        key = ('grouped', date, asset_type)
+        if key not in self._bodies:
+            date = pd.Timestamp(date)
+            df = generate_grouped_daily(date, self.universe, asset_type, self.seed) if date >= MARKET_EPOCH else pd.DataFrame()
+            results = []
+            if not df.empty:
+                # Polygon.io stamps daily bars with the start of the day in the market's time zone
+                start = date.tz_localize('UTC' if asset_type == 'Crypto' else 'America/New_York').value // 10 ** 6
+                results = pd.DataFrame({'T': df.index, 'v': df['volume'], 'vw': df['vw'], 'o': df['open'], 'c': df['close'],
+                                        'h': df['high'], 'l': df['low'], 't': start, 'n': df['n']})
+            # A market-wide date is large, so its results are encoded by pandas rather than json
+            encoded = results.to_json(orient='records', double_precision=15) if len(results) else '[]'
+            self._bodies[key] = (f'{{"status":"OK","queryCount":{len(results)},"resultsCount":{len(results)},"adjusted":true,'
+                                 f'"results":{encoded}}}').encode()
+        return self._bodies[key]
+
+    def _count(self, endpoint):
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so the pooled sessions of FetchData reuse their connections as they would against the real API
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        status, headers, body = self.server.stub.respond(url.path, parse_qs(url.query))
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
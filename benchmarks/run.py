@@ -0,0 +1,327 @@
+"""
+Runs the benchmark scenarios and writes their timings as JSON.
+
+Usage, from the repository root:
+
+    python -m benchmarks.run [--output results.json] [--baseline previous.json] [--quick] [--tickers 1 50 500]
+
+Every scenario runs on synthetic data (see `benchmarks/synthetic.py`), and everything that talks to Polygon.io
+talks to a local stand-in instead (see `benchmarks/polygon_stub.py`), so results are reproducible and only
+depend on the code and the machine. Compare two result files with `--baseline` to spot regressions.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pandas_ta as ta
+import vectorbt as vbt
+
+from benchmarks.polygon_stub import PolygonStub
+from benchmarks.synthetic import generate_ticker, synthetic_tickers
+from cache import default_cache
+from data_extract import FetchData
+from framework import TradingFramework
+from panel import MarketPanel
+from resample import build_timeframes
+from scanner import MarketScanner
+from signals import Signal, SignalGroup
+from specs import SignalSpec
+from watchlist import Watchlist
+
+TIMEFRAMES = ['1h', '4h', '1D']
+
+# Last date of the market the scanner scenarios ingest, fixed so runs ingest the same dates
+SCAN_END = '2024-12-31'
+
+# Slowdowns beyond this fraction of the baseline's median are reported as regressions
+REGRESSION_THRESHOLD = 0.2
+
+
+def benchmark_strategy(name):
+    """Returns a strategy with the indicators of `scoring.ipynb`, parametrized to produce the columns its signals read."""
+    return ta.Strategy(name=f'{name} Benchmark Strategy', ta=[
+        {'kind': 'sma', 'length': 10},
+        {'kind': 'ema', 'length': 10},
+        {'kind': 'macd', 'fast': 12, 'slow': 26, 'signal': 9},
+        {'kind': 'rsi', 'length': 14},
+        {'kind': 'ichimoku'},
+        {'kind': 'bbands', 'length': 5, 'std': 2},
+        {'kind': 'adx'},
+        {'kind': 'stoch', 'k': 14, 'd': 3},
+    ])
+
+
+def evaluate_adx(df):
+    adx = df['ADX_14'].iloc[-1] if 'ADX_14' in df else np.nan
+    if adx > 25:
+        return 'positive'
+    elif adx < 20:
+        return 'negative'
+    return 'neutral'
+
+
+def benchmark_signal_groups():
+    """Returns the signal groups of `scoring.ipynb`, as SignalSpecs plus one Python callable."""
+    trend = SignalGroup('Trend')
+    trend.add_signal(Signal('SMA', SignalSpec('close', 'SMA_10')))
+    trend.add_signal(Signal('EMA', SignalSpec('close', 'EMA_10')))
+    trend.add_signal(Signal('Ichimoku', SignalSpec('close', 'ISA_9', inverted=True)))
+    trend.add_signal(Signal('ADX', evaluate_adx, columns=['ADX_14']))
+
+    momentum = SignalGroup('Momentum')
+    momentum.add_signal(Signal('RSI', SignalSpec('RSI_14', threshold_up=50, threshold_down=30)))
+    momentum.add_signal(Signal('MACD', SignalSpec('MACD_12_26_9', 'MACDs_12_26_9')))
+    momentum.add_signal(Signal('Stochastic', SignalSpec('STOCHk_14_3_3', threshold_up=80, threshold_down=20, inverted=True)))
+
+    structure = SignalGroup('Price Structure')
+    structure.add_signal(Signal('Bollinger Bands', SignalSpec('close', 'BBU_5_2.0')))
+    return [trend, momentum, structure]
+
+
+def build_framework(ticker, bars, asset_type='Crypto'):
+    """Builds a framework like the one of `scoring.ipynb` on `bars` synthetic hourly bars of a ticker."""
+    framework = TradingFramework(ticker, timeframes={}, active_time_frame='1h', bias_timeframes=['1D'], confirmation_timeframes=['4h'])
+    base = generate_ticker(ticker, bars, '1h', start='2022-01-03')
+    groups = benchmark_signal_groups()
+    for name, data in build_timeframes(base, TIMEFRAMES, asset_type).items():
+        framework.add_timeframe(name, data, benchmark_strategy(name))
+        for group in groups:
+            framework.add_signal_group_to_timeframe(name, group)
+    return framework
+
+
+def build_watchlist(count, bars, base_url):
+    """Builds a watchlist of `count` synthetic tickers, alternating stocks and crypto, each with a framework."""
+    watchlist = Watchlist('benchmark', base_url=base_url)
+    stocks = synthetic_tickers((count + 1) // 2, 'Stock')
+    cryptos = synthetic_tickers(count // 2, 'Crypto')
+    for ticker, asset_type in [(ticker, 'Stock') for ticker in stocks] + [(ticker, 'Crypto') for ticker in cryptos]:
+        watchlist.add_item(ticker, ticker, asset_type, framework=build_framework(ticker, bars, asset_type))
+    return watchlist
+
+
+@contextlib.contextmanager
+def quiet(verbose=False):
+    """Silences the progress output of the framework while timing, unless `verbose`."""
+    if verbose:
+        yield
+    else:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+
+
+class BenchmarkRunner:
+    """
+    Times scenarios and collects their results.
+
+    Attributes:
+    - repeat (int): How often each scenario is timed.
+    - verbose (bool): If True, the output of the timed code is shown.
+    - results (list): One record per scenario with its name, parameters and timings in seconds.
+    """
+    def __init__(self, repeat=3, verbose=False):
+        self.repeat = repeat
+        self.verbose = verbose
+        self.results = []
+
+    def measure(self, name, function, setup=None, repeat=None, warmup=False, **params):
+        """
+        Times `function` `repeat` times and records the median, min and max.
+
+        Parameters:
+        - name (str): The scenario's name, e.g. 'framework.backtest'.
+        - function (callable): The code to time. Called with the result of `setup`, if one is given.
+        - setup (callable, optional): Untimed preparation run before every repetition.
+        - repeat (int, optional): Overrides the runner's repeat count.
+        - warmup (bool, optional): If True, runs the scenario once untimed first, so one-time costs such as
+          Numba compilation or the stand-in generating its responses are left out.
+        - params: Parameters of the scenario recorded with the result, e.g. tickers=50.
+
+        Returns:
+        dict: The recorded result.
+        """
+        timings = []
+        if warmup:
+            with quiet(self.verbose):
+                function(setup()) if setup else function()
+        for _ in range(repeat or self.repeat):
+            with quiet(self.verbose):
+                state = setup() if setup else None
+                started = time.perf_counter()
+                function(state) if setup else function()
+                timings.append(time.perf_counter() - started)
+
+        result = {'name': name, 'params': params, 'repeat': len(timings), 'median': float(np.median(timings)),
+                  'min': float(np.min(timings)), 'max': float(np.max(timings))}
+        self.results.append(result)
+        print(f"{name:<40} {_format_params(params):<36} median {result['median']:9.4f}s  min {result['min']:9.4f}s")
+        return result
+
+
+def fetch_scenarios(runner, latency, tickers):
+    with PolygonStub(latency=latency) as stub:
+        fetcher = FetchData('benchmark', base_url=stub.base_url, backoff=0)
+        runner.measure('fetch_data', lambda: fetcher.fetch_data('SYN0000', 'day'), timespan='day', latency=latency, warmup=True)
+        runner.measure('fetch_data', lambda: fetcher.fetch_data('SYN0000', 'minute', 30), timespan='minute', multiplier=30, latency=latency, warmup=True)
+        runner.measure('fetch_data', lambda: fetcher.fetch_data('SYN0000', 'minute'), timespan='minute', latency=latency, warmup=True)
+
+        stub.fail_every = 2
+        runner.measure('fetch_data', lambda: fetcher.fetch_data('SYN0000', 'day'), timespan='day', latency=latency, rate_limited='every 2nd request', warmup=True)
+        stub.fail_every = None
+
+        for count in tickers:
+            series = [(ticker, 'day', 1) for ticker in synthetic_tickers(count)]
+            runner.measure('fetch_many', lambda: fetcher.fetch_many(series), timespan='day', tickers=count, latency=latency, warmup=True)
+
+
+def framework_scenarios(runner, bars):
+    with quiet(runner.verbose):
+        framework = build_framework('SYN0000', bars)
+
+    def apply_all():
+        for name in framework.timeframes:
+            framework.apply_strategy(name)
+
+    runner.measure('framework.apply_strategy', apply_all, bars=bars, timeframes=len(TIMEFRAMES))
+
+    def cold():
+        default_cache.clear()
+        return framework
+
+    runner.measure('framework.evaluate_all_timeframes', lambda framework: framework.evaluate_all_timeframes(), setup=cold, bars=bars, cache='cold')
+    runner.measure('framework.evaluate_all_timeframes', framework.evaluate_all_timeframes, bars=bars, cache='warm')
+    runner.measure('framework.backtest', lambda framework: framework.backtest(), setup=cold, warmup=True, bars=bars, cache='cold')
+
+
+def watchlist_scenarios(runner, tickers, bars, latency, workers):
+    with PolygonStub(latency=latency) as stub:
+        for count in tickers:
+            with quiet(runner.verbose):
+                started = time.perf_counter()
+                watchlist = build_watchlist(count, bars, stub.base_url)
+                # Computes every framework's indicators, so the timed evaluations only measure the evaluation
+                watchlist.evaluate_frameworks()
+                prepared = time.perf_counter() - started
+            print(f"{'watchlist.prepare':<40} {_format_params({'tickers': count}):<36} took   {prepared:9.4f}s")
+
+            def cold():
+                default_cache.clear()
+                return watchlist
+
+            runner.measure('watchlist.update_prices', lambda: watchlist.update_prices(batch=True), tickers=count, batch=True, latency=latency)
+            runner.measure('watchlist.update_prices', lambda: watchlist.update_prices(batch=False), tickers=count, batch=False, latency=latency)
+            runner.measure('watchlist.evaluate_frameworks', lambda watchlist: watchlist.evaluate_frameworks(), setup=cold, tickers=count, bars=bars, workers=1)
+            if workers > 1 and count > 1:
+                runner.measure('watchlist.evaluate_frameworks', lambda watchlist: watchlist.evaluate_frameworks(workers=workers), setup=cold, tickers=count, bars=bars, workers=workers)
+            runner.measure('watchlist.perform_backtests', lambda watchlist: watchlist.perform_backtests(), setup=cold, warmup=True, tickers=count, bars=bars, workers=1)
+            runner.measure('watchlist.portfolio_backtest', lambda watchlist: watchlist.portfolio_backtest(), setup=cold, warmup=True, tickers=count, bars=bars)
+
+
+def scanner_scenarios(runner, universe, days, latency):
+    with PolygonStub(latency=latency, universe=universe) as stub:
+        fetcher = FetchData('benchmark', base_url=stub.base_url, backoff=0)
+        runner.measure('panel.update', lambda panel: panel.update(fetcher, end=SCAN_END, days=days), setup=MarketPanel,
+                       warmup=True, universe=universe, days=days, latency=latency)
+
+        panel = MarketPanel()
+        panel.update(fetcher, end=SCAN_END, days=days)
+        with quiet(runner.verbose):
+            scanner = MarketScanner(build_framework('SYN0000', 500, 'Stock'))
+        runner.measure('scanner.scan', lambda: scanner.scan(panel), warmup=True, universe=universe, days=days,
+                       eligible=len(scanner.eligible(panel)))
+
+
+def environment():
+    """Returns the versions and machine details recorded with the results."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'timestamp': pd.Timestamp.now(tz='UTC').isoformat(), 'commit': commit, 'python': sys.version.split()[0],
+            'platform': platform.platform(), 'processor': platform.processor(), 'cpus': os.cpu_count(),
+            'numpy': np.__version__, 'pandas': pd.__version__, 'vectorbt': vbt.__version__,
+            'pandas_ta': getattr(ta, 'version', getattr(ta, '__version__', None))}
+
+
+def compare(baseline, results, threshold=REGRESSION_THRESHOLD):
+    """
+    Compares results with a baseline run, matching scenarios by name and parameters.
+
+    Returns:
+    list: (name, params, baseline median, median, ratio) of every scenario slower than the baseline by more than `threshold`.
+    """
+    previous = {(result['name'], json.dumps(result['params'], sort_keys=True)): result['median'] for result in baseline['results']}
+    regressions = []
+    for result in results:
+        before = previous.get((result['name'], json.dumps(result['params'], sort_keys=True)))
+        if before and result['median'] > before * (1 + threshold):
+            regressions.append((result['name'], result['params'], before, result['median'], result['median'] / before))
+    return regressions
+
+
+def _format_params(params):
+    return ', '.join(f'{key}={value}' for key, value in params.items())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Runs the benchmark scenarios on synthetic data and a local Polygon.io stand-in.')
+    parser.add_argument('--output', default='benchmark_results.json', help='File the JSON results are written to.')
+    parser.add_argument('--baseline', help='Results of a previous run to compare against.')
+    parser.add_argument('--quick', action='store_true', help='Fewer bars, tickers and repetitions, for a fast smoke run.')
+    parser.add_argument('--tickers', type=int, nargs='+', help='Watchlist sizes to benchmark. Defaults to 1, 50 and 500.')
+    parser.add_argument('--bars', type=int, help='Hourly bars of the framework scenarios. Defaults to 5000, or 500 with --quick.')
+    parser.add_argument('--watchlist-bars', type=int, help='Hourly bars per watchlist ticker. Defaults to 1000, or 300 with --quick.')
+    parser.add_argument('--repeat', type=int, help='Repetitions per scenario. Defaults to 3, or 1 with --quick.')
+    parser.add_argument('--latency', type=float, default=0.02, help='Seconds the stand-in delays every request by.')
+    parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1), help='Processes used by the parallel scenarios.')
+    parser.add_argument('--universe', type=int, help='Tickers of the market the scanner scenarios screen. Defaults to 8000, or 1000 with --quick.')
+    parser.add_argument('--scan-days', type=int, help='Calendar days of grouped daily bars the scanner scenarios ingest. Defaults to 365, or 120 with --quick.')
+    parser.add_argument('--scenarios', nargs='+', choices=['fetch', 'framework', 'watchlist', 'scanner'], default=['fetch', 'framework', 'watchlist', 'scanner'])
+    parser.add_argument('--verbose', action='store_true', help='Shows the output of the benchmarked code.')
+    args = parser.parse_args(argv)
+
+    tickers = args.tickers or ([1, 10] if args.quick else [1, 50, 500])
+    bars = args.bars or (500 if args.quick else 5000)
+    watchlist_bars = args.watchlist_bars or (300 if args.quick else 1000)
+    universe = args.universe or (1000 if args.quick else 8000)
+    scan_days = args.scan_days or (120 if args.quick else 365)
+    runner = BenchmarkRunner(repeat=args.repeat or (1 if args.quick else 3), verbose=args.verbose)
+
+    if 'fetch' in args.scenarios:
+        fetch_scenarios(runner, args.latency, tickers)
+    if 'framework' in args.scenarios:
+        framework_scenarios(runner, bars)
+    if 'watchlist' in args.scenarios:
+        watchlist_scenarios(runner, tickers, watchlist_bars, args.latency, args.workers)
+    if 'scanner' in args.scenarios:
+        scanner_scenarios(runner, universe, scan_days, args.latency)
+
+    config = {'tickers': tickers, 'bars': bars, 'watchlist_bars': watchlist_bars, 'universe': universe, 'scan_days': scan_days,
+              'repeat': runner.repeat, 'latency': args.latency, 'workers': args.workers}
+    report = {'environment': environment(), 'config': config, 'results': runner.results}
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"Wrote {len(runner.results)} results to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(json.load(f), runner.results)
+        for name, params, before, after, ratio in regressions:
+            print(f"Regression: {name} ({_format_params(params)}) {before:.4f}s -> {after:.4f}s ({ratio:.2f}x)")
+        if not regressions:
+            print("No regressions against the baseline.")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,216 @@
+import zlib
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.frequencies import to_offset
+
+# First date of the synthetic data of `generate_grouped_daily` and `generate_bars`, and the number of dates
+# `generate_grouped_daily` generates at once
+MARKET_EPOCH = pd.Timestamp('2000-01-01')
+MARKET_CHUNK_DAYS = 64
+
+# Bars of a ticker's timeframe `generate_bars` generates at once
+BAR_CHUNK = 4096
+
+
+def ticker_seed(ticker, seed=0):
+    """Returns a stable seed for a ticker, so every ticker gets its own but reproducible price path."""
+    return (zlib.crc32(ticker.encode()) + seed) % 2 ** 32
+
+
+def generate_ohlcv(bars, timeframe='1D', start='2020-01-01', seed=0, start_price=100.0, volatility=0.02, drift=0.0, decimals=2):
+    """
+    Generates deterministic OHLCV bars following a geometric random walk, shaped like the bars returned by
+    `FetchData.fetch_data` (naive UTC timestamps and the columns open, high, low, close, volume, vw and n).
+
+    Parameters:
+    - bars (int): The number of bars.
+    - timeframe (str, optional): Pandas frequency string of the bars, e.g. '1min', '30min', '1h', '1D'.
+    - start (str or pd.Timestamp, optional): The timestamp of the first bar.
+    - seed (int, optional): Seed of the random generator; the same seed always gives the same bars.
+    - start_price (float, optional): The open of the first bar.
+    - volatility (float, optional): Standard deviation of the log return per bar.
+    - drift (float, optional): Mean of the log return per bar.
+    - decimals (int, optional): The decimals prices are quoted in, 2 (cents) by default. None keeps full precision.
+
+    Returns:
+    pd.DataFrame: The bars, indexed by timestamp.
+    """
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(start, periods=bars, freq=timeframe, name='timestamp')
+
+    returns = rng.normal(drift, volatility, bars)
+    close = start_price * np.exp(np.cumsum(returns))
+    open_ = np.concatenate([[start_price], close[:-1]])
+    # Wicks extend beyond the body by a fraction of the bar's volatility
+    high = np.maximum(open_, close) * np.exp(np.abs(rng.normal(0, volatility / 2, bars)))
+    low = np.minimum(open_, close) * np.exp(-np.abs(rng.normal(0, volatility / 2, bars)))
+    volume = np.round(rng.lognormal(10, 1, bars))
+    if decimals is not None:
+        open_, high, low, close = (np.round(prices, decimals) for prices in (open_, high, low, close))
+
+    return pd.DataFrame({'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume,
+                         'vw': (high + low + close) / 3, 'n': np.maximum(1, volume // 100).astype(np.int64)}, index=index)
+
+
+def generate_ticker(ticker, bars, timeframe='1D', start='2020-01-01', seed=0, **kwargs):
+    """Generates the bars of one ticker of a synthetic universe, see `generate_ohlcv`."""
+    return generate_ohlcv(bars, timeframe, start, ticker_seed(ticker, seed), **kwargs)
+
+
+def generate_bars(ticker, timeframe, start, end, seed=0, start_price=100.0, volatility=0.02, decimals=2):
+    """
+    Returns the bars of a ticker between two timestamps, shaped like `generate_ohlcv`. Unlike `generate_ohlcv`,
+    every ticker and timeframe follows one fixed path from `MARKET_EPOCH`, of which the requested range is a
+    slice, so overlapping requests (e.g. the chunks of `FetchData.fetch_data`) return the same bars for the
+    same timestamps.
+
+    Parameters:
+    - ticker (str): The ticker.
+    - timeframe (str): Pandas frequency string of the bars, e.g. '1min', '30min', '1D', '1W', '1MS'.
+    - start (str or pd.Timestamp): The first timestamp, not before `MARKET_EPOCH`.
+    - end (str or pd.Timestamp): The timestamp the bars end before.
+    - seed (int, optional): Seed shared by all tickers; the same seed always gives the same bars.
+    - start_price (float, optional): The price of every ticker at `MARKET_EPOCH`.
+    - volatility (float, optional): Standard deviation of the daily log return, scaled to the bar length.
+    - decimals (int, optional): The decimals prices are quoted in.
+
+    Returns:
+    pd.DataFrame: The bars, indexed by timestamp.
+    """
+    index = pd.date_range(start, end, freq=timeframe, inclusive='left', name='timestamp')
+    if len(index) and index[0] < MARKET_EPOCH:
+        raise ValueError(f"Synthetic bars start on {MARKET_EPOCH.date()}.")
+    offset = to_offset(timeframe)
+    bar_volatility = volatility * np.sqrt(((MARKET_EPOCH + offset) - MARKET_EPOCH) / pd.Timedelta(days=1))
+    positions = _bar_positions(index, offset)
+
+    open_levels, close_levels = np.empty(len(index)), np.empty(len(index))
+    noise = np.empty((len(index), 3))
+    key = (ticker_seed(ticker, seed), timeframe)
+    chunks = positions // BAR_CHUNK
+    for chunk in np.unique(chunks):
+        walk, chunk_noise = _bar_chunk(key, bar_volatility, int(chunk))
+        rows = np.flatnonzero(chunks == chunk)
+        within = positions[rows] % BAR_CHUNK
+        # A bar opens at the level its previous bar closed at
+        open_levels[rows], close_levels[rows], noise[rows] = walk[within], walk[within + 1], chunk_noise[within]
+
+    open_, close = start_price * np.exp(open_levels), start_price * np.exp(close_levels)
+    high = np.maximum(open_, close) * np.exp(np.abs(noise[:, 0]) * bar_volatility / 2)
+    low = np.minimum(open_, close) * np.exp(-np.abs(noise[:, 1]) * bar_volatility / 2)
+    volume = np.round(np.exp(10 + noise[:, 2]))
+    if decimals is not None:
+        open_, high, low, close = (np.round(prices, decimals) for prices in (open_, high, low, close))
+
+    return pd.DataFrame({'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume,
+                         'vw': (high + low + close) / 3, 'n': np.maximum(1, volume // 100).astype(np.int64)}, index=index)
+
+
+def _bar_positions(index, offset):
+    """Returns the position of every bar of `index` in its timeframe's bars from `MARKET_EPOCH`."""
+    if not len(index):
+        return np.zeros(0, dtype=np.int64)
+    if isinstance(offset, pd.offsets.Day):
+        length = pd.Timedelta(days=offset.n)
+    elif isinstance(offset, pd.offsets.Tick):
+        length = pd.Timedelta(offset)
+    else:
+        # Calendar offsets such as weeks and months: count the bars up to the first one, which are few
+        first = len(pd.date_range(MARKET_EPOCH, index[0], freq=offset)) - 1
+        return first + np.arange(len(index))
+    return np.asarray((index - MARKET_EPOCH) // length, dtype=np.int64)
+
+
+_bar_chunk_starts = {}
+
+
+@lru_cache(maxsize=64)
+def _bar_chunk(key, volatility, chunk):
+    """
+    Returns the log price levels of a ticker's timeframe from the start of a chunk of `BAR_CHUNK` bars through
+    its last bar, and the noise of the wicks and volumes of its bars. Chunks are generated like the ones of
+    `_market_walk`, from their own seeds.
+    """
+    seed = list(key[0:1]) + [zlib.crc32(key[1].encode())]
+    starts = _bar_chunk_starts.setdefault((key, volatility), [0.0])
+    while len(starts) <= chunk + 1:
+        i = len(starts) - 1
+        starts.append(starts[-1] + np.random.default_rng(seed + [i, 0]).normal(0, volatility * np.sqrt(BAR_CHUNK)))
+    rng = np.random.default_rng(seed + [chunk, 1])
+    returns = rng.normal(0, volatility, BAR_CHUNK)
+    returns += (starts[chunk + 1] - starts[chunk] - returns.sum()) / BAR_CHUNK
+    walk = starts[chunk] + np.concatenate([[0.0], np.cumsum(returns)])
+    return walk, rng.normal(0, 1, (BAR_CHUNK, 3))
+
+
+def synthetic_tickers(count, asset_type='Stock'):
+    """Returns `count` synthetic ticker symbols, prefixed like Polygon.io's crypto tickers for 'Crypto'."""
+    return [f'X:SYN{i:04d}USD' if asset_type == 'Crypto' else f'SYN{i:04d}' for i in range(count)]
+
+
+def generate_grouped_daily(date, count, asset_type='Stock', seed=0, volatility=0.02, decimals=2):
+    """
+    Generates the daily bars of a whole synthetic market on one date, shaped like the results of Polygon.io's
+    grouped daily endpoint and deterministic per date: the closes of every ticker follow one geometric random
+    walk across dates, so requesting dates separately and in any order gives consistent histories.
+
+    Tickers span penny stocks to large caps (prices from 0.5 to 500) and a wide range of volumes, and about 1%
+    of them do not trade on a given date. Stock markets do not trade on weekends.
+
+    Parameters:
+    - date (str or pd.Timestamp): The date, not before `MARKET_EPOCH`.
+    - count (int): The number of tickers, named by `synthetic_tickers`.
+    - asset_type (str, optional): 'Stock' or 'Crypto'.
+    - seed (int, optional): Seed of the market; the same seed always gives the same bars.
+    - volatility (float, optional): Standard deviation of the daily log return.
+    - decimals (int, optional): The decimals prices are quoted in.
+
+    Returns:
+    pd.DataFrame: The bars of the tickers that traded, indexed by ticker, with the columns open, high, low,
+    close, volume, vw and n. Empty if the market was closed.
+    """
+    date = pd.Timestamp(date).normalize()
+    if date < MARKET_EPOCH:
+        raise ValueError(f"Synthetic market data starts on {MARKET_EPOCH.date()}.")
+    if asset_type == 'Stock' and date.dayofweek >= 5:
+        return pd.DataFrame()
+
+    day = (date - MARKET_EPOCH).days
+    chunk, position = divmod(day, MARKET_CHUNK_DAYS)
+    market_seed = (seed, 1 if asset_type == 'Crypto' else 0)
+    walk = _market_walk(count, market_seed, volatility, chunk)
+
+    rng = np.random.default_rng(market_seed)
+    base_price = np.exp(rng.uniform(np.log(0.5), np.log(500), count))
+    volume_scale = rng.uniform(8, 15, count)
+
+    rng = np.random.default_rng(market_seed + (day, 2))
+    close = base_price * np.exp(walk[position + 1])
+    open_ = base_price * np.exp(walk[position] + rng.normal(0, volatility / 4, count))
+    high = np.maximum(open_, close) * np.exp(np.abs(rng.normal(0, volatility / 2, count)))
+    low = np.minimum(open_, close) * np.exp(-np.abs(rng.normal(0, volatility / 2, count)))
+    volume = np.round(rng.lognormal(volume_scale, 0.5))
+    traded = rng.random(count) >= 0.01
+    open_, high, low, close = (np.round(prices, decimals) for prices in (open_, high, low, close))
+
+    df = pd.DataFrame({'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume,
+                       'vw': (high + low + close) / 3, 'n': np.maximum(1, volume // 100).astype(np.int64)},
+                      index=pd.Index(synthetic_tickers(count, asset_type), name='ticker'))
+    return df[traded & (low > 0)]
+
+
+@lru_cache(maxsize=4)
+def _market_walk(count, seed, volatility, chunk):
+    """
+    Returns the log price level of every ticker at the start of a chunk of `MARKET_CHUNK_DAYS` dates and on each
+    of its dates.
+
+    Each chunk moves the levels by a random amount drawn on its own, and its daily returns are shifted to add up
+    to that move, so a chunk is generated from the moves of the chunks before it rather than their daily returns.
+    """
+    moves = [np.random.default_rng(seed + (i, 0)).normal(0, volatility * np.sqrt(MARKET_CHUNK_DAYS), count) for i in range(chunk + 1)]
+    returns = np.random.default_rng(seed + (chunk, 1)).normal(0, volatility, (MARKET_CHUNK_DAYS, count))
+    returns += (moves[-1] - returns.sum(axis=0)) / MARKET_CHUNK_DAYS
+    return np.sum(moves[:-1], axis=0) + np.cumsum(np.vstack([np.zeros(count), returns]), axis=0)
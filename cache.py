@@ -0,0 +1,155 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import count
+
+
+def frame_fingerprint(df, columns=None):
+    """
+    Returns a fingerprint of a DataFrame's contents: its length, its last index value and a BLAKE2b hash of
+    the referenced columns.
+
+    Hashing reads every value of the hashed columns, so it is only cheap next to an evaluation when few columns
+    are hashed. Without `columns`, e.g. for a SignalGroup with a callable signal that does not declare its
+    columns, every column of the frame is hashed, which costs about as much as reading the whole history;
+    declare the columns of callable signals to keep cache lookups cheap.
+
+    Parameters:
+    - df (pd.DataFrame): The data to fingerprint.
+    - columns (iterable, optional): The columns to hash. Defaults to all columns.
+
+    Returns:
+    tuple: (length, last index value, hex digest), usable as part of a cache key.
+    """
+    columns = sorted(df.columns if columns is None else set(columns) & set(df.columns), key=str)
+    digest = hashlib.blake2b(digest_size=16)
+    for column in columns:
+        values = df[column].to_numpy()
+        digest.update(str(column).encode())
+        if values.dtype == object:
+            values = pd.util.hash_array(values)
+        elif values.dtype.kind in 'mM':
+            # Buffers of datetime64 and timedelta64 arrays cannot be cast to bytes
+            values = values.view(np.int64)
+        digest.update(memoryview(np.ascontiguousarray(values)).cast('B'))
+    return len(df), df.index[-1] if len(df) else None, digest.hexdigest()
+
+
+def signal_definition(signal):
+    """
+    Returns the part of a cache key that identifies a Signal's definition. The functions are part of the key
+    themselves, rather than their ids, so a key stays valid for as long as it is cached.
+    """
+    return signal.name, signal.eval_function, signal.series_function, tuple(signal.columns) if signal.columns is not None else None
+
+
+def _nbytes(value):
+    """Estimates the memory held by a cached value."""
+    if isinstance(value, (pd.Series, pd.DataFrame)):
+        return int(np.sum(value.memory_usage(index=True, deep=True)))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    return 64
+
+
+class EvaluationCache:
+    """
+    A thread-safe LRU cache of signal evaluation results, bounded by the memory its values hold.
+
+    Results are keyed by their inputs' contents (see `frame_fingerprint` and `signal_definition`) rather than by
+    when they were computed, so one cache can be shared by every SignalGroup, framework and timeframe.
+
+    Attributes:
+    - max_bytes (int): The memory bound. The least recently used entries are evicted beyond it.
+    - hits (int): The number of lookups answered from the cache.
+    - misses (int): The number of lookups that had to be computed.
+    - evictions (int): The number of entries evicted to stay below `max_bytes`.
+
+    Methods:
+    - get_or_compute(key, compute): Returns the cached value for `key`, calling `compute()` on a miss.
+    - stats(): Returns the counters and the current size.
+    - clear(): Drops all entries and resets the counters.
+    """
+    def __init__(self, max_bytes=64 * 2**20):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns the cached value for `key`, or computes, caches and returns it. The value is computed
+        outside the lock, so a slow evaluation does not block lookups from other threads.
+        """
+        with self._lock:
+            hit = key in self._entries
+            if hit:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                value = self._entries[key][0]
+            else:
+                self.misses += 1
+        if hit:
+            count('cache_hits')
+            return value
+        count('cache_misses')
+
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def put(self, key, value):
+        """Caches a value, evicting the least recently used entries if the memory bound is exceeded."""
+        nbytes = _nbytes(value)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self._bytes -= evicted_bytes
+                self.evictions += 1
+
+    def stats(self):
+        """Returns the hit/miss/eviction counters, the hit rate and the current number of entries and bytes."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'hit_rate': self.hits / lookups if lookups else 0.0,
+                    'entries': len(self._entries), 'bytes': self._bytes, 'max_bytes': self.max_bytes}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def __reduce__(self):
+        # Pickled caches arrive empty, and the shared default cache maps to the receiving process's own
+        if self is default_cache:
+            return _get_default_cache, ()
+        return EvaluationCache, (self.max_bytes,)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return f"EvaluationCache({len(self._entries)} entries, {self._bytes} of {self.max_bytes} bytes)"
+
+
+# Cache shared by every SignalGroup that is not given its own
+default_cache = EvaluationCache()
+
+
+def _get_default_cache():
+    return default_cache
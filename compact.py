@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+
+# Price columns of compact OHLCV bars: what the strategies of a framework read from Polygon.io bars
+COMPACT_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+# Polygon.io fields dropped by compact data: neither strategies nor signals read them
+PRUNED_COLUMNS = ['vw', 'n', 'otc']
+
+# Most decimals a price or volume is assumed to be quoted in when checking whether float32 can hold it
+MAX_QUOTE_DECIMALS = 8
+
+
+def quote_decimals(values, max_decimals=MAX_QUOTE_DECIMALS):
+    """
+    Returns the number of decimals the values are quoted in, e.g. 2 for [101.25, 99.1], or None if they
+    have more than `max_decimals` (e.g. computed values rather than quotes).
+    """
+    values = values[np.isfinite(values)]
+    if not len(values):
+        return 0
+    for decimals in range(max_decimals + 1):
+        if np.all(np.abs(np.round(values, decimals) - values) <= 1e-9 * np.maximum(1, np.abs(values))):
+            return decimals
+    return None
+
+
+def fits_float32(values, decimals=None):
+    """
+    Returns True if float32 holds every value to the precision it is quoted in: rounding the float32 value
+    to the quoted decimals gives back the original. This holds for typical stock prices, but not e.g. for
+    crypto prices above 131072 quoted in cents.
+
+    Parameters:
+    - values (np.ndarray): The float64 values.
+    - decimals (int, optional): The decimals the values are quoted in. Inferred with `quote_decimals` if omitted.
+
+    Returns:
+    bool: Whether the values can be stored as float32.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    decimals = quote_decimals(values) if decimals is None else decimals
+    if decimals is None:
+        return False
+    finite = np.isfinite(values)
+    if np.any(np.abs(values[finite]) > np.finfo(np.float32).max):
+        return False
+    restored = np.round(values[finite].astype(np.float32).astype(np.float64), decimals)
+    return bool(np.all(restored == np.round(values[finite], decimals)))
+
+
+def compact_ohlcv(df, columns=COMPACT_COLUMNS):
+    """
+    Returns compact OHLCV bars: only `columns` are kept, compacted with `compact_frame`.
+
+    Parameters:
+    - df (pd.DataFrame): OHLCV bars, e.g. as returned by `FetchData`.
+    - columns (list, optional): The columns to keep, if present.
+
+    Returns:
+    pd.DataFrame: The compact bars.
+    """
+    return compact_frame(df[[column for column in columns if column in df]])
+
+
+def compact_frame(df, price_columns=COMPACT_COLUMNS):
+    """
+    Returns a compact copy of a timeframe's data:
+    - the Polygon.io fields in `PRUNED_COLUMNS` are dropped,
+    - float64 price columns become float32 if that preserves their quoted precision (see `fits_float32`),
+    - other float columns, i.e. indicators, become float32. They are derived values with no quoted
+      precision to preserve, and float32 keeps about 7 significant digits, more than the signals'
+      thresholds and crossovers resolve,
+    - the columns are consolidated into one array-backed block per dtype, on a datetime64[ns] index.
+
+    Parameters:
+    - df (pd.DataFrame): The data, with or without indicator columns.
+    - price_columns (list, optional): Columns that hold quoted values rather than derived ones.
+
+    Returns:
+    pd.DataFrame: The compacted data.
+    """
+    if df.empty:
+        return df
+    df = df.drop(columns=[column for column in PRUNED_COLUMNS if column in df])
+    dtypes = {}
+    for column, dtype in df.dtypes.items():
+        if dtype != np.float64:
+            continue
+        if column not in price_columns or fits_float32(df[column].to_numpy()):
+            dtypes[column] = np.float32
+    compact = df.astype(dtypes) if dtypes else df
+    if isinstance(compact.index, pd.DatetimeIndex) and compact.index.tz is None:
+        compact.index = compact.index.as_unit('ns')
+    # astype keeps one block per column; a deep copy consolidates them into one block per dtype
+    return compact.copy()
+
+
+def match_dtypes(df, like):
+    """Casts the columns `df` shares with `like` to the dtypes of `like`, so appending `df` does not upcast `like`."""
+    dtypes = {column: dtype for column, dtype in like.dtypes.items() if column in df and df[column].dtype != dtype}
+    return df.astype(dtypes) if dtypes else df
+
+
+def memory_footprint(df, price_columns=COMPACT_COLUMNS):
+    """
+    Returns the memory used by a frame.
+
+    Parameters:
+    - df (pd.DataFrame): E.g. the data of a timeframe.
+    - price_columns (list, optional): Columns counted as prices rather than indicators.
+
+    Returns:
+    dict: The number of rows and of price and indicator columns, the dtypes of the columns, and the bytes used
+    by the index, the prices, the indicators and in total, plus the total bytes per row.
+    """
+    usage = df.memory_usage(index=True, deep=True)
+    prices = [column for column in df.columns if column in price_columns]
+    indicators = [column for column in df.columns if column not in price_columns]
+    total = int(usage.sum())
+    return {'rows': len(df), 'price_columns': len(prices), 'indicator_columns': len(indicators),
+            'dtypes': ', '.join(f'{dtype}: {n}' for dtype, n in df.dtypes.astype(str).value_counts().items()),
+            'index_bytes': int(usage['Index']),
+            'price_bytes': int(usage[prices].sum()), 'indicator_bytes': int(usage[indicators].sum()),
+            'bytes': total, 'bytes_per_row': total / len(df) if len(df) else 0.0}
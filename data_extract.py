@@ -1,7 +1,74 @@
 import requests
 import pandas as pd
 from datetime import datetime, timedelta
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+
+from compact import compact_ohlcv
+from instrumentation import count, timer
+from resample import build_timeframes, is_intraday
+from store import OHLCVStore
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Snapshot endpoints of each asset type. Appending '/{ticker}' gives the single-ticker endpoint,
+# a 'tickers' query parameter with a comma separated list the multi-ticker one.
+SNAPSHOT_PATHS = {
+    'Stock': '/v2/snapshot/locale/us/markets/stocks/tickers',
+    'Crypto': '/v2/snapshot/locale/global/markets/crypto/tickers',
+}
+
+# Tickers per multi-ticker snapshot request, keeping the URL well below common length limits
+SNAPSHOT_BATCH_SIZE = 250
+
+# Grouped daily endpoints of each asset type: appending '/{date}' gives the daily bars of every ticker of the market
+GROUPED_PATHS = {
+    'Stock': '/v2/aggs/grouped/locale/us/market/stocks',
+    'Crypto': '/v2/aggs/grouped/locale/global/market/crypto',
+}
+
+
+class RateLimiter:
+    """
+    A thread-safe token bucket limiting the number of requests sent per period.
+    Size it to the Polygon.io plan, e.g. RateLimiter(5, 60) for the free tier's 5 calls per minute.
+
+    Attributes:
+        calls (int): Number of requests allowed per period (also the burst size).
+        period (float): Length of the period in seconds.
+        total_wait (float): Total time in seconds callers have spent waiting for a token.
+    """
+    def __init__(self, calls, period=1.0):
+        self.calls = calls
+        self.period = period
+        self.total_wait = 0.0
+        self._tokens = float(calls)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Blocks until a request may be sent.
+
+        Returns:
+            float: The time spent waiting, in seconds.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.calls, self._tokens + (now - self._updated) * self.calls / self.period)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    self.total_wait += waited
+                    return waited
+                delay = (1 - self._tokens) * self.period / self.calls
+            time.sleep(delay)
+            waited += delay
+
 
 class FetchData:
     """
@@ -9,41 +76,390 @@ class FetchData:
 
     Attributes:
         api_key (str): API key for authenticating requests to the Polygon.io API.
+        store (OHLCVStore): Optional local store. When set, only bars after the last stored bar are requested
+            and results are persisted between sessions.
+        base_url (str): Base URL of the Polygon.io API. Can point to a local stand-in for testing.
+        session (requests.Session): Pooled HTTP session shared by all requests.
+        rate_limiter (RateLimiter): Optional token bucket every request has to pass through.
+        max_workers (int): Number of requests `fetch_many` runs concurrently.
+        max_retries (int): Number of retries on 429/5xx responses and connection errors.
+        backoff (float): Base delay in seconds of the exponential backoff between retries.
+        request_log (list): One record per request with its url, status code, latency and rate limit wait.
+        compact (bool): If True, fetched bars are returned (and stored) in compact form: only open, high, low,
+            close and volume, as float32 where that preserves their quoted precision (see `compact.compact_ohlcv`).
     """
     
-    def __init__(self, api_key):
+    def __init__(self, api_key, store=None, base_url='https://api.polygon.io', rate_limit=None, max_workers=8, max_retries=3, backoff=1.0, timeout=30, compact=False):
         self.api_key = api_key
+        self.store = OHLCVStore(store) if isinstance(store, str) else store
+        self.base_url = base_url.rstrip('/')
+        self.rate_limiter = RateLimiter(*rate_limit) if isinstance(rate_limit, tuple) else rate_limit
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.compact = compact
+        self.request_log = []
+        self._log_lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
 
     def fetch_data(self, ticker, timespan, multiplier=1):
         """
         Fetch historical data for a ticker with specified timespan and multiplier.
+
+        With a store, only the range since the last stored bar is requested. It is merged into the
+        store and the full series is returned from local disk.
         """
+        start_date = self._resume_date(ticker, timespan, multiplier)
+
         if timespan in ['minute', 'hour']:
             # For timeframes of an hour or less, query in 3 chunks if multiplier allows
-            df = self._fetch_data_in_chunks(ticker, timespan, multiplier)
+            df = self._fetch_data_in_chunks(ticker, timespan, multiplier, start_date)
         else:
             # For other cases, fetch data normally
-            df = self._fetch_single_chunk(ticker, timespan, multiplier)
+            df = self._fetch_single_chunk(ticker, timespan, multiplier, start_date)
+
+        return self._store_result(ticker, timespan, multiplier, df)
+
+    def fetch_many(self, series):
+        """
+        Fetches historical data for many series at once. Every chunk of every series is requested concurrently
+        over the pooled session, subject to the rate limiter.
+
+        Args:
+            series (list): (ticker, timespan, multiplier) tuples to fetch.
+
+        Returns:
+            dict: The fetched DataFrame for each (ticker, timespan, multiplier) tuple. Series that failed are empty.
+                Failed requests, including malformed responses, are reported per series and do not stop the others.
+        """
+        jobs = self.plan_requests(series)
+
+        started = time.perf_counter()
+        first_request = len(self.request_log)
+        chunks = {key: [] for key, _ in jobs}
+        failed = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [(key, executor.submit(self._fetch_single_chunk, *key, *window)) for key, window in jobs]
+            for key, future in futures:
+                try:
+                    chunks[key].append(future.result())
+                except (requests.RequestException, ValueError, KeyError) as e:
+                    # ValueError: a body that is not JSON; KeyError: results missing the fields of a bar
+                    print(f"Fetching {key[2]} {key[1]} data for ticker {key[0]} failed: {e!r}")
+                    if key not in failed:
+                        failed.append(key)
+        if failed:
+            print(f"{len(failed)} series could not be fetched completely: {', '.join(f'{ticker} {multiplier} {timespan}' for ticker, timespan, multiplier in failed)}")
+
+        results = {}
+        for key, dfs in chunks.items():
+            df = pd.concat(dfs).drop_duplicates().sort_index() if dfs else pd.DataFrame()
+            results[key] = self._store_result(*key, df)
+
+        latencies = pd.Series([record['latency'] for record in self.request_log[first_request:]], dtype=float)
+        if len(latencies):
+            print(f"Fetched {len(results)} series with {len(latencies)} requests in {time.perf_counter() - started:.2f}s "
+                  f"(latency median {latencies.median():.3f}s, p95 {latencies.quantile(0.95):.3f}s, max {latencies.max():.3f}s)")
+        return results
+
+    def plan_requests(self, series):
+        """
+        Returns the requests `fetch_many` sends for a list of series: one per chunk of each series, starting
+        after the last stored bar when there is a store.
+
+        Args:
+            series (list): (ticker, timespan, multiplier) tuples.
+
+        Returns:
+            list: ((ticker, timespan, multiplier), (start, end)) tuples, one per request. A start or end of None
+                stands for the full window or now.
+        """
+        jobs = []
+        for ticker, timespan, multiplier in series:
+            start_date = self._resume_date(ticker, timespan, multiplier)
+            if timespan in ['minute', 'hour']:
+                windows = self._chunk_windows(start_date)
+            else:
+                windows = [(start_date, None)]
+            jobs.extend(((ticker, timespan, multiplier), window) for window in windows)
+        return jobs
+
+    def base_series(self, ticker, timeframes, intraday_base=(30, 'minute'), daily_base=(1, 'day')):
+        """
+        Returns the base series `fetch_timeframes` builds the timeframes of a ticker from.
+
+        Returns:
+            dict: The timeframes built from each (ticker, timespan, multiplier) base series.
+        """
+        intraday = [tf for tf in timeframes if is_intraday(tf)]
+        daily = [tf for tf in timeframes if not is_intraday(tf)]
+        if daily_base is None:
+            intraday, daily = list(timeframes), []
+
+        bases = {}
+        if intraday:
+            bases[(ticker, intraday_base[1], intraday_base[0])] = intraday
+        if daily:
+            # Both bases may be the same series
+            bases.setdefault((ticker, daily_base[1], daily_base[0]), []).extend(daily)
+        return bases
+
+    def fetch_timeframes(self, ticker, timeframes, asset_type='Stock', intraday_base=(30, 'minute'), daily_base=(1, 'day'), regular_hours=False):
+        """
+        Fetches one base series and builds every requested timeframe from it by resampling, instead of
+        fetching each timeframe separately.
+
+        Intraday timeframes are built from `intraday_base`. Daily and longer timeframes are built from
+        `daily_base`, because the intraday window only covers a few months of history. Both bases are
+        fetched concurrently.
+
+        Args:
+            ticker (str): Ticker symbol of the asset.
+            timeframes (list): Pandas frequency strings, e.g. ['30min', '1h', '4h', '1D', '1W', '1MS'].
+            asset_type (str): 'Stock' or 'Crypto'; selects the session bars are aligned to.
+            intraday_base (tuple): (multiplier, timespan) of the base series for intraday timeframes.
+            daily_base (tuple): (multiplier, timespan) of the base series for daily and longer timeframes.
+                If None, every timeframe is built from `intraday_base`.
+            regular_hours (bool): If True, extended-hours bars are dropped from intraday stock timeframes.
+
+        Returns:
+            dict: The resampled DataFrame for each timeframe.
+        """
+        bases = self.base_series(ticker, timeframes, intraday_base, daily_base)
+        timeframe_data = {}
+        for key, base_data in self.fetch_many(list(bases)).items():
+            timeframe_data.update(build_timeframes(base_data, bases[key], asset_type, regular_hours))
 
-        return df
+        return {tf: timeframe_data[tf] for tf in timeframes if tf in timeframe_data}
 
-    def _fetch_data_in_chunks(self, ticker, timespan, multiplier):
+    def fetch_snapshot(self, ticker, asset_type):
         """
-        Fetches data in chunks and combines them into a single DataFrame.
+        Fetches the snapshot of a single ticker.
+
+        Returns:
+            dict: The ticker's snapshot, or None if the request failed.
+        """
+        if asset_type not in SNAPSHOT_PATHS:
+            print(f"Unsupported asset type {asset_type} for ticker {ticker}.")
+            return None
+
+        with timer('snapshot', ticker=ticker) as span:
+            response = self.get(f"{self.base_url}{SNAPSHOT_PATHS[asset_type]}/{ticker}", params={'apiKey': self.api_key})
+            span.add(bytes=len(response.content))
+        if response.status_code == 200:
+            return response.json().get('ticker')
+        print(f"Failed to fetch snapshot for {ticker}: {response.text}")
+        return None
+
+    def fetch_snapshots(self, tickers, asset_type):
+        """
+        Fetches the snapshots of many tickers of one asset type with the multi-ticker snapshot endpoint,
+        in batches of `SNAPSHOT_BATCH_SIZE`. Tickers missing from a batch response, or whose batch failed,
+        are fetched concurrently with single-ticker requests over the pooled session.
+
+        Args:
+            tickers (list): Ticker symbols, e.g. ['AAPL', 'MSFT'] or ['X:BTCUSD'].
+            asset_type (str): 'Stock' or 'Crypto'.
+
+        Returns:
+            dict: The snapshot of each ticker that could be fetched.
+        """
+        if asset_type not in SNAPSHOT_PATHS:
+            print(f"Unsupported asset type {asset_type} for tickers {', '.join(tickers)}.")
+            return {}
+
+        snapshots = {}
+        for i in range(0, len(tickers), SNAPSHOT_BATCH_SIZE):
+            batch = tickers[i:i + SNAPSHOT_BATCH_SIZE]
+            try:
+                with timer('snapshots', asset_type=asset_type) as span:
+                    response = self.get(f"{self.base_url}{SNAPSHOT_PATHS[asset_type]}", params={'apiKey': self.api_key, 'tickers': ','.join(batch)})
+                    span.add(bytes=len(response.content))
+            except requests.RequestException as e:
+                print(f"Batch snapshot request failed: {e}")
+                continue
+            if response.status_code == 200:
+                received = [snapshot for snapshot in response.json().get('tickers') or [] if snapshot.get('ticker') in batch]
+                for snapshot in received:
+                    snapshots[snapshot['ticker']] = snapshot
+                count('snapshot_tickers', len(received), asset_type=asset_type)
+            else:
+                print(f"Batch snapshot request failed with status code {response.status_code}: {response.text}")
+
+        missing = [ticker for ticker in tickers if ticker not in snapshots]
+        if missing:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [(ticker, executor.submit(self.fetch_snapshot, ticker, asset_type)) for ticker in missing]
+                for ticker, future in futures:
+                    try:
+                        snapshot = future.result()
+                    except requests.RequestException as e:
+                        print(f"Failed to fetch snapshot for {ticker}: {e}")
+                        continue
+                    if snapshot:
+                        snapshots[ticker] = snapshot
+
+        return snapshots
+
+    def fetch_grouped_daily(self, date, asset_type='Stock'):
+        """
+        Fetches the daily bars of every ticker of a market on one date with the grouped daily endpoint.
+
+        Args:
+            date (datetime or str): The date, e.g. '2024-03-06'.
+            asset_type (str): 'Stock' or 'Crypto'.
+
+        Returns:
+            pd.DataFrame: One row per ticker, indexed by ticker, with open, high, low, close, volume, vw and n.
+                Empty if the market was closed; None if the request failed.
+        """
+        if asset_type not in GROUPED_PATHS:
+            print(f"Unsupported asset type {asset_type} for grouped daily bars.")
+            return None
+
+        date_str = pd.Timestamp(date).strftime('%Y-%m-%d')
+        with timer('grouped', asset_type=asset_type) as span:
+            response = self.get(f"{self.base_url}{GROUPED_PATHS[asset_type]}/{date_str}", params={'apiKey': self.api_key, 'adjusted': 'true'})
+            span.add(bytes=len(response.content))
+            if response.status_code != 200:
+                print(f"Grouped daily request for {date_str} failed with status code {response.status_code}: {response.text}")
+                return None
+            data = response.json().get('results') or []
+            if not data:
+                return pd.DataFrame()
+            df = pd.DataFrame(data).drop(columns=['t'], errors='ignore')
+            df = df.rename(columns={'T': 'ticker', 'o': 'open', 'h': 'high', 'l': 'low', 'c': 'close', 'v': 'volume'}).set_index('ticker')
+            span.add(rows=len(df))
+        return compact_ohlcv(df) if self.compact else df
+
+    def fetch_grouped(self, dates, asset_type='Stock'):
+        """
+        Fetches the grouped daily bars of many dates concurrently over the pooled session, subject to the rate limiter.
+
+        Args:
+            dates (list): The dates to fetch.
+            asset_type (str): 'Stock' or 'Crypto'.
+
+        Returns:
+            dict: The bars of each date (see `fetch_grouped_daily`), empty for the dates the market was closed.
+                Dates whose request failed are left out and reported, so they can be fetched again.
+        """
+        results = {}
+        failed = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [(date, executor.submit(self.fetch_grouped_daily, date, asset_type)) for date in dates]
+            for date, future in futures:
+                try:
+                    df = future.result()
+                except requests.RequestException as e:
+                    print(f"Fetching grouped daily bars for {date} failed: {e}")
+                    df = None
+                if df is None:
+                    failed.append(date)
+                else:
+                    results[date] = df
+        if failed:
+            print(f"Grouped daily bars of {len(failed)} dates could not be fetched: {', '.join(pd.Timestamp(date).strftime('%Y-%m-%d') for date in failed)}")
+        return results
+
+    def get(self, url, params=None):
+        """
+        Sends a GET request over the pooled session. Waits for the rate limiter, retries 429/5xx responses and
+        connection errors with exponential backoff (honouring Retry-After), and records each attempt in `request_log`.
+
+        Returns:
+            requests.Response: The last response received.
+        """
+        for attempt in range(self.max_retries + 1):
+            wait = self.rate_limiter.acquire() if self.rate_limiter else 0.0
+            if wait:
+                count('rate_limit_wait_seconds', wait)
+            started = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                self._log_request(url, None, time.perf_counter() - started, wait, attempt)
+                count('http_errors')
+                if attempt == self.max_retries:
+                    raise
+                count('http_retries')
+                time.sleep(self.backoff * 2 ** attempt)
+                continue
+
+            self._log_request(url, response.status_code, time.perf_counter() - started, wait, attempt)
+            count('http_requests', status=response.status_code)
+            if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                return response
+            count('http_retries')
+
+            retry_after = response.headers.get('Retry-After')
+            time.sleep(float(retry_after) if retry_after and retry_after.isdigit() else self.backoff * 2 ** attempt)
+
+    def request_stats(self):
+        """Returns the request log as a DataFrame, one row per request attempt."""
+        return pd.DataFrame(self.request_log, columns=['url', 'status_code', 'latency', 'rate_limit_wait', 'attempt'])
+
+    def _log_request(self, url, status_code, latency, wait, attempt):
+        with self._log_lock:
+            self.request_log.append({'url': url, 'status_code': status_code, 'latency': latency, 'rate_limit_wait': wait, 'attempt': attempt})
+
+    def _resume_date(self, ticker, timespan, multiplier):
+        """
+        Returns the date to resume fetching from for a stored series, or None to fetch the full window.
+        """
+        if self.store is None:
+            return None
+        last_bar = self.store.last_timestamp(ticker, timespan, multiplier)
+        if last_bar is None:
+            return None
+        # Refetch from the last stored bar, which may have been incomplete, but never beyond the full window
+        start_date = last_bar.to_pydatetime()
+        if timespan not in ['minute', 'hour']:
+            start_date = max(start_date, self._calculate_start_date(timespan))
+        return start_date
+
+    def _store_result(self, ticker, timespan, multiplier, df):
+        """Merges fetched data into the store, if any, and returns the full stored series."""
+        if self.store is None:
+            return df
+        if not df.empty:
+            self.store.merge(ticker, timespan, multiplier, df)
+        return self.store.load(ticker, timespan, multiplier)
+
+    def _chunk_windows(self, start_date=None):
+        """
+        Splits the lower timeframe window into (start, end) chunks, newest first.
+        If `start_date` is given, only the chunks covering `start_date` until now are returned.
         """
         chunks = 3  # Number of chunks to split the query into (Around 3 months should be plenty for lower time frames)
-        dfs = []
+        windows = []
         end_date = datetime.now() 
-        for i in range(chunks):
-            start_date = end_date - timedelta(minutes=(50000))
-            dfs.append(self._fetch_single_chunk(ticker, timespan, multiplier, start_date, end_date))
+        earliest_date = end_date - timedelta(minutes=(50001 * chunks - 1))
+        if start_date:
+            earliest_date = max(earliest_date, start_date)
+        while end_date > earliest_date:
+            windows.append((max(end_date - timedelta(minutes=(50000)), earliest_date), end_date))
             # Update end time
             end_date = end_date - timedelta(minutes=(50001))
-        
-        combined_df = pd.concat(dfs).drop_duplicates().sort_index()
+        return windows
 
-        # Avoid getting rate limited!!!
-        time.sleep(0.5)
+    def _fetch_data_in_chunks(self, ticker, timespan, multiplier, start_date=None):
+        """
+        Fetches data in chunks concurrently and combines them into a single DataFrame.
+        If `start_date` is given, only the chunks covering `start_date` until now are fetched.
+        """
+        windows = self._chunk_windows(start_date)
+        with ThreadPoolExecutor(max_workers=max(1, min(len(windows), self.max_workers))) as executor:
+            dfs = list(executor.map(lambda window: self._fetch_single_chunk(ticker, timespan, multiplier, *window), windows))
+
+        if not dfs:
+            return pd.DataFrame()
+        combined_df = pd.concat(dfs).drop_duplicates().sort_index()
 
         return combined_df
 
@@ -59,21 +475,24 @@ class FetchData:
         start_date_str = start_date.strftime('%Y-%m-%d')
         end_date_str = end_date.strftime('%Y-%m-%d')
 
-        url = f"https://api.polygon.io/v2/aggs/ticker/{ticker}/range/{multiplier}/{timespan}/{start_date_str}/{end_date_str}"
+        url = f"{self.base_url}/v2/aggs/ticker/{ticker}/range/{multiplier}/{timespan}/{start_date_str}/{end_date_str}"
         params = {'apiKey': self.api_key, 'multiplier':multiplier, 'timespan':timespan, 'limit': 50000}
 
         print(f'Fetching {multiplier} {timespan} data for ticker {ticker}: {start_date} - {end_date}')
-        response = requests.get(url, params=params)
-        if response.status_code == 200:
-            data = response.json().get('results', [])
-            if data:
-                df = pd.DataFrame(data)
-                df.rename(columns={'o': 'open', 'h': 'high', 'l': 'low', 'c': 'close', 'v': 'volume', 't': 'timestamp'}, inplace=True)
-                df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-                df.set_index('timestamp', inplace=True)
-                return df
-        else:
-            print(f"API request failed with status code {response.status_code}: {response.text}")
+        with timer('fetch', ticker=ticker, timeframe=f'{multiplier} {timespan}') as span:
+            response = self.get(url, params=params)
+            span.add(bytes=len(response.content))
+            if response.status_code == 200:
+                data = response.json().get('results', [])
+                if data:
+                    df = pd.DataFrame(data)
+                    df.rename(columns={'o': 'open', 'h': 'high', 'l': 'low', 'c': 'close', 'v': 'volume', 't': 'timestamp'}, inplace=True)
+                    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+                    df.set_index('timestamp', inplace=True)
+                    span.add(rows=len(df))
+                    return compact_ohlcv(df) if self.compact else df
+            else:
+                print(f"API request failed with status code {response.status_code}: {response.text}")
         return pd.DataFrame()
 
     def _calculate_start_date(self, timespan):
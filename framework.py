@@ -1,7 +1,13 @@
+import numpy as np
 import pandas as pd
-import pandas_ta as ta
 from datetime import datetime
-import vectorbt as vbt
+
+from compact import PRUNED_COLUMNS, compact_frame, match_dtypes, memory_footprint
+from indicators import apply_strategy_sequential, as_strategy, minimal_strategy, strategy_lead, strategy_lookback
+from instrumentation import tagged, timer
+from resample import bar_close_times, build_timeframes
+from streaming import DEFAULT_STREAM_WINDOW, StatusChange, status_changes
+from status import NEUTRAL, EvaluationResult, decode_statuses, encode_statuses, majority_vote, plurality_vote
 
 
 class TradingFramework:
@@ -15,11 +21,19 @@ class TradingFramework:
         active_time_frame (str): The active timeframe that is currently being used for analysis.
         bias_timeframes (list): List of timeframes considered for establishing market bias.
         confirmation_timeframes (list): List of timeframes used for trade confirmation.
-        strategies (dict): Stores trading strategies for each timeframe.
+        strategies (dict): Stores trading strategies for each timeframe, as ta.Strategy objects or as dicts of
+            their fields (see `indicators.as_strategy`).
         last_update (dict): Timestamps of the last data update for each timeframe.
         last_calculation (dict): Timestamps of the last calculation or analysis performed for each timeframe.
+        stream_window (dict): Number of bars kept for each timeframe while streaming (see `start_stream`).
+        stream_codes (dict): The latest status codes of each timeframe while streaming.
+        stream_status (int): The latest overall status code while streaming.
+        status_listeners (list): Callables receiving each StatusChange emitted while streaming.
+        compact (bool): If True, timeframe data is held in compact form (see `compact.compact_frame`): Polygon.io
+            fields the framework does not read are dropped, prices are float32 where that preserves their quoted
+            precision, and indicators are float32, consolidated into one block per dtype.
     """
-    def __init__(self, name, timeframes={}, active_time_frame=None, bias_timeframes=[], confirmation_timeframes=[]):
+    def __init__(self, name, timeframes={}, active_time_frame=None, bias_timeframes=[], confirmation_timeframes=[], compact=False):
         self.name = name
         self.timeframes = timeframes  
         self.active_time_frame = active_time_frame
@@ -28,27 +42,59 @@ class TradingFramework:
         self.strategies = {}
         self.last_update = {tf: datetime.min for tf in timeframes}
         self.last_calculation = {tf: datetime.min for tf in timeframes}
+        self.stream_window = {}
+        self.stream_codes = {}
+        self.stream_status = None
+        self.status_listeners = []
+        self.compact = compact
 
     def current_timestamp(self):
         # Placeholder implementation - might need to adjust later for timezone reasons?
         return datetime.now()
 
     def add_timeframe(self, name, data, strategy=None):
+        if self.compact:
+            data = compact_frame(data)
         if name in self.timeframes:
             self.timeframes[name]['data'] = data
             current_strategy = strategy if strategy else self.strategies.get(name, None)
             if current_strategy:
-                data.ta.strategy(current_strategy)
                 self.strategies[name] = current_strategy
             else:
                 print(f"No strategy defined for updating timeframe {name}.")
         else:
-            if strategy:
-                data.ta.strategy(strategy)
+            import pandas_ta as ta
             self.timeframes[name] = {'data': data, 'signal_groups': []}
             self.strategies[name] = strategy if strategy else ta.Strategy(name=f"{name} Default Strategy", description="Default strategy for new timeframe")
         
+        # The strategy is applied on first use (see ensure_indicators), once the signal groups and so
+        # the indicator columns they need are known
         self.last_update[name] = self.current_timestamp()
+        self.check_columns(name)
+
+    def add_timeframes(self, timeframe_data, strategy=None):
+        """
+        Adds several timeframes at once.
+
+        Args:
+        - timeframe_data (dict): The data of each timeframe, e.g. as returned by `FetchData.fetch_timeframes`.
+        - strategy (ta.Strategy or dict, optional): One strategy for every timeframe, or a dict of strategies by timeframe.
+        """
+        for name, data in timeframe_data.items():
+            self.add_timeframe(name, data, strategy.get(name) if isinstance(strategy, dict) else strategy)
+
+    def add_resampled_timeframes(self, base_data, timeframes, strategy=None, asset_type='Crypto', regular_hours=False):
+        """
+        Builds every timeframe from one base series by resampling and adds them to the framework.
+
+        Args:
+        - base_data (pd.DataFrame): OHLCV bars of the finest granularity needed.
+        - timeframes (list): Pandas frequency strings of the timeframes to add, e.g. ['30min', '2h', '1D', '1W'].
+        - strategy (ta.Strategy or dict, optional): One strategy for every timeframe, or a dict of strategies by timeframe.
+        - asset_type (str): 'Stock' or 'Crypto'; selects the session bars are aligned to.
+        - regular_hours (bool): If True, extended-hours bars are dropped from intraday stock timeframes.
+        """
+        self.add_timeframes(build_timeframes(base_data, timeframes, asset_type, regular_hours), strategy)
 
     def needs_update(self, name):
         last_calculated = self.last_calculation.get(name, datetime.min)
@@ -58,6 +104,7 @@ class TradingFramework:
     def update_strategy(self, name, indicators):
         """Updates or defines a strategy for a given timeframe."""
         if name in self.timeframes:
+            import pandas_ta as ta
             strategy = ta.Strategy(name=f"{name} Custom Strategy", ta=indicators)
             self.strategies[name] = strategy
         else:
@@ -67,12 +114,244 @@ class TradingFramework:
         """Applies the strategy to the data of a specific timeframe."""
         if name in self.timeframes and name in self.strategies:
             data = self.timeframes[name]['data']
-            strategy = self.strategies[name]
-            data.ta.strategy(strategy)
+            strategy = self.effective_strategy(name)
+            if strategy is not None:
+                import pandas_ta  # registers the DataFrame.ta accessor
+                with timer('indicators', timeframe=name) as span:
+                    data.ta.strategy(strategy)
+                    span.add(rows=len(data))
+            if self.compact:
+                data = compact_frame(data)
             self.timeframes[name]['data'] = data  
         else:
             print(f"Strategy or timeframe {name} does not exist.")
 
+    def ensure_indicators(self, name):
+        """Applies the strategy of a timeframe if its data changed since the strategy was last applied."""
+        if self.needs_update(name):
+            self.apply_strategy(name)
+            self.last_calculation[name] = self.current_timestamp()
+
+    def required_columns(self, name):
+        """
+        Returns the set of columns the signal groups of a timeframe read, or None if any of their signals
+        does not declare its columns.
+        """
+        columns = set()
+        for group in self.timeframes[name]['signal_groups']:
+            group_columns = group.required_columns()
+            if group_columns is None:
+                return None
+            columns.update(group_columns)
+        return columns
+
+    def effective_strategy(self, name):
+        """
+        Returns the strategy actually applied to a timeframe: the indicators of its strategy that produce a
+        column its signals read. Falls back to the full strategy when the timeframe has no signal groups or
+        one of its signals does not declare its columns. Returns None if no indicator is needed.
+        """
+        strategy = as_strategy(self.strategies.get(name))
+        required = self.required_columns(name)
+        if strategy is None or not strategy.ta or not self.timeframes[name]['signal_groups'] or required is None:
+            return strategy
+        return minimal_strategy(strategy, required, self._indicator_sample(name))[0]
+
+    def check_columns(self, name):
+        """
+        Reports the columns read by the signals of a timeframe that neither its data nor its strategy provides.
+        Signals reading such columns always evaluate to 'neutral'.
+
+        Returns:
+        set: The unresolved columns.
+        """
+        strategy = as_strategy(self.strategies.get(name))
+        required = self.required_columns(name)
+        if not required or strategy is None or not strategy.ta:
+            return set()
+
+        unresolved = minimal_strategy(strategy, required, self._indicator_sample(name))[1]
+        if unresolved:
+            print(f"Timeframe {name}: columns {sorted(unresolved)} are read by its signals but not produced by its strategy.")
+        return unresolved
+
+    def _indicator_sample(self, name, size=500):
+        """Returns the last bars of a timeframe's price data, used to probe which columns each indicator produces."""
+        data = self.timeframes[name]['data']
+        return data[[column for column in ['open', 'high', 'low', 'close', 'volume'] if column in data]].iloc[-size:]
+
+    def indicator_lookback(self, name):
+        """
+        Returns how many bars before a new bar the strategy of a timeframe needs to compute its indicators
+        for that bar, or None if the strategy has to be recomputed over the full history.
+        """
+        return strategy_lookback(self.effective_strategy(name))
+
+    def indicator_lead(self, name):
+        """Returns how many bars before a new bar the indicators of a timeframe change when it arrives, see `strategy_lead`."""
+        return strategy_lead(self.effective_strategy(name))
+
+    def append_bars(self, name, bars):
+        """
+        Appends new bars to a timeframe and computes the strategy's indicators only for them.
+
+        The indicators are computed on the new bars plus the strategy's lookback window, which covers
+        the warm-up recursive indicators such as EMA, RSI and MACD need to carry their state forward.
+        Indicators that read later bars, such as ichimoku's chikou span, are recomputed for the last bars
+        before the new ones as well. Existing bars with the same or later timestamps than the first new bar are replaced, so an
+        incomplete last bar can be updated. Strategies with unknown indicators are recomputed in full.
+
+        Args:
+        - name (str): The timeframe to append to.
+        - bars (pd.DataFrame): The new OHLCV bars, with the same price columns as the timeframe's data.
+        """
+        if name not in self.timeframes:
+            print(f"Timeframe {name} does not exist.")
+            return
+        if bars.empty:
+            return
+
+        self.ensure_indicators(name)
+        data = self.timeframes[name]['data']
+        bars = bars[~bars.index.duplicated(keep='last')].sort_index()
+        if self.compact:
+            bars = match_dtypes(bars.drop(columns=[column for column in PRUNED_COLUMNS if column in bars]), data)
+        # A positional slice of sorted data is a view, not a copy of the whole history
+        if data.index.is_monotonic_increasing:
+            history = data.iloc[:data.index.searchsorted(bars.index[0])]
+        else:
+            history = data[data.index < bars.index[0]]
+        lookback = self.indicator_lookback(name)
+
+        if lookback is None:
+            self.timeframes[name]['data'] = pd.concat([history[bars.columns], bars])
+            self.apply_strategy(name)
+        else:
+            # The last `lead` bars of the history are recomputed along with the new bars, each with its lookback
+            lead = min(self.indicator_lead(name), len(history))
+            window = pd.concat([history.iloc[max(len(history) - lead - lookback, 0):][bars.columns], bars])
+            with timer('indicators_incremental', timeframe=name) as span:
+                apply_strategy_sequential(window, self.effective_strategy(name))
+                span.add(rows=len(bars) + lead)
+            new_rows = window.iloc[-(len(bars) + lead):]
+            if self.compact:
+                new_rows = match_dtypes(new_rows, history)
+            self.timeframes[name]['data'] = pd.concat([history.iloc[:len(history) - lead], new_rows])
+
+        # The indicators are current, so evaluate_timeframe does not need to recompute them
+        self.last_update[name] = self.current_timestamp()
+        self.last_calculation[name] = self.last_update[name]
+
+    def start_stream(self, window=DEFAULT_STREAM_WINDOW, listeners=None):
+        """
+        Switches the framework to streaming mode: every timeframe keeps only its last `window` bars (or its
+        strategy's lookback, if longer), so the cost of a new bar does not grow with the history. The current
+        statuses become the baseline status changes are reported against.
+
+        Args:
+        - window (int): The number of bars kept per timeframe. Signals only see these bars.
+        - listeners (list, optional): Callables receiving each StatusChange.
+        """
+        self.status_listeners = list(listeners or [])
+        self.stream_codes = {}
+        for name in self.timeframes:
+            self.ensure_indicators(name)
+            self.stream_window[name] = max(window, (self.indicator_lookback(name) or 0) + self.indicator_lead(name) + 1)
+            self.timeframes[name]['data'] = self.timeframes[name]['data'].iloc[-self.stream_window[name]:]
+            self.stream_codes[name] = self.evaluate_timeframe_codes(name)
+        self.stream_status = self._stream_overall_code()
+
+    def on_bar(self, name, bars):
+        """
+        Streams new bars into a timeframe: computes their indicators from the lookback window, re-evaluates
+        the timeframe's signal groups and the overall status, and emits a StatusChange for every status that
+        changed to the `status_listeners`. Can be used directly as the callback of a live feed.
+
+        Args:
+        - name (str): The timeframe the bars belong to.
+        - bars (pd.DataFrame or pd.Series): One or more new OHLCV bars. A pd.Series is one bar, named by its timestamp.
+          A bar with the timestamp of the last bar replaces it, so an incomplete bar can be updated.
+
+        Returns:
+        list: The StatusChange events caused by the bars.
+        """
+        if name not in self.stream_codes:
+            print(f"Timeframe {name} is not streaming. Call start_stream first.")
+            return []
+        if isinstance(bars, pd.Series):
+            bars = bars.to_frame().T.infer_objects()
+        if bars.empty:
+            return []
+
+        with timer('on_bar', timeframe=name) as span:
+            events = self._on_bar(name, bars)
+            span.add(rows=len(bars), events=len(events))
+
+        for event in events:
+            for listener in self.status_listeners:
+                listener(event)
+        return events
+
+    def _on_bar(self, name, bars):
+        """Appends and evaluates the bars of `on_bar` and returns the StatusChange events they cause."""
+        self.append_bars(name, bars)
+        self.timeframes[name]['data'] = self.timeframes[name]['data'].iloc[-self.stream_window[name]:]
+
+        timestamp = bars.index[-1]
+        codes = self.evaluate_timeframe_codes(name)
+        events = status_changes(self.stream_codes[name], codes, timestamp, name)
+        self.stream_codes[name] = codes
+
+        # Only this timeframe changed, so the overall status is voted from the latest codes of the others
+        overall = self._stream_overall_code()
+        if overall != self.stream_status:
+            events.append(StatusChange(timestamp, 'Overall', 'Overall', 'Overall', decode_statuses(self.stream_status), decode_statuses(overall)))
+            self.stream_status = overall
+        return events
+
+    async def stream(self, feed, window=DEFAULT_STREAM_WINDOW, listeners=None):
+        """
+        Consumes a feed of new bars, passing each to `on_bar`. Starts streaming mode first if needed.
+
+        Args:
+        - feed: An async iterator (or iterable) of (timeframe name, bars) tuples, e.g. `streaming.replay_bars`.
+        - window (int): The number of bars kept per timeframe, see `start_stream`.
+        - listeners (list, optional): Callables receiving each StatusChange.
+
+        Returns:
+        int: The number of updates consumed.
+        """
+        if not self.stream_codes:
+            self.start_stream(window, listeners)
+        elif listeners:
+            self.status_listeners.extend(listeners)
+
+        count = 0
+        if hasattr(feed, '__aiter__'):
+            async for name, bars in feed:
+                self.on_bar(name, bars)
+                count += 1
+        else:
+            for name, bars in feed:
+                self.on_bar(name, bars)
+                count += 1
+        return count
+
+    def _stream_overall_code(self):
+        """Majority vote of the latest streamed statuses of the bias, confirmation and active timeframes."""
+        codes = np.array([self.stream_codes[tf][('Overall', 'Overall')] for tf in self.voting_timeframes()], dtype=np.int8)
+        return np.int8(majority_vote(codes))
+
+    def memory_footprint(self):
+        """
+        Reports the memory held by the data of every timeframe, see `compact.memory_footprint`.
+
+        Returns:
+        pd.DataFrame: One row per timeframe with its rows, columns, dtypes and bytes.
+        """
+        return pd.DataFrame([memory_footprint(timeframe['data']) for timeframe in self.timeframes.values()],
+                            index=pd.Index(list(self.timeframes), name='timeframe'))
+
     def delete_timeframe(self, name):
         """Deletes a timeframe."""
         if name in self.timeframes:
@@ -84,6 +363,11 @@ class TradingFramework:
         """Adds a signal group to an existing timeframe."""
         if timeframe_name in self.timeframes:
             self.timeframes[timeframe_name]['signal_groups'].append(signal_group)
+            required = self.required_columns(timeframe_name)
+            if required is None or not required <= set(self.timeframes[timeframe_name]['data'].columns):
+                # The indicators the new group reads may have been pruned when the strategy was last applied
+                self.last_update[timeframe_name] = self.current_timestamp()
+            self.check_columns(timeframe_name)
         else:
             print(f"Timeframe {timeframe_name} does not exist.")
 
@@ -107,82 +391,242 @@ class TradingFramework:
             print(f"Timeframe {name} does not exist.")
             return {}
 
-        if self.needs_update(name):
-            self.apply_strategy(name)
-            self.last_calculation[name] = self.current_timestamp()
+        return EvaluationResult.from_timeframes({name: self.evaluate_timeframe_codes(name)}).to_dict()[name]
 
-        timeframe = self.timeframes[name]
-        timeframe_results = {}
-        status_counts = {'positive': 0, 'neutral': 0, 'negative': 0}
-        
-        for group in timeframe['signal_groups']:
-            group_results = group.evaluate_group(timeframe['data'], self.last_calculation[name])
-            
-            timeframe_results[group.name] = group_results
+    def evaluate_timeframe_codes(self, name):
+        """
+        Evaluates the signal groups of a timeframe as int8 status codes.
 
-            group_overall_status = group_results['Overall']
-            status_counts[group_overall_status] += 1
+        Returns:
+        pd.Series: Status codes indexed by (group, signal), with each group's overall status under (group, 'Overall')
+        and the timeframe's overall status under ('Overall', 'Overall').
+        """
+        with tagged(timeframe=name):
+            self.ensure_indicators(name)
 
-        majority_status = max(status_counts, key=status_counts.get)
-        if status_counts[majority_status] == len(status_counts) / 2:  # Handling tie
-            majority_status = 'neutral'
+            timeframe = self.timeframes[name]
+            groups = timeframe['signal_groups']
+            group_codes = [group.evaluate_group_codes(timeframe['data']) for group in groups]
 
-        timeframe_results['Overall'] = majority_status
+        majority_status = plurality_vote(np.array([codes['Overall'] for codes in group_codes], dtype=np.int8))
+        overall = pd.Series([majority_status], index=['Overall'], dtype=np.int8)
 
-        return timeframe_results
+        return pd.concat(group_codes + [overall], keys=[group.name for group in groups] + ['Overall'])
+
+    def evaluate(self, timeframes=None):
+        """
+        Evaluates timeframes and returns their statuses as an array-backed result.
+
+        Args:
+        - timeframes (list, optional): The timeframes to evaluate. Defaults to all timeframes.
+
+        Returns:
+        EvaluationResult: int8 status codes for every timeframe x signal group x signal.
+        """
+        timeframe_codes = {}
+        for name in (self.timeframes.keys() if timeframes is None else timeframes):
+            if name in self.timeframes:
+                timeframe_codes[name] = self.evaluate_timeframe_codes(name)
+            else:
+                print(f"Timeframe {name} does not exist.")
+
+        return EvaluationResult.from_timeframes(timeframe_codes)
 
     def evaluate_all_timeframes(self):
         """Evaluates each timeframe and returns their statuses including individual signal scores."""
-        all_timeframe_statuses = {}
-        
-        for name in self.timeframes.keys():
-            all_timeframe_statuses[name] = self.evaluate_timeframe(name)
-            
-        return all_timeframe_statuses
+        return self.evaluate().to_dict()
+
+    def timeframe_overall_code(self, name):
+        """Evaluates a timeframe and returns only its overall int8 status code."""
+        return self.evaluate_timeframe_codes(name)[('Overall', 'Overall')]
 
     def determine_overall_status(self, bias_timeframes, confirmation_timeframes):
-        status_count = {'positive': 0, 'neutral': 0, 'negative': 0}
+        status_codes = []
 
         for tf in bias_timeframes:
             if tf in self.timeframes:
-                tf_status = self.evaluate_timeframe(tf)['Overall']
-                if tf_status in status_count:
-                    status_count[tf_status] += 1
-
+                status_codes.append(self.timeframe_overall_code(tf))
 
         for tf in confirmation_timeframes:
             if tf in self.timeframes:
-                tf_status = self.evaluate_timeframe(tf)['Overall']
-                if tf_status in status_count:
-                    status_count[tf_status] += 1
+                status_codes.append(self.timeframe_overall_code(tf))
 
         if self.active_time_frame and self.active_time_frame in self.timeframes:
-            tf_status = self.evaluate_timeframe(tf)['Overall']
-            if tf_status in status_count:
-                status_count[tf_status] += 1
+            status_codes.append(self.timeframe_overall_code(self.active_time_frame))
 
-        majority_status = max(status_count, key=status_count.get)
-        return majority_status if status_count[majority_status] > sum(status_count.values()) / 2 else 'neutral'
+        return decode_statuses(majority_vote(np.array(status_codes, dtype=np.int8)))
 
 
     def evaluate_majority_status(self, statuses):
-        status_count = {'positive': 0, 'neutral': 0, 'negative': 0}
-        for status in statuses:
-            status_count[status] += 1
-        majority = max(status_count, key=status_count.get)
-        return majority if status_count[majority] > len(statuses) / 2 else 'neutral'
+        return decode_statuses(majority_vote(encode_statuses(statuses)))
     
-    def backtest(self, initial_capital=10000):
+    def timeframe_status_series(self, name, data=None, _group_cache=None):
+        """
+        Computes the status of every signal group of a timeframe, and the timeframe's overall status,
+        at every bar of its history in a single pass.
+
+        Group statuses come from `SignalGroup.evaluate_group_series`; the timeframe status follows the
+        same rule as `evaluate_timeframe`, applied to whole columns at once.
+
+        Args:
+        - name (str): The timeframe whose signal groups should be evaluated.
+        - data (pd.DataFrame, optional): The data to evaluate on. Defaults to the timeframe's own data.
+
+        Returns:
+        pd.DataFrame: int8 status codes indexed like `data`, with one column per signal group plus 'Overall'.
+        """
+        if data is None:
+            data = self.timeframes[name]['data']
+        group_cache = {} if _group_cache is None else _group_cache
+
+        group_codes = {}
+        with tagged(timeframe=name):
+            for group in self.timeframes[name]['signal_groups']:
+                if id(group) not in group_cache:
+                    group_cache[id(group)] = group.evaluate_group_series(data, codes=True)['Overall'].to_numpy()
+                group_codes[group.name] = group_cache[id(group)]
+
+        results = pd.DataFrame(group_codes, index=data.index, dtype=np.int8)
+        results['Overall'] = plurality_vote(results.to_numpy(), axis=1)
+        return results
+
+    def overall_status_series(self, data=None):
+        """
+        Computes the overall status (majority vote of the bias, confirmation and active timeframes)
+        at every bar of `data`, mirroring the per-bar replay performed by the original `backtest`.
+
+        Args:
+        - data (pd.DataFrame, optional): The data every timeframe is evaluated on. Defaults to the first timeframe's data.
+
+        Returns:
+        pd.Series: int8 overall status codes indexed like `data`.
+        """
+        if data is None:
+            data = self.timeframes[list(self.timeframes.keys())[0]]['data']
+
+        voting_timeframes = self.voting_timeframes()
+        group_cache = {}
+        votes = np.empty((len(data), len(voting_timeframes)), dtype=np.int8)
+        for i, tf in enumerate(voting_timeframes):
+            votes[:, i] = self.timeframe_status_series(tf, data, group_cache)['Overall'].to_numpy()
+
+        return pd.Series(majority_vote(votes, axis=1), index=data.index, name='Overall')
+
+    def voting_timeframes(self):
+        """
+        Returns the timeframes voting on the overall status: the existing bias and confirmation timeframes,
+        then the active timeframe. A timeframe listed twice votes twice, as in `determine_overall_status`.
+        """
+        voting_timeframes = [tf for tf in self.bias_timeframes + self.confirmation_timeframes if tf in self.timeframes]
+        if self.active_time_frame and self.active_time_frame in self.timeframes:
+            voting_timeframes.append(self.active_time_frame)
+        return voting_timeframes
+
+    def base_timeframe(self):
+        """Returns the timeframe statuses are aligned on and trades are simulated on: the active timeframe, else the first one."""
+        if self.active_time_frame in self.timeframes:
+            return self.active_time_frame
+        return list(self.timeframes.keys())[0]
+
+    def status_matrix(self, base=None):
+        """
+        Aligns the status history of every voting timeframe on the bars of a base timeframe, without lookahead.
+
+        Each timeframe is evaluated on its own data. A bar's status becomes known when the bar closes (see
+        `resample.bar_close_times`), and each base bar gets the latest status known at its own close, as a
+        backward `merge_asof` on the close times. A higher timeframe therefore contributes the status of its
+        last completed bar, never of the bar still in progress. Bars before a timeframe's first close are neutral.
+
+        Args:
+        - base (str, optional): The timeframe to align on. Defaults to `base_timeframe()`.
+
+        Returns:
+        pd.DataFrame: int8 status codes indexed like the base timeframe's data, one column per voting timeframe.
+        """
+        base = base or self.base_timeframe()
+        base_index = self.timeframes[base]['data'].index
+        base_close = pd.DataFrame({'known_at': bar_close_times(base_index, base).astype('datetime64[ns]')})
+
+        columns = {}
+        for tf in dict.fromkeys(self.voting_timeframes()):
+            self.ensure_indicators(tf)
+            statuses = self.timeframe_status_series(tf)['Overall']
+            if tf == base:
+                columns[tf] = statuses.to_numpy()
+                continue
+            known = pd.DataFrame({'known_at': bar_close_times(statuses.index, tf).astype('datetime64[ns]'), 'status': statuses.to_numpy()})
+            aligned = pd.merge_asof(base_close, known.sort_values('known_at'), on='known_at', direction='backward')
+            columns[tf] = aligned['status'].fillna(NEUTRAL).to_numpy()
+
+        return pd.DataFrame(columns, index=base_index, columns=list(columns), dtype=np.int8)
+
+    def overall_status_history(self, base=None):
+        """
+        Computes the overall status (majority vote of the bias, confirmation and active timeframes) at every bar
+        of a base timeframe, from the aligned statuses of `status_matrix`.
+
+        Args:
+        - base (str, optional): The timeframe to compute the history on. Defaults to `base_timeframe()`.
+
+        Returns:
+        pd.Series: int8 overall status codes indexed like the base timeframe's data.
+        """
+        matrix = self.status_matrix(base)
+        votes = matrix[self.voting_timeframes()].to_numpy()
+        return pd.Series(majority_vote(votes, axis=1), index=matrix.index, name='Overall')
+
+    def backtest_signals(self):
+        """
+        Builds the close prices and boolean entry/exit arrays used by the vectorized backtest, trading the
+        base timeframe on the overall status history of `overall_status_history`.
+
+        Returns:
+        tuple: (close prices, entries, exits) as pd.Series aligned on the base timeframe's index.
+        """
+        base = self.base_timeframe()
+        self.ensure_indicators(base)
+
+        price_data = self.timeframes[base]['data']
+        overall_status = self.overall_status_history(base)
+
+        # Entries while already holding (and exits while flat) are ignored by from_signals,
+        # which reproduces the holding toggle of the bar-by-bar replay.
+        entries = overall_status == 1
+        exits = overall_status == -1
+        return price_data['close'], entries.rename('buy'), exits.rename('sell')
+
+    def backtest(self, initial_capital=10000, vectorized=True):
         """
         Perform a backtest on the historical data using the trading signals generated
         by the framework's evaluation logic.
 
         Args:
         - initial_capital (float): The starting capital for the backtest.
+        - vectorized (bool): If True (default), computes the status history of every signal, group and
+          timeframe in one pass and trades the active timeframe on the aligned statuses of all timeframes.
+          If False, replays `determine_overall_status` bar by bar on slices of the first timeframe's data (O(N^2)).
 
         Returns:
         A vectorbt Portfolio object containing the results of the backtest.
         """
+        if not vectorized:
+            return self._replay_backtest(initial_capital)
+
+        with timer('backtest_signals'):
+            close_prices, entries, exits = self.backtest_signals()
+        # vectorbt is imported on the first backtest, so processes that only evaluate never load it
+        import vectorbt as vbt
+        with timer('backtest') as span:
+            portfolio = vbt.Portfolio.from_signals(close_prices, entries, exits, init_cash=initial_capital)
+            span.add(rows=len(close_prices))
+
+        return portfolio
+
+    def _replay_backtest(self, initial_capital=10000):
+        """
+        Bar-by-bar replay backtest: re-evaluates the framework on every growing slice of the first
+        timeframe's data. Kept as the reference implementation for the vectorized backtest.
+        """
         price_data = self.timeframes[list(self.timeframes.keys())[0]]['data']
         signals = pd.DataFrame(index=price_data.index, columns=['buy', 'sell'])
 
@@ -203,7 +647,8 @@ class TradingFramework:
             # No explicit action for 'neutral' or when holding status doesn't change
 
         # Backtest using vectorbt
+        import vectorbt as vbt
         close_prices = price_data['close']
-        portfolio = vbt.Portfolio.from_signals(close_prices, signals['buy'].fillna(False), signals['sell'].fillna(False), init_cash=initial_capital)
+        portfolio = vbt.Portfolio.from_signals(close_prices, signals['buy'].fillna(False).astype(bool), signals['sell'].fillna(False).astype(bool), init_cash=initial_capital)
         
         return portfolio
\ No newline at end of file
@@ -0,0 +1,191 @@
+import pandas as pd
+
+
+# pandas-ta default parameters of the indicators used by the framework's strategies
+INDICATOR_DEFAULTS = {
+    'sma': {'length': 10},
+    'ema': {'length': 10},
+    'wma': {'length': 10},
+    'dema': {'length': 10},
+    'tema': {'length': 10},
+    'rma': {'length': 10},
+    'rsi': {'length': 14},
+    'macd': {'fast': 12, 'slow': 26, 'signal': 9},
+    'bbands': {'length': 5},
+    'adx': {'length': 14},
+    'atr': {'length': 14},
+    'stoch': {'k': 14, 'd': 3, 'smooth_k': 3},
+    'stochrsi': {'length': 14, 'rsi_length': 14, 'k': 3, 'd': 3},
+    'ichimoku': {'tenkan': 9, 'kijun': 26, 'senkou': 52},
+    'cci': {'length': 14},
+    'willr': {'length': 14},
+    'roc': {'length': 10},
+    'mom': {'length': 10},
+    'donchian': {'lower_length': 20, 'upper_length': 20},
+}
+
+# Indicators built on exponential smoothing: every value depends on the whole history through a recursion.
+# Their state is carried into new bars by a warm-up window long enough for the recursion to converge.
+RECURSIVE_INDICATORS = {'ema', 'dema', 'tema', 'rma', 'rsi', 'macd', 'adx', 'atr', 'stochrsi'}
+
+# Parameters holding a window length. Chained windows (e.g. stoch's k, d and smooth_k) add up.
+LENGTH_PARAMETERS = ('length', 'fast', 'slow', 'signal', 'k', 'd', 'smooth_k', 'rsi_length',
+                     'tenkan', 'kijun', 'senkou', 'lower_length', 'upper_length')
+
+# Indicators with columns that read later bars, and the parameter holding how many: ichimoku's chikou span
+# is the close shifted back by kijun bars, so the last kijun values change as new bars arrive
+FORWARD_PARAMETERS = {'ichimoku': 'kijun'}
+
+# Columns every timeframe has before any indicator is computed
+BASE_COLUMNS = {'open', 'high', 'low', 'close', 'volume', 'vw', 'n'}
+
+# Warm-up in multiples of the length for recursive indicators. The weight of the state
+# before the warm-up decays to (1 - 1/length) ** (10 * length) < 5e-5, even for Wilder's smoothing.
+RECURSIVE_WARMUP_FACTOR = 10
+
+
+def indicator_lookback(entry, warmup_factor=RECURSIVE_WARMUP_FACTOR):
+    """
+    Returns how many bars before a new bar an indicator needs to reproduce a full-history value.
+
+    Parameters:
+    - entry (dict): A `ta.Strategy` entry, e.g. {'kind': 'rsi', 'length': 14}.
+    - warmup_factor (int, optional): Warm-up multiple applied to recursive indicators.
+
+    Returns:
+    int: The number of bars, or None if the indicator is not known.
+    """
+    kind = entry.get('kind')
+    if kind not in INDICATOR_DEFAULTS:
+        return None
+
+    params = {**INDICATOR_DEFAULTS[kind], **entry}
+    lookback = sum(int(params[name]) for name in LENGTH_PARAMETERS if isinstance(params.get(name), (int, float)))
+    if kind in RECURSIVE_INDICATORS:
+        lookback *= warmup_factor
+    return lookback
+
+
+def as_strategy(strategy):
+    """
+    Returns a strategy as a `ta.Strategy`. Strategies may also be given as dicts of the `ta.Strategy` fields
+    ('name', 'ta', 'description'), e.g. as restored from a snapshot; they are converted when they are used, so
+    pandas-ta is only imported once indicators are actually computed.
+    """
+    if isinstance(strategy, dict):
+        import pandas_ta as ta
+        return ta.Strategy(**strategy)
+    return strategy
+
+
+def strategy_definition(strategy):
+    """Returns the fields of a `ta.Strategy` (or of a strategy dict) as a dict that `as_strategy` converts back."""
+    if isinstance(strategy, dict):
+        return dict(strategy)
+    return {'name': strategy.name, 'ta': strategy.ta, 'description': strategy.description}
+
+
+def strategy_lookback(strategy, warmup_factor=RECURSIVE_WARMUP_FACTOR):
+    """
+    Returns the longest lookback of all indicators in a `ta.Strategy`, or None if it contains an
+    unknown indicator or no explicit indicator list (e.g. `ta.AllStrategy`).
+    """
+    if strategy is None or not strategy.ta:
+        return None
+
+    lookbacks = [indicator_lookback(entry, warmup_factor) for entry in strategy.ta]
+    if any(lookback is None for lookback in lookbacks):
+        return None
+    return max(lookbacks)
+
+
+def indicator_lead(entry):
+    """Returns how many later bars an indicator reads (see `FORWARD_PARAMETERS`), 0 if it only reads past bars."""
+    kind = entry.get('kind')
+    if kind not in FORWARD_PARAMETERS:
+        return 0
+    return int({**INDICATOR_DEFAULTS[kind], **entry}[FORWARD_PARAMETERS[kind]])
+
+
+def strategy_lead(strategy):
+    """
+    Returns how many bars before a new bar a `ta.Strategy`'s indicators change when the bar arrives because
+    they read later bars (see `FORWARD_PARAMETERS`), 0 if none do.
+    """
+    if strategy is None or not strategy.ta:
+        return 0
+    return max((indicator_lead(entry) for entry in strategy.ta), default=0)
+
+
+def apply_strategy_sequential(data, strategy):
+    """Applies a `ta.Strategy` to `data` in place without spawning a multiprocessing pool, which only pays off on long histories."""
+    import pandas_ta  # registers the DataFrame.ta accessor
+    data.ta.cores = 0
+    data.ta.strategy(strategy)
+    return data
+
+
+_indicator_columns_cache = {}
+
+
+def indicator_columns(entry, sample):
+    """
+    Returns the columns a `ta.Strategy` entry adds, by running the indicator on a small sample of the data.
+    Results are cached per entry, so each indicator configuration is only probed once.
+
+    Parameters:
+    - entry (dict): A `ta.Strategy` entry, e.g. {'kind': 'bbands', 'length': 20, 'std': 2}.
+    - sample (pd.DataFrame): OHLCV bars to probe the indicator on; a few hundred bars are enough.
+
+    Returns:
+    list: The column names, or None if the indicator could not be computed on the sample.
+    """
+    key = repr(sorted(entry.items(), key=lambda item: item[0]))
+    if key not in _indicator_columns_cache:
+        params = {name: value for name, value in entry.items() if name not in ('kind', 'col_names')}
+        import pandas_ta  # registers the DataFrame.ta accessor
+        try:
+            result = getattr(sample.copy().ta, entry['kind'])(**params)
+        except Exception:
+            return None
+        if isinstance(result, tuple):
+            result = result[0]
+        if result is None:
+            return None
+
+        columns = [result.name] if isinstance(result, pd.Series) else list(result.columns)
+        if entry.get('col_names'):
+            columns = list(entry['col_names'])[:len(columns)]
+        _indicator_columns_cache[key] = columns
+
+    return _indicator_columns_cache[key]
+
+
+def minimal_strategy(strategy, required_columns, sample):
+    """
+    Reduces a `ta.Strategy` to the indicators that produce at least one of the required columns.
+    Indicators whose columns cannot be determined are kept.
+
+    Parameters:
+    - strategy (ta.Strategy): The full strategy.
+    - required_columns (set): The columns the signals read.
+    - sample (pd.DataFrame): OHLCV bars to probe the indicators on.
+
+    Returns:
+    tuple: (the reduced ta.Strategy, or None if no indicator is needed, and the set of required columns that
+    neither the data nor any indicator provides).
+    """
+    entries = []
+    unresolved = set(required_columns) - BASE_COLUMNS - set(sample.columns)
+    for entry in strategy.ta:
+        columns = indicator_columns(entry, sample)
+        if columns is None or set(columns) & set(required_columns):
+            entries.append(entry)
+        if columns:
+            unresolved -= set(columns)
+
+    if not entries:
+        return None, unresolved
+    import pandas_ta as ta
+    reduced = ta.Strategy(name=f"{strategy.name} (minimal)", ta=entries, description=strategy.description)
+    return reduced, unresolved
@@ -0,0 +1,427 @@
+import contextvars
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+import pandas as pd
+
+# Tags inherited by every timer and counter in the current context, see `tagged`
+_context_tags = contextvars.ContextVar('instrumentation_tags', default=())
+
+# Prefix of every metric in the Prometheus export
+METRIC_PREFIX = 'tradingframework'
+
+_REPO_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+
+class _NullSpan:
+    """The span returned while instrumentation is disabled: entering, leaving and adding amounts do nothing."""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add(self, **amounts):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class NullInstrumentation:
+    """
+    The instrumentation used while disabled. Every hook returns immediately, so instrumented hot paths only
+    pay for a function call.
+    """
+    enabled = False
+    profiler = None
+
+    def timer(self, stage, **tags):
+        return _NULL_SPAN
+
+    def count(self, name, value=1, **tags):
+        pass
+
+    def summary(self):
+        return pd.DataFrame()
+
+    def counters(self):
+        return pd.DataFrame()
+
+    def to_prometheus(self, prefix=METRIC_PREFIX):
+        return ''
+
+    def reset(self):
+        pass
+
+
+class Span:
+    """
+    Times one execution of a stage. Amounts processed by the stage, e.g. rows or bytes, can be added while it
+    runs and are aggregated with its timings.
+    """
+    __slots__ = ('instrumentation', 'stage', 'tags', 'amounts', 'started')
+
+    def __init__(self, instrumentation, stage, tags):
+        self.instrumentation = instrumentation
+        self.stage = stage
+        self.tags = tags
+        self.amounts = None
+        self.started = None
+
+    def __enter__(self):
+        self.instrumentation._enter(self.stage)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        self.instrumentation._exit()
+        self.instrumentation._record(self.stage, self.tags, elapsed, self.amounts)
+        return False
+
+    def add(self, **amounts):
+        """Adds amounts processed by the stage, e.g. span.add(rows=len(df), bytes=len(body))."""
+        if self.amounts is None:
+            self.amounts = {}
+        for name, value in amounts.items():
+            self.amounts[name] = self.amounts.get(name, 0) + value
+
+
+class Instrumentation:
+    """
+    Aggregates per-stage timings and counters in the current process, tagged by e.g. ticker and timeframe.
+
+    Stages are timed with `timer`, which inherits the tags set by enclosing `tagged` blocks. Worker processes
+    (see `parallel.py`) have their own, disabled instrumentation.
+
+    Attributes:
+    - timings (dict): [calls, total, min, max, amounts] of every (stage, tags).
+    - counts (dict): The value of every (counter, tags).
+    - profiler (SamplingProfiler): The sampling profiler, if enabled with `profile=True`.
+
+    Methods:
+    - timer(stage, **tags): Returns a context manager timing one execution of a stage.
+    - count(name, value, **tags): Adds to a counter.
+    - summary(): Returns the stage timings as a table.
+    - counters(): Returns the counters as a table.
+    - to_prometheus(prefix): Returns every metric in the Prometheus text exposition format.
+    - reset(): Drops every metric.
+    """
+    enabled = True
+
+    def __init__(self, profile=False, interval=0.005):
+        self.timings = {}
+        self.counts = {}
+        self._lock = threading.Lock()
+        # Stack of running stages of each thread, read by the profiler
+        self._stages = {}
+        self.profiler = SamplingProfiler(self, interval) if profile else None
+
+    def timer(self, stage, **tags):
+        """
+        Returns a context manager timing one execution of a stage.
+
+        Parameters:
+        - stage (str): The stage, e.g. 'fetch', 'indicators', 'signal' or 'backtest'.
+        - tags: Tags of the measurement, added to those of enclosing `tagged` blocks, e.g. timeframe='1h'.
+
+        Returns:
+        Span: Use as `with timer(...) as span:`, and `span.add(rows=...)` to record amounts processed.
+        """
+        return Span(self, stage, _merge_tags(tags))
+
+    def count(self, name, value=1, **tags):
+        """Adds `value` to the counter `name`, tagged like `timer`."""
+        key = (name, _merge_tags(tags))
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + value
+
+    def summary(self):
+        """
+        Returns the stage timings as a table.
+
+        Returns:
+        pd.DataFrame: One row per stage and tags with the number of calls, the total, mean, min and max time
+        in seconds, the amounts added by the spans (e.g. 'rows', 'bytes') and their rates per second
+        (e.g. 'rows_per_second', the bars per second of the stage).
+        """
+        with self._lock:
+            timings = [(stage, tags, list(stats[:4]), dict(stats[4])) for (stage, tags), stats in self.timings.items()]
+        rows = []
+        for stage, tags, (calls, total, fastest, slowest), amounts in timings:
+            row = {'stage': stage, **dict(tags), 'calls': calls, 'total': total, 'mean': total / calls, 'min': fastest, 'max': slowest}
+            for name, value in amounts.items():
+                row[name] = value
+                row[f'{name}_per_second'] = value / total if total else float('nan')
+            rows.append(row)
+        if not rows:
+            return pd.DataFrame()
+        tag_names = {name for _, tags, _, _ in timings for name, _ in tags}
+        return _table(rows, 'stage', tag_names).sort_values('total', ascending=False, kind='stable').reset_index(drop=True)
+
+    def counters(self):
+        """
+        Returns the counters as a table.
+
+        Returns:
+        pd.DataFrame: One row per counter and tags with its value.
+        """
+        with self._lock:
+            counts = list(self.counts.items())
+        if not counts:
+            return pd.DataFrame()
+        rows = [{'counter': name, **dict(tags), 'value': value} for (name, tags), value in counts]
+        return _table(rows, 'counter', {name for (_, tags), _ in counts for name, _ in tags})
+
+    def to_prometheus(self, prefix=METRIC_PREFIX):
+        """
+        Returns every metric in the Prometheus text exposition format: per stage the call count, total seconds
+        and added amounts, and every counter.
+
+        Parameters:
+        - prefix (str, optional): The prefix of the metric names.
+
+        Returns:
+        str: The metrics, one sample per line.
+        """
+        with self._lock:
+            timings = [(stage, tags, stats[0], stats[1], dict(stats[4])) for (stage, tags), stats in self.timings.items()]
+            counts = list(self.counts.items())
+
+        lines = []
+        if timings:
+            lines += [f'# HELP {prefix}_stage_calls_total Number of executions of each stage.', f'# TYPE {prefix}_stage_calls_total counter']
+            lines += [f'{prefix}_stage_calls_total{_labels(tags, stage=stage)} {calls}' for stage, tags, calls, _, _ in timings]
+            lines += [f'# HELP {prefix}_stage_seconds_total Time spent in each stage.', f'# TYPE {prefix}_stage_seconds_total counter']
+            lines += [f'{prefix}_stage_seconds_total{_labels(tags, stage=stage)} {total!r}' for stage, tags, _, total, _ in timings]
+            for amount in sorted({name for *_, amounts in timings for name in amounts}):
+                metric = f'{prefix}_stage_{_metric_name(amount)}_total'
+                lines += [f'# TYPE {metric} counter']
+                lines += [f'{metric}{_labels(tags, stage=stage)} {amounts[amount]!r}' for stage, tags, _, _, amounts in timings if amount in amounts]
+        for name in sorted({name for (name, _), _ in counts}):
+            metric = f'{prefix}_{_metric_name(name)}_total'
+            lines += [f'# TYPE {metric} counter']
+            lines += [f'{metric}{_labels(tags)} {value!r}' for (counter, tags), value in counts if counter == name]
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    def reset(self):
+        with self._lock:
+            self.timings.clear()
+            self.counts.clear()
+        if self.profiler is not None:
+            self.profiler.samples.clear()
+
+    def _enter(self, stage):
+        self._stages.setdefault(threading.get_ident(), []).append(stage)
+
+    def _exit(self):
+        stages = self._stages.get(threading.get_ident())
+        if stages:
+            stages.pop()
+
+    def _record(self, stage, tags, elapsed, amounts):
+        key = (stage, tags)
+        with self._lock:
+            stats = self.timings.get(key)
+            if stats is None:
+                self.timings[key] = [1, elapsed, elapsed, elapsed, Counter(amounts or {})]
+            else:
+                stats[0] += 1
+                stats[1] += elapsed
+                stats[2] = min(stats[2], elapsed)
+                stats[3] = max(stats[3], elapsed)
+                if amounts:
+                    stats[4].update(amounts)
+
+
+class SamplingProfiler:
+    """
+    A sampling profiler attributing where the time inside instrumented stages goes. A background thread
+    periodically takes the stack of every thread that is inside a stage and counts the function at the top of
+    the stack, and the innermost function of this repository calling it (e.g. a pandas-ta internal called from
+    `apply_strategy`).
+
+    Attributes:
+    - interval (float): Seconds between samples.
+    - samples (Counter): The number of samples of every (stage, function, caller).
+
+    Methods:
+    - start(): Starts sampling.
+    - stop(): Stops sampling.
+    - report(limit): Returns the most sampled functions as a table.
+    """
+    def __init__(self, instrumentation, interval=0.005):
+        self.instrumentation = instrumentation
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='SamplingProfiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def report(self, limit=20):
+        """
+        Returns the most sampled functions.
+
+        Parameters:
+        - limit (int, optional): The number of rows.
+
+        Returns:
+        pd.DataFrame: One row per (stage, function, caller) with its samples, its share of all samples and the
+        estimated time spent in it.
+        """
+        total = sum(self.samples.values())
+        rows = [{'stage': stage, 'function': function, 'caller': caller, 'samples': samples,
+                 'share': samples / total, 'seconds': samples * self.interval}
+                for (stage, function, caller), samples in self.samples.most_common(limit)]
+        return pd.DataFrame(rows, columns=['stage', 'function', 'caller', 'samples', 'share', 'seconds'])
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread, frame in sys._current_frames().items():
+                if thread == own:
+                    continue
+                try:
+                    # The owning thread pushes and pops its stages without a lock, so the stack may empty at any time
+                    stage = self.instrumentation._stages.get(thread, [])[-1]
+                except IndexError:
+                    continue
+                self.samples[(stage, _frame_name(frame), _repo_caller(frame))] += 1
+
+
+# The instrumentation every hook reports to
+_active = NullInstrumentation()
+
+
+def enable(profile=False, interval=0.005):
+    """
+    Enables instrumentation in the current process, replacing any previous metrics.
+
+    Parameters:
+    - profile (bool, optional): If True, also starts a SamplingProfiler.
+    - interval (float, optional): Seconds between the profiler's samples.
+
+    Returns:
+    Instrumentation: The instrumentation collecting the metrics.
+    """
+    global _active
+    disable()
+    _active = Instrumentation(profile, interval)
+    if _active.profiler is not None:
+        _active.profiler.start()
+    return _active
+
+
+def disable():
+    """
+    Disables instrumentation, restoring the no-op hooks.
+
+    Returns:
+    Instrumentation: The instrumentation that was active, with its metrics, or a NullInstrumentation.
+    """
+    global _active
+    previous = _active
+    if previous.profiler is not None:
+        previous.profiler.stop()
+    _active = NullInstrumentation()
+    return previous
+
+
+def active():
+    """Returns the instrumentation hooks currently report to."""
+    return _active
+
+
+def timer(stage, **tags):
+    """Times one execution of a stage with the active instrumentation, see `Instrumentation.timer`."""
+    return _active.timer(stage, **tags)
+
+
+def count(name, value=1, **tags):
+    """Adds to a counter of the active instrumentation, see `Instrumentation.count`."""
+    _active.count(name, value, **tags)
+
+
+def tagged(**tags):
+    """
+    Returns a context manager adding tags to every timer and counter inside it, e.g. the ticker for everything
+    a watchlist item does. Tags follow the context, including into coroutines and nested calls.
+    """
+    if not _active.enabled:
+        return _NULL_SPAN
+    return _TagScope(tags)
+
+
+class _TagScope:
+    __slots__ = ('tags', 'token')
+
+    def __init__(self, tags):
+        self.tags = tags
+        self.token = None
+
+    def __enter__(self):
+        self.token = _context_tags.set(_merge_tags(self.tags))
+        return self
+
+    def __exit__(self, *exc):
+        _context_tags.reset(self.token)
+        return False
+
+
+def _merge_tags(tags):
+    """Returns the context's tags overridden by `tags`, as a hashable sorted tuple."""
+    inherited = _context_tags.get()
+    if not tags:
+        return inherited
+    merged = dict(inherited)
+    merged.update((name, str(value)) for name, value in tags.items() if value is not None)
+    return tuple(sorted(merged.items()))
+
+
+def _table(rows, first, tag_names):
+    """Builds a table with the tag columns after `first`, followed by the value columns."""
+    df = pd.DataFrame(rows)
+    tag_columns = sorted(tag_names)
+    return df[[first] + tag_columns + [column for column in df.columns if column != first and column not in tag_names]]
+
+
+def _labels(tags, **extra):
+    labels = {**extra, **dict(tags)}
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+    return '{' + ','.join(f'{_metric_name(name)}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+
+def _metric_name(name):
+    return ''.join(char if char.isalnum() else '_' for char in name)
+
+
+def _frame_name(frame):
+    return f'{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}'
+
+
+def _repo_caller(frame):
+    """Returns the innermost frame of the stack that belongs to this repository."""
+    while frame is not None:
+        if os.path.dirname(os.path.abspath(frame.f_code.co_filename)) == _REPO_DIRECTORY:
+            return f'{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}:{frame.f_lineno}'
+        frame = frame.f_back
+    return None
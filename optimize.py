@@ -0,0 +1,296 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from indicators import indicator_lead
+from signals import _signal_codes
+
+
+def _grid(params):
+    """Expands a dict of parameter lists (or single values) into a list of parameter dicts, one per combination."""
+    names = list(params)
+    values = [value if isinstance(value, (list, tuple, np.ndarray, range)) else [value] for value in params.values()]
+    return [dict(zip(names, combination)) for combination in itertools.product(*values)]
+
+
+def _compute_indicator(data, kind, params):
+    """
+    Computes one indicator configuration on `data`.
+
+    Returns:
+    pd.DataFrame: The indicator's output columns.
+    """
+    if callable(kind):
+        result = kind(data, **params)
+    else:
+        import pandas_ta  # registers the DataFrame.ta accessor
+        result = getattr(data.ta, kind)(**params)
+    if isinstance(result, tuple):
+        result = result[0]
+    return result.to_frame() if isinstance(result, pd.Series) else result
+
+
+def portfolio_metrics(portfolio, freq=None):
+    """
+    Returns the metrics the sweep ranks by for every column of a vectorbt Portfolio.
+
+    Returns:
+    pd.DataFrame: One row per column with 'total_return', 'max_drawdown', 'trades', 'win_rate' and, if the bar
+    frequency is known, 'sharpe_ratio'.
+    """
+    metrics = pd.DataFrame({'total_return': portfolio.total_return(),
+                            'max_drawdown': portfolio.max_drawdown(),
+                            'trades': portfolio.trades.count(),
+                            'win_rate': portfolio.trades.win_rate()})
+    if freq:
+        metrics['sharpe_ratio'] = portfolio.sharpe_ratio()
+    return metrics
+
+
+def check_metric(metric, freq):
+    """Raises a ValueError if `metric` cannot be computed: 'sharpe_ratio' is only known with the bar frequency."""
+    if metric == 'sharpe_ratio' and not freq:
+        raise ValueError("Ranking by 'sharpe_ratio' needs the bar frequency, which could not be inferred from the index "
+                         "(e.g. stock bars skip weekends and holidays). Pass freq, e.g. freq='1D'.")
+
+
+class ParameterSweep:
+    """
+    Backtests every combination of a grid of indicator parameters and signal thresholds in one vectorized pass.
+
+    Indicators are computed once per unique configuration. The signal rules of `generate_signal_score` are then
+    broadcast across all threshold combinations, the signals vote like a SignalGroup (positive if positives
+    outnumber negatives, negative if the reverse), and all combinations are simulated as the columns of a single
+    `vbt.Portfolio.from_signals` call, entering on a positive vote and exiting on a negative one. Combinations are
+    processed in chunks of columns so memory stays bounded on large grids.
+
+    Attributes:
+    - data (pd.DataFrame): The OHLCV bars to optimize on.
+    - initial_capital (float): The starting capital of every backtest.
+    - fees (float): Fees per trade, as a fraction of the traded value.
+    - freq (str): The bar frequency used for annualized metrics. Inferred from the index if omitted.
+    - indicators (dict): The configurations and outputs of each indicator added with `add_indicator`.
+    - signals (dict): The rules and threshold grids of each signal added with `add_signal`.
+
+    Methods:
+    - add_indicator(name, kind, **grid): Adds an indicator with a grid of parameters.
+    - add_signal(name, source, ...): Adds a signal rule with grids of thresholds.
+    - lead(): Returns how many later bars the indicators read by the signals look at.
+    - signal_chunks(chunk_size, rows): Yields the entries and exits of every combination, chunk by chunk.
+    - combination_signals(combinations, rows): Returns the entries and exits of some combinations.
+    - run(metric, chunk_size): Backtests every combination and returns a ranked metrics table.
+    """
+    def __init__(self, data, initial_capital=10000, fees=0.0, freq=None):
+        self.data = data
+        self.initial_capital = initial_capital
+        self.fees = fees
+        self.freq = freq or pd.infer_freq(data.index)
+        self.indicators = {}
+        self.signals = {}
+
+    def add_indicator(self, name, kind, **grid):
+        """
+        Adds an indicator and computes it for every combination of its parameter grid.
+
+        Parameters:
+        - name (str): The name signals refer to the indicator by.
+        - kind (str or callable): A pandas-ta indicator name, e.g. 'rsi', or a function taking the data and
+          the parameters and returning a pd.Series or pd.DataFrame.
+        - grid: Lists of values for each parameter, e.g. length=[7, 14, 21]. Single values are held fixed.
+        """
+        configs = _grid(grid)
+        outputs = [_compute_indicator(self.data, kind, params) for params in configs]
+        self.indicators[name] = {'kind': kind, 'configs': configs, 'outputs': outputs}
+
+    def add_signal(self, name, source, column=0, signal_line=None, threshold_up=None, threshold_down=None, neutral_zone=None, inverted=False):
+        """
+        Adds a signal following the rules of `generate_signal_score`, with grids of thresholds.
+
+        Parameters:
+        - name (str): The name of the signal.
+        - source (str): An indicator added with `add_indicator`, or a column of the data, e.g. 'close'.
+        - column (int or str, optional): The output column of the indicator to read, by position or by name
+          prefix (e.g. 'MACDh'), since the names of pandas-ta columns contain the parameters.
+        - signal_line (int or str, optional): The line to compare against for crossover signals: a column of
+          the data, an output column of the same indicator by position or name prefix, or the first output
+          column of another indicator, by its name or by a prefix of the output names (e.g. 'SMA' for price
+          crossing an SMA). The line of another indicator follows that indicator's parameter grid.
+        - threshold_up (float or list, optional): Values of the upper threshold to try.
+        - threshold_down (float or list, optional): Values of the lower threshold to try.
+        - neutral_zone (float or list, optional): Values of the crossover tolerance to try.
+        - inverted (bool, optional): If True, inverts the interpretation of 'positive' and 'negative' signals.
+        """
+        if source not in self.indicators and source not in self.data:
+            print(f"Signal {name}: {source} is neither an indicator nor a column of the data.")
+            return
+        line_source, line_column = self._resolve_line(source, signal_line)
+        if signal_line is not None and line_source is None and signal_line not in self.data:
+            print(f"Signal {name}: signal line {signal_line} is neither a column of the data nor an output of an indicator.")
+            return
+        if signal_line is not None:
+            grid = {'neutral_zone': neutral_zone if neutral_zone is not None else 0}
+        else:
+            grid = {'threshold_up': threshold_up, 'threshold_down': threshold_down}
+        self.signals[name] = {'source': source, 'column': column, 'signal_line': signal_line, 'line_source': line_source,
+                              'line_column': line_column, 'inverted': inverted, 'configs': _grid(grid)}
+
+    def _resolve_line(self, source, signal_line):
+        """
+        Returns the indicator and output column a signal line is read from, see `add_signal`, or (None, None)
+        for no line or a column of the data.
+        """
+        if signal_line is None or (isinstance(signal_line, str) and signal_line in self.data):
+            return None, None
+        if source in self.indicators:
+            columns = self.indicators[source]['outputs'][0].columns
+            if isinstance(signal_line, int) or any(str(name).startswith(signal_line) for name in columns):
+                return source, signal_line
+        if signal_line in self.indicators:
+            return signal_line, 0
+        for name, indicator in self.indicators.items():
+            if isinstance(signal_line, str) and any(str(column).startswith(signal_line) for column in indicator['outputs'][0].columns):
+                return name, signal_line
+        return None, None
+
+    def lead(self):
+        """
+        Returns how many later bars the indicators read by the signals look at (see `indicators.indicator_lead`),
+        e.g. ichimoku's chikou span; 0 if they only read past bars. Callable indicators are assumed to read past bars.
+        """
+        sources = {name for signal in self.signals.values() for name in (signal['source'], signal['line_source'])}
+        return max((indicator_lead({'kind': indicator['kind'], **params})
+                    for name, indicator in self.indicators.items() if name in sources and isinstance(indicator['kind'], str)
+                    for params in indicator['configs']), default=0)
+
+    def dimensions(self):
+        """Returns (name, configs) of every dimension of the grid: one per indicator, then one per signal."""
+        return [(name, indicator['configs']) for name, indicator in self.indicators.items()] + \
+               [(name, signal['configs']) for name, signal in self.signals.items()]
+
+    def size(self):
+        """Returns the number of combinations in the grid."""
+        return int(np.prod([len(configs) for _, configs in self.dimensions()]))
+
+    def _select(self, output, column):
+        """Returns one output column of an indicator configuration, by position or by name prefix."""
+        if isinstance(column, str):
+            matches = [name for name in output.columns if str(name).startswith(column)]
+            if not matches:
+                return np.full(len(output), np.nan)
+            column = list(output.columns).index(matches[0])
+        return output.iloc[:, column].to_numpy(dtype=float)
+
+    def _column_matrix(self, source, column):
+        """Returns a column of the data, or an output column of every configuration of an indicator, as an (n, configs) matrix."""
+        if source not in self.indicators:
+            return self.data[source].to_numpy(dtype=float)[:, None]
+        return np.column_stack([self._select(output, column) for output in self.indicators[source]['outputs']])
+
+    def _parameter_index(self, positions):
+        """Builds the column index of a chunk from the grid position of each combination in every dimension."""
+        arrays, names = [], []
+        for (name, configs), position in zip(self.dimensions(), positions):
+            for param in (configs[0] if configs else {}):
+                arrays.append(np.array([config[param] for config in configs], dtype=object)[position])
+                names.append(f'{name}.{param}')
+        return pd.MultiIndex.from_arrays(arrays, names=names)
+
+    def signal_chunks(self, chunk_size=1000, rows=None):
+        """
+        Yields the entries and exits of every combination, `chunk_size` combinations at a time.
+
+        Parameters:
+        - chunk_size (int, optional): The number of combinations per chunk.
+        - rows (slice, optional): The bars to compute the signals for, by position. The indicators are already
+          computed on the whole history, so windows of it (e.g. walk-forward folds) do not recompute them.
+
+        Yields:
+        tuple: (entries, exits), boolean DataFrames indexed like the data with one column per combination,
+        labelled by a MultiIndex of the parameters.
+        """
+        lines = self._signal_lines(rows)
+        for start in range(0, self.size(), chunk_size):
+            yield self._combination_signals(np.arange(start, min(start + chunk_size, self.size())), lines, rows)
+
+    def combination_signals(self, combinations, rows=None):
+        """
+        Returns the entries and exits of some combinations, given by their position in the grid (the order of
+        `signal_chunks`), in the same form as `signal_chunks`.
+        """
+        return self._combination_signals(np.atleast_1d(combinations), self._signal_lines(rows), rows)
+
+    def _signal_lines(self, rows=None):
+        """Returns the values each signal reads, once per indicator configuration, and its threshold grids."""
+        rows = rows if rows is not None else slice(None)
+        lines = {}
+        for name, signal in self.signals.items():
+            source, signal_line = signal['source'], signal['signal_line']
+            values = self._column_matrix(source, signal['column'] if source in self.indicators else None)[rows]
+            if signal_line is None:
+                signal_values = None
+            elif signal['line_source'] is None:
+                signal_values = self.data[signal_line].to_numpy(dtype=float)[rows, None]
+            else:
+                signal_values = self._column_matrix(signal['line_source'], signal['line_column'])[rows]
+            thresholds = {param: np.array([np.nan if config[param] is None else config[param] for config in signal['configs']], dtype=float)
+                          for param in signal['configs'][0]}
+            lines[name] = (values, signal_values, thresholds)
+        return lines
+
+    def _config_positions(self, source, positions, size):
+        """Returns the configuration of an indicator each combination reads: its grid position, or 0 for a column of the data."""
+        if source not in self.indicators:
+            return np.zeros(size, dtype=np.intp)
+        return positions[list(self.indicators).index(source)]
+
+    def _combination_signals(self, combinations, lines, rows=None):
+        index = self.data.index[rows if rows is not None else slice(None)]
+        positions = np.unravel_index(combinations, tuple(len(configs) for _, configs in self.dimensions()))
+
+        votes = np.zeros((len(index), len(combinations)), dtype=np.int64)
+        for i, (name, signal) in enumerate(self.signals.items()):
+            values, signal_values, thresholds = lines[name]
+            # Column of each combination in the (n, configs) matrices; data columns have a single one
+            config = self._config_positions(signal['source'], positions, len(combinations))
+            thresholds = {param: grid[positions[len(self.indicators) + i]] for param, grid in thresholds.items()}
+            if signal_values is not None:
+                line = signal_values[:, self._config_positions(signal['line_source'], positions, len(combinations))]
+                votes += _signal_codes(values[:, config], signal_values=line,
+                                       tolerance=thresholds['neutral_zone'], inverted=signal['inverted'])
+            else:
+                votes += _signal_codes(values[:, config], threshold_up=thresholds['threshold_up'],
+                                       threshold_down=thresholds['threshold_down'], inverted=signal['inverted'])
+
+        overall = np.sign(votes).astype(np.int8)
+        columns = self._parameter_index(positions)
+        return (pd.DataFrame(overall == 1, index=index, columns=columns),
+                pd.DataFrame(overall == -1, index=index, columns=columns))
+
+    def run(self, metric='total_return', chunk_size=1000, ascending=False):
+        """
+        Backtests every combination and ranks them.
+
+        Parameters:
+        - metric (str, optional): The column to rank by: 'total_return', 'sharpe_ratio' (needs `freq`), 'max_drawdown',
+          'trades' or 'win_rate'.
+        - chunk_size (int, optional): The number of combinations simulated per `from_signals` call.
+        - ascending (bool, optional): If True, ranks the lowest values first.
+
+        Returns:
+        pd.DataFrame: One row per combination, indexed by its parameters, sorted by `metric`.
+        """
+        if not self.signals:
+            print("No signals to optimize.")
+            return pd.DataFrame()
+        check_metric(metric, self.freq)
+
+        # vectorbt is imported on the first run, so building a sweep's signals never loads it
+        import vectorbt as vbt
+        close = self.data['close']
+        results = []
+        for entries, exits in self.signal_chunks(chunk_size):
+            portfolio = vbt.Portfolio.from_signals(close, entries, exits, init_cash=self.initial_capital, fees=self.fees, freq=self.freq)
+            results.append(portfolio_metrics(portfolio, self.freq))
+
+        return pd.concat(results).sort_values(metric, ascending=ascending, na_position='last')
@@ -0,0 +1,349 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from indicators import INDICATOR_DEFAULTS
+from resample import SESSIONS, bar_bounds
+from scheduler import SessionCalendar
+from store import read_frame, write_frame
+
+
+class MarketPanel:
+    """
+    Daily OHLCV bars of a whole market in columnar form: one wide DataFrame per field, indexed by the bar's open
+    (as in a framework's '1D' timeframe) with one column per ticker. A ticker without a bar on a date is NaN.
+
+    Built from the grouped daily endpoint, one request per date for the whole market, and stored locally as
+    raw arrays (see `store.write_frame`), so it is only extended by the dates it does not hold yet.
+
+    Attributes:
+    - fields (dict): The wide DataFrame of each of `FIELDS`.
+    - asset_type (str): 'Stock' or 'Crypto'.
+    - closed (set): Calendar sessions the endpoint returned no bars for (e.g. unlisted holidays), which are
+      not requested again. Dates whose request failed are neither held nor closed, so they are.
+
+    Methods:
+    - append(grouped): Adds the grouped daily bars of some dates.
+    - update(fetcher, end, days): Fetches the sessions missing up to `end`.
+    - history(ticker): Returns the daily bars of one ticker.
+    - latest_bars(rows, tickers): Returns the last bars of every ticker as aligned arrays.
+    - save(path) / load(path): Stores the panel / restores it, memory-mapped.
+    """
+    FIELDS = ['open', 'high', 'low', 'close', 'volume']
+
+    def __init__(self, fields=None, asset_type='Stock', closed=None):
+        self.fields = fields if fields is not None else {}
+        self.asset_type = asset_type
+        self.closed = set(closed or ())
+
+    @property
+    def index(self):
+        return self.fields['close'].index if self.fields else pd.DatetimeIndex([])
+
+    @property
+    def tickers(self):
+        return self.fields['close'].columns if self.fields else pd.Index([])
+
+    def __len__(self):
+        return len(self.index)
+
+    def dates(self):
+        """Returns the market calendar dates the panel holds bars for."""
+        timezone = SESSIONS.get(self.asset_type, SESSIONS['Crypto'])['timezone']
+        return self.index.tz_localize('UTC').tz_convert(timezone).tz_localize(None).normalize()
+
+    def append(self, grouped):
+        """
+        Adds the grouped daily bars of some dates, replacing dates the panel already holds. Dates without bars
+        are recorded in `closed`.
+
+        Parameters:
+        - grouped (dict): The bars of each date, indexed by ticker, as returned by `FetchData.fetch_grouped`.
+        """
+        self.closed.update(pd.Timestamp(date).normalize() for date, df in grouped.items() if df.empty)
+        grouped = {date: df for date, df in grouped.items() if not df.empty}
+        if not grouped:
+            return
+        # Dates are market calendar days; their bars are labelled by the day's open in naive UTC, like daily bars of FetchData
+        timezone = SESSIONS.get(self.asset_type, SESSIONS['Crypto'])['timezone']
+        labels = [bar_bounds(pd.Timestamp(date).tz_localize(timezone).tz_convert('UTC').tz_localize(None), '1D', self.asset_type)[0]
+                  for date in grouped]
+        long = pd.concat([df[[field for field in self.FIELDS if field in df]] for df in grouped.values()], keys=labels, names=['timestamp', 'ticker'])
+        for field in self.FIELDS:
+            wide = long[field].astype(np.float64).unstack('ticker')
+            if field in self.fields:
+                existing = self.fields[field]
+                wide = pd.concat([existing[~existing.index.isin(wide.index)], wide])
+            self.fields[field] = wide.sort_index()
+        # Tickers in a stable order, so panels updated on different days line up
+        tickers = self.fields['close'].columns.sort_values()
+        for field in self.FIELDS:
+            self.fields[field] = self.fields[field].reindex(columns=tickers)
+
+    def update(self, fetcher, end=None, days=365, holidays=()):
+        """
+        Fetches the grouped daily bars of the calendar sessions up to `end` that the panel does not hold: the
+        ones after its last date, and the ones an earlier update failed to fetch.
+
+        Parameters:
+        - fetcher (FetchData): The fetcher to request the grouped daily endpoint with.
+        - end (datetime or str, optional): The last date to fetch. Defaults to yesterday (UTC), the last complete day.
+        - days (int, optional): How many days back an empty panel is filled from.
+        - holidays (list, optional): Dates without a stock session, which are not requested.
+
+        Returns:
+        int: The number of dates added.
+        """
+        end = pd.Timestamp(end) if end is not None else pd.Timestamp.now(tz='UTC').tz_localize(None).normalize() - pd.Timedelta(days=1)
+        held = self.dates()
+        start = held[0] if len(held) else end - pd.Timedelta(days=days - 1)
+
+        calendar = SessionCalendar(self.asset_type, holidays=holidays)
+        missing = pd.date_range(start, end, freq='D').difference(held)
+        dates = [day for day in missing if day not in self.closed and calendar.session(day) is not None]
+        grouped = fetcher.fetch_grouped(dates, self.asset_type)
+        self.append(grouped)
+        return sum(not df.empty for df in grouped.values())
+
+    def history(self, ticker):
+        """Returns the daily OHLCV bars of one ticker, without the dates it did not trade."""
+        df = pd.DataFrame({field: frame[ticker] for field, frame in self.fields.items()})
+        return df.dropna(subset=['close'])
+
+    def tail(self, rows, tickers=None):
+        """Returns a panel of the last `rows` dates, optionally of only some tickers."""
+        return MarketPanel({field: (frame if tickers is None else frame[tickers]).iloc[-rows:] for field, frame in self.fields.items()},
+                           self.asset_type, self.closed)
+
+    def latest_bars(self, rows, tickers=None):
+        """
+        Returns the last `rows` bars of every ticker, aligned by bar rather than by date: the dates a ticker did not
+        trade are skipped, so each column holds the ticker's own series (as in `history`) and indicators computed
+        down it match those of the ticker's data. Tickers with fewer bars are padded with NaN at the top.
+
+        Parameters:
+        - rows (int): The number of bars.
+        - tickers (list, optional): The tickers, all by default.
+
+        Returns:
+        dict: The (rows, tickers) float64 array of each field, plus the bars' timestamps under 'timestamp' (NaT
+        for the padding).
+        """
+        frames = {field: (frame if tickers is None else frame[tickers]) for field, frame in self.fields.items()}
+        close = frames['close'].to_numpy(dtype=np.float64)
+        # A stable sort of the traded flags moves each ticker's missing dates to the top, keeping its bars in order
+        order = np.argsort(~np.isnan(close), axis=0, kind='stable')[-rows:]
+        bars = {field: np.take_along_axis(frame.to_numpy(dtype=np.float64), order, axis=0) for field, frame in frames.items()}
+        timestamps = np.broadcast_to(frames['close'].index.to_numpy()[:, None], close.shape)
+        bars['timestamp'] = np.where(np.isnan(bars['close']), np.datetime64('NaT'), np.take_along_axis(timestamps, order, axis=0))
+        return bars
+
+    def save(self, path):
+        """Stores the panel in a directory, one `store.write_frame` frame per field."""
+        os.makedirs(path, exist_ok=True)
+        for field, frame in self.fields.items():
+            write_frame(os.path.join(path, field), frame)
+        with open(os.path.join(path, 'panel.json'), 'w') as f:
+            json.dump({'asset_type': self.asset_type, 'fields': list(self.fields),
+                       'closed': sorted(date.strftime('%Y-%m-%d') for date in self.closed)}, f)
+
+    @classmethod
+    def load(cls, path, mmap_mode='c'):
+        """Restores a panel stored with `save`, memory-mapping its arrays. Returns an empty panel if none is stored."""
+        if not os.path.exists(os.path.join(path, 'panel.json')):
+            return cls()
+        with open(os.path.join(path, 'panel.json')) as f:
+            header = json.load(f)
+        return cls({field: read_frame(os.path.join(path, field), mmap_mode=mmap_mode) for field in header['fields']}, header['asset_type'],
+                   [pd.Timestamp(date) for date in header.get('closed', [])])
+
+
+# Vectorized counterparts of pandas-ta indicators over a (dates, tickers) array. Each reproduces the pandas-ta
+# computation and column names of a ticker's own series, up to the warm-up of recursive indicators: an EMA
+# seeded on the panel's first dates converges to the one of the full history after a few lengths.
+
+def _rolling(values, length, reduce):
+    """Applies `reduce` over a trailing window of `length` dates; windows with a missing value are NaN."""
+    result = np.full(values.shape, np.nan)
+    if len(values) >= length:
+        result[length - 1:] = reduce(sliding_window_view(values, length, axis=0), axis=-1)
+    return result
+
+
+def _ewm(values, alpha, adjust=False, min_periods=0):
+    """
+    Exponentially weighted mean down the dates of every ticker, like `pd.DataFrame.ewm(alpha=alpha,
+    adjust=adjust).mean()`. Missing values do not contribute; the mean carries over them.
+    """
+    result = np.full(values.shape, np.nan)
+    numerator = np.zeros(values.shape[1:])
+    denominator = np.zeros(values.shape[1:])
+    observations = np.zeros(values.shape[1:])
+    mean = np.full(values.shape[1:], np.nan)
+    for i, row in enumerate(values):
+        valid = ~np.isnan(row)
+        observations += valid
+        if adjust:
+            numerator = (1 - alpha) * numerator + np.where(valid, row, 0)
+            denominator = (1 - alpha) * denominator + valid
+            mean = np.where(denominator > 0, numerator / np.where(denominator > 0, denominator, 1), np.nan)
+        else:
+            mean = np.where(valid, np.where(np.isnan(mean), row, (1 - alpha) * mean + alpha * row), mean)
+        result[i] = np.where(observations >= max(min_periods, 1), mean, np.nan)
+    return result
+
+
+def _rma(values, length):
+    """pandas-ta's rma: Wilder's moving average."""
+    return _ewm(values, 1 / length, adjust=True, min_periods=length)
+
+
+def _sma(values, length):
+    return _rolling(values, length, np.mean)
+
+
+def _ema(values, length):
+    """pandas-ta's ema: seeded with the SMA of each ticker's first `length` values."""
+    valid = ~np.isnan(values)
+    observations = np.cumsum(valid, axis=0)
+    seed = valid & (observations == length)
+    sums = np.cumsum(np.where(valid, values, 0), axis=0)
+    seeded = np.where(observations < length, np.nan, values)
+    seeded[seed] = sums[seed] / length
+    return _ewm(seeded, 2 / (length + 1))
+
+
+def _midprice(high, low, length):
+    return 0.5 * (_rolling(high, length, np.max) + _rolling(low, length, np.min))
+
+
+def _shift(values, periods):
+    result = np.full(values.shape, np.nan)
+    if periods >= 0:
+        result[periods:] = values[:len(values) - periods]
+    else:
+        result[:periods] = values[-periods:]
+    return result
+
+
+def _true_range(high, low, close):
+    previous = _shift(close, 1)
+    return np.fmax(high - low, np.fmax(np.abs(high - previous), np.abs(low - previous))) + np.where(np.isnan(previous), np.nan, 0)
+
+
+def panel_sma(fields, length):
+    return {f'SMA_{length}': _sma(fields['close'], length)}
+
+
+def panel_ema(fields, length):
+    return {f'EMA_{length}': _ema(fields['close'], length)}
+
+
+def panel_rsi(fields, length):
+    change = np.diff(fields['close'], axis=0, prepend=np.nan)
+    positive = _rma(np.where(change > 0, change, np.where(np.isnan(change), np.nan, 0)), length)
+    negative = _rma(np.where(change < 0, -change, np.where(np.isnan(change), np.nan, 0)), length)
+    # Flat prices give 0 / 0, which pandas-ta leaves as NaN as well
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {f'RSI_{length}': 100 * positive / (positive + negative)}
+
+
+def panel_macd(fields, fast, slow, signal):
+    macd = _ema(fields['close'], fast) - _ema(fields['close'], slow)
+    signal_line = _ema(macd, signal)
+    suffix = f'{fast}_{slow}_{signal}'
+    return {f'MACD_{suffix}': macd, f'MACDh_{suffix}': macd - signal_line, f'MACDs_{suffix}': signal_line}
+
+
+def panel_bbands(fields, length, std=2.0):
+    std = float(std)
+    mid = _sma(fields['close'], length)
+    deviations = std * _rolling(fields['close'], length, np.std)
+    lower, upper = mid - deviations, mid + deviations
+    suffix = f'{length}_{std}'
+    # Flat prices give zero-width bands, which pandas-ta leaves as NaN / inf as well
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {f'BBL_{suffix}': lower, f'BBM_{suffix}': mid, f'BBU_{suffix}': upper,
+                f'BBB_{suffix}': 100 * (upper - lower) / mid, f'BBP_{suffix}': (fields['close'] - lower) / (upper - lower)}
+
+
+def panel_atr(fields, length):
+    return {f'ATRr_{length}': _rma(_true_range(fields['high'], fields['low'], fields['close']), length)}
+
+
+def panel_adx(fields, length):
+    high, low = fields['high'], fields['low']
+    atr = _rma(_true_range(high, low, fields['close']), length)
+    up = high - _shift(high, 1)
+    down = _shift(low, 1) - low
+    positive = np.where((up > down) & (up > 0), up, np.where(np.isnan(up), np.nan, 0))
+    negative = np.where((down > up) & (down > 0), down, np.where(np.isnan(down), np.nan, 0))
+    dmp = 100 / atr * _rma(positive, length)
+    dmn = 100 / atr * _rma(negative, length)
+    dx = 100 * np.abs(dmp - dmn) / (dmp + dmn)
+    return {f'ADX_{length}': _rma(dx, length), f'DMP_{length}': dmp, f'DMN_{length}': dmn}
+
+
+def panel_stoch(fields, k, d, smooth_k):
+    lowest = _rolling(fields['low'], k, np.min)
+    highest = _rolling(fields['high'], k, np.max)
+    spread = highest - lowest
+    # pandas-ta's non_zero_range: a flat window divides by epsilon instead of zero
+    stoch = 100 * (fields['close'] - lowest) / np.where(spread == 0, np.finfo(float).eps, spread)
+    stoch_k = _sma(stoch, smooth_k)
+    suffix = f'{k}_{d}_{smooth_k}'
+    return {f'STOCHk_{suffix}': stoch_k, f'STOCHd_{suffix}': _sma(stoch_k, d)}
+
+
+def panel_ichimoku(fields, tenkan, kijun, senkou):
+    tenkan_sen = _midprice(fields['high'], fields['low'], tenkan)
+    kijun_sen = _midprice(fields['high'], fields['low'], kijun)
+    return {f'ITS_{tenkan}': tenkan_sen, f'IKS_{kijun}': kijun_sen,
+            f'ISA_{tenkan}': _shift(0.5 * (tenkan_sen + kijun_sen), kijun),
+            f'ISB_{kijun}': _shift(_midprice(fields['high'], fields['low'], senkou), kijun),
+            f'ICS_{kijun}': _shift(fields['close'], -kijun)}
+
+
+# Panel counterpart of each supported pandas-ta indicator, and the parameters it takes besides INDICATOR_DEFAULTS
+PANEL_INDICATORS = {
+    'sma': (panel_sma, ()),
+    'ema': (panel_ema, ()),
+    'rsi': (panel_rsi, ()),
+    'macd': (panel_macd, ()),
+    'bbands': (panel_bbands, ('std',)),
+    'atr': (panel_atr, ()),
+    'adx': (panel_adx, ()),
+    'stoch': (panel_stoch, ()),
+    'ichimoku': (panel_ichimoku, ()),
+}
+
+
+def panel_indicator(fields, entry):
+    """
+    Computes a `ta.Strategy` entry on a panel.
+
+    Parameters:
+    - fields (dict): The (dates, tickers) float arrays of open, high, low, close and volume.
+    - entry (dict): A `ta.Strategy` entry, e.g. {'kind': 'bbands', 'length': 20, 'std': 2}.
+
+    Returns:
+    dict: The (dates, tickers) array of each column the indicator adds, named as pandas-ta names them, or None
+    if the indicator or one of its parameters has no panel counterpart.
+    """
+    if entry.get('kind') not in PANEL_INDICATORS:
+        return None
+    function, extra = PANEL_INDICATORS[entry['kind']]
+    params = dict(INDICATOR_DEFAULTS[entry['kind']])
+    for name, value in entry.items():
+        if name in ('kind', 'col_names'):
+            continue
+        if name not in params and name not in extra:
+            return None
+        params[name] = value
+    columns = function(fields, **params)
+    if entry.get('col_names'):
+        columns = dict(zip(entry['col_names'], columns.values()))
+    return columns
@@ -0,0 +1,143 @@
+import copy
+import os
+import pickle
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    # Pickles lambdas and functions defined in notebooks, which the standard pickle cannot ship to workers
+    import cloudpickle
+except ImportError:
+    cloudpickle = None
+
+from store import read_frame, write_frame
+
+
+def dumps(obj):
+    """Pickles an object for a worker process, with cloudpickle when it is installed."""
+    return (cloudpickle or pickle).dumps(obj)
+
+
+class FrameRef:
+    """
+    Stands in for the data of a timeframe while its framework is shipped to a worker process.
+    The data itself is written once as raw arrays and memory-mapped by the worker instead of being pickled.
+
+    Attributes:
+    - path (str): The directory the frame was written to with `write_frame`.
+    """
+    def __init__(self, path):
+        self.path = path
+
+
+def detach_framework(framework, directory):
+    """
+    Returns a shallow copy of a framework whose timeframe data is written to `directory` and replaced by `FrameRef`s.
+    """
+    detached = copy.copy(framework)
+    detached.timeframes = {}
+    for i, (name, timeframe) in enumerate(framework.timeframes.items()):
+        path = os.path.join(directory, str(i))
+        write_frame(path, timeframe['data'])
+        detached.timeframes[name] = {**timeframe, 'data': FrameRef(path)}
+    return detached
+
+
+def attach_framework(framework, mmap_mode='c'):
+    """
+    Replaces the `FrameRef`s of a detached framework by the memory-mapped frames. With the default copy-on-write
+    mode the frames can be modified without touching the files.
+    """
+    for timeframe in framework.timeframes.values():
+        if isinstance(timeframe['data'], FrameRef):
+            timeframe['data'] = read_frame(timeframe['data'].path, mmap_mode=mmap_mode)
+    return framework
+
+
+def evaluate_framework_task(framework):
+    """Worker task: evaluates every timeframe and the overall status of a framework."""
+    evaluation = framework.evaluate()
+    overall_status = framework.determine_overall_status(framework.bias_timeframes, framework.confirmation_timeframes)
+    return evaluation, overall_status
+
+
+def backtest_task(framework, initial_capital):
+    """
+    Worker task: backtests a framework and returns its vectorbt Portfolio serialized with `Portfolio.dumps`,
+    since portfolios do not support plain pickling.
+    """
+    return framework.backtest(initial_capital=initial_capital).dumps()
+
+
+def backtest_signals_task(framework):
+    """Worker task: returns the close prices, entries and exits of a framework's vectorized backtest."""
+    return framework.backtest_signals()
+
+
+def _run_task(task, payload, args):
+    """
+    Runs a task on a pickled, detached framework inside a worker. Timeframes whose indicators the task computed
+    are written back next to the original arrays, so the parent can pick them up without recomputing.
+    """
+    framework = pickle.loads(payload)
+    paths = {name: timeframe['data'].path for name, timeframe in framework.timeframes.items()}
+    last_calculation = dict(framework.last_calculation)
+    attach_framework(framework)
+
+    result = task(framework, *args)
+
+    recomputed = {}
+    for name, path in paths.items():
+        if framework.last_calculation.get(name) != last_calculation.get(name):
+            write_frame(path, framework.timeframes[name]['data'])
+            recomputed[name] = framework.last_calculation[name]
+    return result, recomputed
+
+
+def _shared_memory_directory():
+    """Returns a RAM-backed directory for the shipped arrays where available (Linux), else the default temp directory."""
+    return '/dev/shm' if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK) else None
+
+
+def run_in_processes(items, task, workers, *args):
+    """
+    Runs `task(framework, *args)` for the framework of every item in a pool of worker processes.
+
+    Each framework's data is written once to shared memory and memory-mapped by its worker. Indicators
+    computed by a worker are copied back into the item's framework. Results are collected in item order,
+    and a failing item does not stop the others.
+
+    Parameters:
+    - items (list): The WatchlistItems to process; all must have a framework.
+    - task (callable): A module-level function taking a framework and `args`.
+    - workers (int): The number of worker processes.
+
+    Returns:
+    dict: The task's result for each ticker, or the exception raised while processing it, in item order.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='watchlist-', dir=_shared_memory_directory()) as directory:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {}
+            for i, item in enumerate(items):
+                try:
+                    detached = detach_framework(item.framework, os.path.join(directory, str(i)))
+                    payload = dumps(detached)
+                except Exception as e:
+                    results[item.ticker] = e
+                    continue
+                futures[item.ticker] = (item, detached, executor.submit(_run_task, task, payload, args))
+
+            for ticker, (item, detached, future) in futures.items():
+                try:
+                    result, recomputed = future.result()
+                except Exception as e:
+                    results[ticker] = e
+                    continue
+
+                for name, last_calculation in recomputed.items():
+                    item.framework.timeframes[name]['data'] = read_frame(detached.timeframes[name]['data'].path)
+                    item.framework.last_calculation[name] = last_calculation
+                results[ticker] = result
+
+    return results
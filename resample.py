@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+from pandas.tseries.frequencies import to_offset
+
+
+# How each Polygon.io aggregate column combines when bars are merged into a coarser bar
+OHLCV_AGGREGATION = {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum', 'n': 'sum'}
+
+# Trading session of each asset type: the exchange timezone bars are aligned in, the regular session hours
+# and the extended hours Polygon.io reports bars for
+SESSIONS = {
+    'Stock': {'timezone': 'America/New_York', 'open': '09:30', 'close': '16:00', 'extended_open': '04:00', 'extended_close': '20:00'},
+    'Crypto': {'timezone': 'UTC', 'open': None, 'close': None, 'extended_open': None, 'extended_close': None},
+}
+
+
+def is_intraday(timeframe):
+    """Returns True if a pandas frequency string (e.g. '30min', '4h') describes bars shorter than a day."""
+    offset = to_offset(timeframe)
+    return isinstance(offset, pd.offsets.Tick) and pd.Timedelta(offset) < pd.Timedelta(days=1)
+
+
+def nominal_length(timeframe):
+    """Returns the length of one bar of a pandas frequency string, e.g. 7 days for '1W' and 31 days for '1MS'."""
+    offset = to_offset(timeframe)
+    period_start = offset.rollback(pd.Timestamp('2000-01-03'))
+    return (period_start + offset) - period_start
+
+
+def bar_bounds(time, timeframe, asset_type='Crypto'):
+    """
+    Returns the open and the nominal close of the bar containing `time`, with the bins aligned as in
+    `resample_ohlcv`: intraday stock bars start at the 09:30 New York open, daily and longer stock bars follow
+    New York calendar days, and crypto bars are aligned to UTC midnight.
+
+    Parameters:
+    - time (pd.Timestamp): A naive UTC timestamp.
+    - timeframe (str): A pandas frequency string, e.g. '30min', '4h', '1D', '1W', '1MS'.
+    - asset_type (str, optional): 'Stock' or 'Crypto'; selects the session in `SESSIONS`.
+
+    Returns:
+    tuple: The (open, close) naive UTC timestamps of the bar.
+    """
+    session = SESSIONS.get(asset_type, SESSIONS['Crypto'])
+    local = pd.Timestamp(time).tz_localize('UTC').tz_convert(session['timezone']).tz_localize(None)
+    offset = to_offset(timeframe)
+
+    if is_intraday(timeframe):
+        # Bins are counted in wall-clock time from the session open, so they stay aligned across DST changes
+        length = pd.Timedelta(offset)
+        origin = local.normalize()
+        if session['open']:
+            hours, minutes = session['open'].split(':')
+            origin += pd.Timedelta(hours=int(hours), minutes=int(minutes))
+        start = origin + (local - origin) // length * length
+        end = start + length
+    else:
+        start = offset.rollback(local.normalize())
+        end = start + offset
+
+    return tuple(bound.tz_localize(session['timezone'], ambiguous=False, nonexistent='shift_forward').tz_convert('UTC').tz_localize(None)
+                 for bound in (start, end))
+
+
+def bar_close_times(index, timeframe=None):
+    """
+    Returns the time each bar closes, i.e. when its values become known. A bar closes when the next bar
+    opens, but no later than its nominal length after its own open, so gaps such as weekends or missing bars do
+    not delay it. Without a parseable timeframe the last bar is assumed to last as long as the one before it.
+
+    Parameters:
+    - index (pd.DatetimeIndex): The sorted open timestamps of the bars.
+    - timeframe (str, optional): The pandas frequency string of the bars, e.g. '4h' or '1D'.
+
+    Returns:
+    pd.DatetimeIndex: The close time of each bar.
+    """
+    if len(index) == 0:
+        return pd.DatetimeIndex(index)
+    try:
+        length = nominal_length(timeframe) if timeframe else None
+    except ValueError:
+        length = None
+
+    if length is None:
+        length = index[-1] - index[-2] if len(index) > 1 else pd.Timedelta(0)
+        return index[1:].append(pd.DatetimeIndex([index[-1] + length]))
+    next_open = index[1:].append(pd.DatetimeIndex([index[-1] + length]))
+    return pd.DatetimeIndex(np.minimum(next_open.to_numpy(), (index + length).to_numpy()))
+
+
+def resample_ohlcv(df, timeframe, asset_type='Crypto', regular_hours=False):
+    """
+    Resamples OHLCV bars into a coarser timeframe.
+
+    Open/high/low/close/volume are aggregated as first/max/min/last/sum, the trade count is summed and the
+    volume-weighted price is re-weighted by volume. Bins are aligned to the asset's session: intraday bars of
+    stocks start at the 09:30 New York open (so '1h' gives 09:30, 10:30, ...) and daily and longer bars
+    follow New York calendar days, while crypto bars are aligned to UTC midnight. Bins without any trades are
+    dropped.
+
+    Parameters:
+    - df (pd.DataFrame): OHLCV bars indexed by naive UTC timestamps, as returned by `FetchData`.
+    - timeframe (str): A pandas frequency string, e.g. '2h', '1D', '1W', '1MS'.
+    - asset_type (str, optional): 'Stock' or 'Crypto'; selects the session in `SESSIONS`.
+    - regular_hours (bool, optional): If True, extended-hours bars of intraday timeframes are dropped first.
+
+    Returns:
+    pd.DataFrame: The resampled bars, indexed by the naive UTC timestamp of each bar's open.
+    """
+    session = SESSIONS.get(asset_type, SESSIONS['Crypto'])
+    # Bins are formed in wall-clock time, so intraday stock bins stay aligned to the session open across DST changes
+    local = df.tz_localize('UTC').tz_convert(session['timezone']).tz_localize(None)
+
+    resample_kwargs = {'closed': 'left', 'label': 'left'}
+    if is_intraday(timeframe) and session['open']:
+        if regular_hours:
+            local = local.between_time(session['open'], session['close'], inclusive='left')
+        hours, minutes = session['open'].split(':')
+        resample_kwargs['offset'] = pd.Timedelta(hours=int(hours), minutes=int(minutes))
+
+    # Compact data may hold volumes as float32, which is too coarse for their sums
+    local = local.astype({column: np.float64 for column in ('volume', 'n') if column in local and local[column].dtype == np.float32})
+    bins = local.resample(timeframe, **resample_kwargs)
+    resampled = bins.agg({column: how for column, how in OHLCV_AGGREGATION.items() if column in local})
+    if 'vw' in local and 'volume' in local:
+        resampled['vw'] = (local['vw'] * local['volume']).resample(timeframe, **resample_kwargs).sum() / resampled['volume']
+    resampled = resampled[df.columns.intersection(resampled.columns)].dropna(subset=['close'])
+
+    resampled = resampled.tz_localize(session['timezone'], ambiguous=False, nonexistent='shift_forward')
+    return resampled.tz_convert('UTC').tz_localize(None).rename_axis(df.index.name)
+
+
+def build_timeframes(base_data, timeframes, asset_type='Crypto', regular_hours=False):
+    """
+    Builds every requested timeframe from a single base series.
+
+    Timeframes finer than the base series' bar spacing cannot be built and are skipped.
+
+    Parameters:
+    - base_data (pd.DataFrame): OHLCV bars of the base granularity, as returned by `FetchData`.
+    - timeframes (list): Pandas frequency strings of the timeframes to build.
+    - asset_type (str, optional): 'Stock' or 'Crypto'; selects the session in `SESSIONS`.
+    - regular_hours (bool, optional): If True, extended-hours bars are dropped from intraday timeframes.
+
+    Returns:
+    dict: The resampled DataFrame for each buildable timeframe.
+    """
+    if len(base_data) < 2:
+        print("Not enough base data to resample.")
+        return {}
+
+    base_spacing = pd.Series(base_data.index).diff().min()
+    timeframe_data = {}
+    for timeframe in timeframes:
+        if nominal_length(timeframe) < base_spacing:
+            print(f"Timeframe {timeframe} is finer than the base data and was skipped.")
+            continue
+        timeframe_data[timeframe] = resample_ohlcv(base_data, timeframe, asset_type, regular_hours)
+
+    return timeframe_data
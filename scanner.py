@@ -0,0 +1,188 @@
+import numpy as np
+import pandas as pd
+
+from framework import TradingFramework
+from instrumentation import timer
+from panel import panel_indicator
+from status import POSITIVE, encode_statuses, group_vote, plurality_vote
+
+
+class MarketScanner:
+    """
+    Screens a whole market with the daily signal groups of a TradingFramework, as a first pass before the full
+    multi-timeframe evaluation of a Watchlist.
+
+    The indicators the groups read are computed for every ticker at once on a MarketPanel (see
+    `panel.panel_indicator`) down the last `lookback` bars of each ticker, and the SignalSpec signals of each
+    group are scored on the latest bar of every ticker in one call of the group's compiled kernel. Callable
+    signals are evaluated ticker by ticker on the ticker's bars and indicators, so they cost far more per ticker
+    than spec signals.
+
+    Attributes:
+    - framework (TradingFramework): The framework whose timeframe strategy and signal groups screen the market.
+    - timeframe (str): The framework's daily timeframe.
+    - min_price (float): Tickers whose latest close is lower are skipped.
+    - min_dollar_volume (float): Tickers whose average daily close x volume over `liquidity_window` dates is lower are skipped.
+    - min_history (int): Tickers with fewer daily bars are skipped.
+    - lookback (int): The number of bars of each ticker indicators are computed on, enough for their warm-up.
+    - liquidity_window (int): The number of dates the dollar volume is averaged over.
+    - signal_codes (pd.DataFrame): The int8 codes of the last scan, one row per ticker and one column per
+      (group, signal), with each group's overall status under (group, 'Overall') and the timeframe's under
+      ('Overall', 'Overall'), as in `TradingFramework.evaluate_timeframe_codes`.
+
+    Methods:
+    - scan(panel): Screens the panel and returns the ranked tickers.
+    - candidates(results, top, status): Returns the best ranked tickers with the given overall status.
+    - promote(watchlist, tickers, fetcher, asset_type): Adds tickers to a Watchlist with a framework like `framework`.
+    """
+    def __init__(self, framework, timeframe='1D', min_price=1.0, min_dollar_volume=1e6, min_history=50, lookback=250, liquidity_window=20):
+        self.framework = framework
+        self.timeframe = timeframe
+        self.min_price = min_price
+        self.min_dollar_volume = min_dollar_volume
+        self.min_history = min_history
+        self.lookback = lookback
+        self.liquidity_window = liquidity_window
+        self.signal_codes = None
+
+    @property
+    def groups(self):
+        return self.framework.timeframes[self.timeframe]['signal_groups']
+
+    def eligible(self, panel):
+        """
+        Returns the tickers that traded on the panel's last date and pass the price, liquidity and history filters.
+
+        Returns:
+        pd.DataFrame: The latest close ('close') and average dollar volume ('dollar_volume') of each eligible ticker.
+        """
+        close = panel.fields['close']
+        latest = close.iloc[-1]
+        dollar_volume = (close * panel.fields['volume']).iloc[-self.liquidity_window:].mean()
+        keep = latest.notna() & (latest >= self.min_price) & (dollar_volume >= self.min_dollar_volume) & (close.count() >= self.min_history)
+        return pd.DataFrame({'close': latest, 'dollar_volume': dollar_volume})[keep.to_numpy()]
+
+    def indicators(self, fields):
+        """
+        Computes the indicator columns the signal groups read, for every ticker at once.
+
+        Parameters:
+        - fields (dict): The (bars, tickers) arrays of open, high, low, close and volume, e.g. from `MarketPanel.latest_bars`.
+
+        Returns:
+        dict: The (bars, tickers) array of each column, including the fields.
+        """
+        required = set()
+        for group in self.groups:
+            required.update(group.required_columns() or [])
+
+        columns = dict(fields)
+        # The entries are read as they are, so pandas-ta is not imported for strategies kept as dicts (see `as_strategy`)
+        strategy = self.framework.strategies.get(self.timeframe)
+        entries = (strategy.get('ta') if isinstance(strategy, dict) else strategy.ta) if strategy is not None else None
+        unsupported = []
+        for entry in entries or []:
+            computed = panel_indicator(fields, entry)
+            if computed is None:
+                unsupported.append(entry.get('kind'))
+                continue
+            if required & set(computed):
+                columns.update(computed)
+        missing = required - set(columns)
+        if missing:
+            print(f"Columns {sorted(missing)} read by the {self.timeframe} signals are not computed on the panel"
+                  f"{' (unsupported indicators: ' + ', '.join(map(str, unsupported)) + ')' if unsupported else ''}; they score neutral.")
+        return columns
+
+    def scan(self, panel):
+        """
+        Screens every eligible ticker of a panel with the signal groups and ranks them: by the timeframe's overall
+        status, then by the net number of positive signals, then by dollar volume.
+
+        Parameters:
+        - panel (MarketPanel): Daily bars of the market, e.g. filled with `MarketPanel.update`.
+
+        Returns:
+        pd.DataFrame: One row per eligible ticker, best first, with the overall status code ('Overall'), the
+        overall code of each group, the net signal count ('score'), and the latest close and average dollar volume.
+        Also stores the codes of every signal in `signal_codes`.
+        """
+        with timer('scan') as span:
+            liquidity = self.eligible(panel)
+            tickers = liquidity.index
+            bars = panel.latest_bars(self.lookback, tickers)
+            timestamps = bars.pop('timestamp')
+            columns = self.indicators(bars)
+
+            group_codes = [self._score_group(group, columns, tickers, timestamps) for group in self.groups]
+            overall = plurality_vote(np.column_stack([codes['Overall'].to_numpy() for codes in group_codes]), axis=1) if group_codes else np.zeros(len(tickers), dtype=np.int8)
+            codes = pd.concat(group_codes + [pd.DataFrame({'Overall': overall}, index=tickers)], axis=1,
+                              keys=[group.name for group in self.groups] + ['Overall'])
+            self.signal_codes = codes
+            span.add(tickers=len(tickers))
+
+        signal_columns = [column for column in codes.columns if column[1] != 'Overall']
+        results = pd.DataFrame({'Overall': overall, **{group.name: group_codes[i]['Overall'] for i, group in enumerate(self.groups)},
+                                'score': codes[signal_columns].to_numpy(dtype=np.int64).sum(axis=1)}, index=tickers)
+        results = results.join(liquidity)
+        return results.sort_values(['Overall', 'score', 'dollar_volume'], ascending=False, kind='stable')
+
+    def _score_group(self, group, columns, tickers, timestamps):
+        """Scores a signal group on the latest bar of every ticker, like `SignalGroup.evaluate_many`."""
+        signal_codes = np.zeros((len(tickers), len(group.signals)), dtype=np.int8)
+        specs, callables = group._spec_positions()
+        if specs:
+            compiled = group.compiled()
+            latest = np.column_stack([columns[column][-1] if column in columns else np.full(len(tickers), np.nan) for column in compiled.columns])
+            signal_codes[:, specs] = compiled.score(latest)
+        if callables:
+            # One frame per ticker with the columns every callable reads, without the padding before its first bar
+            required = [group.signals[i].columns for i in callables]
+            names = list(columns) if any(names is None for names in required) else [name for name in dict.fromkeys(sum(required, [])) if name in columns]
+            values = np.stack([columns[name] for name in names], axis=-1)
+            traded = ~np.isnan(columns['close'])
+            for row in range(len(tickers)):
+                rows = traded[:, row]
+                frame = pd.DataFrame(values[rows, row], index=pd.DatetimeIndex(timestamps[rows, row], name='timestamp'), columns=names)
+                for i in callables:
+                    signal_codes[row, i] = encode_statuses(group.signals[i].evaluate(frame))
+
+        codes = pd.DataFrame(signal_codes, index=tickers, columns=[signal.name for signal in group.signals])
+        codes['Overall'] = group_vote(signal_codes, axis=1)
+        return codes
+
+    def candidates(self, results, top=20, status=POSITIVE):
+        """Returns the `top` best ranked tickers of a scan whose overall status code is `status`."""
+        return list(results.index[results['Overall'] == status][:top])
+
+    def promote(self, watchlist, tickers, fetcher=None, asset_type='Stock'):
+        """
+        Adds tickers to a Watchlist for the full multi-timeframe evaluation, each with a framework like `framework`:
+        the same timeframes, strategies, signal groups and bias/confirmation timeframes, on data fetched with
+        `FetchData.fetch_timeframes`. Tickers already in the watchlist are left as they are.
+
+        Parameters:
+        - watchlist (Watchlist): The watchlist to add to.
+        - tickers (list): The tickers, e.g. from `candidates`.
+        - fetcher (FetchData, optional): Defaults to the watchlist's fetcher.
+        - asset_type (str, optional): 'Stock' or 'Crypto'.
+
+        Returns:
+        list: The tickers added.
+        """
+        fetcher = fetcher or watchlist.fetcher
+        template = self.framework
+        added = []
+        for ticker in tickers:
+            if ticker in watchlist.items:
+                continue
+            framework = TradingFramework(ticker, timeframes={}, active_time_frame=template.active_time_frame,
+                                         bias_timeframes=list(template.bias_timeframes), confirmation_timeframes=list(template.confirmation_timeframes),
+                                         compact=template.compact)
+            for name, data in fetcher.fetch_timeframes(ticker, list(template.timeframes), asset_type).items():
+                framework.add_timeframe(name, data, template.strategies.get(name))
+                for group in template.timeframes[name]['signal_groups']:
+                    framework.add_signal_group_to_timeframe(name, group)
+            watchlist.add_item(ticker, ticker, asset_type, framework=framework)
+            added.append(ticker)
+        return added
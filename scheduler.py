@@ -0,0 +1,396 @@
+import asyncio
+
+import pandas as pd
+
+from instrumentation import count, timer
+from resample import SESSIONS, bar_bounds, build_timeframes
+
+# Most bars or sessions skipped while searching for a bar close, e.g. a week of minute bars is never walked bar by bar
+_MAX_STEPS = 1000
+
+
+class SystemClock:
+    """The wall clock, in naive UTC like the bars."""
+    def now(self):
+        return pd.Timestamp.now(tz='UTC').tz_localize(None)
+
+    async def sleep_until(self, time):
+        await asyncio.sleep(max(0.0, (time - self.now()).total_seconds()))
+
+
+class SimulatedClock:
+    """
+    A clock for testing the RefreshScheduler: sleeping advances the simulated time at once instead of waiting.
+
+    Attributes:
+    - time (pd.Timestamp): The current simulated time, naive UTC.
+    """
+    def __init__(self, start):
+        self.time = pd.Timestamp(start)
+
+    def now(self):
+        return self.time
+
+    async def sleep_until(self, time):
+        self.time = max(self.time, pd.Timestamp(time))
+        # Still yields to the event loop, so other tasks run between the simulated steps
+        await asyncio.sleep(0)
+
+
+class RateBudget:
+    """
+    A token bucket shared by every request of a RefreshScheduler, measured on the scheduler's clock so it can be
+    simulated. Size it to the Polygon.io plan, e.g. RateBudget(5, 60) for the free tier's 5 calls per minute.
+
+    Attributes:
+    - calls (int): Number of requests allowed per period (also the burst size).
+    - period (float): Length of the period in seconds.
+    - clock (SystemClock or SimulatedClock): The clock tokens are refilled by.
+    - total_wait (float): Total seconds spent waiting for tokens.
+    """
+    def __init__(self, calls, period=60.0, clock=None):
+        self.calls = calls
+        self.period = period
+        self.clock = clock or SystemClock()
+        self.total_wait = 0.0
+        self._tokens = float(calls)
+        self._updated = None
+
+    def available(self):
+        """Returns the number of tokens available now."""
+        now = self.clock.now()
+        if self._updated is not None:
+            self._tokens = min(self.calls, self._tokens + (now - self._updated).total_seconds() * self.calls / self.period)
+        self._updated = now
+        return self._tokens
+
+    def try_acquire(self, n=1):
+        """Takes `n` tokens if they are available now and returns whether it did."""
+        if self.available() >= n:
+            self._tokens -= n
+            return True
+        return False
+
+    async def acquire(self, n=1):
+        """
+        Waits until `n` tokens are available and takes them. More tokens than the burst size are taken as soon as
+        the bucket is full, so a single large request cannot block forever.
+
+        Returns:
+        float: The time spent waiting, in seconds.
+        """
+        n = min(n, self.calls)
+        started = self.clock.now()
+        while not self.try_acquire(n):
+            delay = (n - self._tokens) * self.period / self.calls
+            await self.clock.sleep_until(self.clock.now() + pd.Timedelta(seconds=delay))
+        waited = (self.clock.now() - started).total_seconds()
+        self.total_wait += waited
+        return waited
+
+
+class SessionCalendar:
+    """
+    The trading sessions of an asset type (see `resample.SESSIONS`): around the clock for crypto, and on weekdays
+    that are not holidays for stocks, either during the regular session or during the extended hours Polygon.io
+    reports bars for. Early closes are not modelled.
+
+    Attributes:
+    - asset_type (str): 'Stock' or 'Crypto'.
+    - timezone (str): The exchange timezone.
+    - hours (tuple): The local ('HH:MM', 'HH:MM') open and close of a session, or (None, None) if always open.
+    - holidays (set): Dates (in the exchange timezone) without a session.
+
+    Methods:
+    - session(day): Returns the (open, close) of the session on a day, or None.
+    - bar_close(open, close): Returns when a bar's last trade can happen, or None if it has no session time.
+    - next_close(timeframe, after): Returns the first bar close after a time.
+    - last_closed_bar(timeframe, time): Returns the open of the last bar closed at a time.
+    """
+    def __init__(self, asset_type, regular_hours=False, holidays=()):
+        session = SESSIONS.get(asset_type, SESSIONS['Crypto'])
+        self.asset_type = asset_type
+        self.timezone = session['timezone']
+        self.hours = (session['open'], session['close']) if regular_hours else (session['extended_open'], session['extended_close'])
+        self.holidays = {pd.Timestamp(day).date() for day in holidays}
+
+    @property
+    def always_open(self):
+        return self.hours[0] is None
+
+    def session(self, day):
+        """Returns the naive UTC (open, close) of the session on a local calendar day, or None if there is none."""
+        day = pd.Timestamp(day).normalize()
+        if self.always_open:
+            return day, day + pd.Timedelta(days=1)
+        if day.weekday() >= 5 or day.date() in self.holidays:
+            return None
+        return tuple((day + pd.Timedelta(hours=int(hours), minutes=int(minutes))).tz_localize(self.timezone).tz_convert('UTC').tz_localize(None)
+                     for hours, minutes in (hour.split(':') for hour in self.hours))
+
+    def bar_close(self, bar_open, bar_close):
+        """
+        Returns when the last trade of a bar can happen: its nominal close, or the end of the last session that
+        overlaps it if that is earlier (e.g. 20:00 New York for a daily stock bar). Returns None if no session
+        overlaps the bar, e.g. for an hourly stock bar at night.
+        """
+        if self.always_open:
+            return bar_close
+        day = self._local_day(bar_close)
+        for _ in range(_MAX_STEPS):
+            session = self.session(day)
+            if session is not None and session[0] < bar_close:
+                return min(session[1], bar_close) if session[1] > bar_open else None
+            day -= pd.Timedelta(days=1)
+        return None
+
+    def next_close(self, timeframe, after):
+        """Returns the first bar close (see `bar_close`) of a timeframe later than `after`."""
+        time = after
+        for _ in range(_MAX_STEPS):
+            bar_open, nominal_close = bar_bounds(time, timeframe, self.asset_type)
+            close = self.bar_close(bar_open, nominal_close)
+            if close is not None and close > after:
+                return close
+            time = nominal_close if close is not None else max(nominal_close, self._next_open(nominal_close))
+        raise ValueError(f"No {timeframe} bar closes within {_MAX_STEPS} bars after {after}.")
+
+    def last_closed_bar(self, timeframe, time):
+        """Returns the open of the last bar of a timeframe that closed (see `bar_close`) at or before `time`."""
+        current = time
+        for _ in range(_MAX_STEPS):
+            bar_open, nominal_close = bar_bounds(current, timeframe, self.asset_type)
+            close = self.bar_close(bar_open, nominal_close)
+            if close is not None and close <= time:
+                return bar_open
+            current = bar_open - pd.Timedelta(1) if close is not None else min(bar_open, self._previous_close(bar_open)) - pd.Timedelta(1)
+        return None
+
+    def _local_day(self, time):
+        return time.tz_localize('UTC').tz_convert(self.timezone).tz_localize(None).normalize()
+
+    def _next_open(self, time):
+        """Returns the open of the first session ending after `time`."""
+        day = self._local_day(time)
+        for _ in range(_MAX_STEPS):
+            session = self.session(day)
+            if session is not None and session[1] > time:
+                return session[0]
+            day += pd.Timedelta(days=1)
+        return time
+
+    def _previous_close(self, time):
+        """Returns the close of the last session opening before `time`."""
+        day = self._local_day(time)
+        for _ in range(_MAX_STEPS):
+            session = self.session(day)
+            if session is not None and session[0] < time:
+                return session[1]
+            day -= pd.Timedelta(days=1)
+        return time
+
+
+class RefreshScheduler:
+    """
+    Keeps the frameworks of a Watchlist current by refetching and re-evaluating each (item, timeframe) pair
+    when its bar closes, instead of refreshing every timeframe of every item on a fixed interval.
+
+    Each pair is due when the bar of its timeframe closes on its asset's session calendar (see `SessionCalendar`),
+    plus `settle` for the bar to be published. All pairs due at the same time are refreshed together: the base
+    series they are built from (see `FetchData.base_series`) are deduplicated and fetched with one `fetch_many`
+    call across all items, within the global `budget`. The fetched bars are resampled, the bars that closed since
+    the last refresh are appended to each due timeframe (so only their indicators are computed), and the items
+    are re-evaluated; timeframes that did not change are answered from the evaluation cache. A pair whose new bar
+    is not available yet is retried every `retry_interval`, at most `max_retries` times per bar.
+
+    Timeframes must be pandas frequency strings, as used by `FetchData.fetch_timeframes`; others are skipped.
+    Give the watchlist's fetcher a store, so a refresh only requests the bars since the last stored one.
+
+    Attributes:
+    - watchlist (Watchlist): The watchlist to keep current.
+    - clock (SystemClock or SimulatedClock): The clock refreshes are scheduled by.
+    - budget (RateBudget): Optional. The request budget shared by all refreshes.
+    - fetch (callable): Fetches a list of (ticker, timespan, multiplier) series and returns the DataFrame of each,
+      like `FetchData.fetch_many`, which is the default.
+    - settle (pd.Timedelta): Delay between a bar's close and its refresh.
+    - retry_interval (pd.Timedelta): Delay before a pair whose new bar was missing is refreshed again.
+    - max_retries (int): Most retries of a pair per bar.
+    - intraday_base, daily_base (tuple): The (multiplier, timespan) base series, see `FetchData.fetch_timeframes`.
+    - regular_hours (bool): If True, stock sessions and intraday stock bars are limited to the regular session.
+    - holidays (list): Dates without a stock session.
+    - due (dict): The time each (ticker, timeframe) pair is next due, as a bar close before `settle`.
+    - log (list): One record per refresh with its time, the number of pairs, items, series and requests, and
+      the seconds spent waiting for the budget.
+
+    Methods:
+    - schedule(): Computes when each pair is due; pairs whose last closed bar is missing are due at once.
+    - refresh_due(): Refreshes the pairs that are due now.
+    - run(until, max_refreshes): Refreshes pairs as they become due.
+    - stop(): Makes `run` return after the current refresh.
+    """
+    def __init__(self, watchlist, clock=None, budget=None, fetch=None, settle=pd.Timedelta(seconds=10), retry_interval=pd.Timedelta(minutes=1),
+                 max_retries=3, intraday_base=(30, 'minute'), daily_base=(1, 'day'), regular_hours=False, holidays=()):
+        self.watchlist = watchlist
+        self.clock = clock or SystemClock()
+        self.budget = RateBudget(*budget, clock=self.clock) if isinstance(budget, tuple) else budget
+        self.fetch = fetch or watchlist.fetcher.fetch_many
+        self.settle = pd.Timedelta(settle)
+        self.retry_interval = pd.Timedelta(retry_interval)
+        self.max_retries = max_retries
+        self.intraday_base = intraday_base
+        self.daily_base = daily_base
+        self.regular_hours = regular_hours
+        self.holidays = holidays
+        self.due = {}
+        self.log = []
+        self._retries = {}
+        self._calendars = {}
+        self._stopped = False
+
+    def calendar(self, asset_type):
+        """Returns the SessionCalendar of an asset type."""
+        if asset_type not in self._calendars:
+            self._calendars[asset_type] = SessionCalendar(asset_type, self.regular_hours, self.holidays)
+        return self._calendars[asset_type]
+
+    def schedule(self):
+        """
+        Computes when each (item, timeframe) pair is due. Pairs whose data lacks the last closed bar are due now,
+        the others when their current bar closes.
+        """
+        now = self.clock.now()
+        self.due = {}
+        for ticker, item in self.watchlist.items.items():
+            if item.framework is None:
+                continue
+            calendar = self.calendar(item.asset_type)
+            for name, timeframe in item.framework.timeframes.items():
+                try:
+                    last_closed = calendar.last_closed_bar(name, now)
+                except ValueError:
+                    print(f"Timeframe {name} of {ticker} is not a pandas frequency and is not scheduled.")
+                    continue
+                data = timeframe['data']
+                stale = last_closed is not None and (data.empty or data.index[-1] < last_closed)
+                self.due[(ticker, name)] = now if stale else calendar.next_close(name, now)
+
+    async def run(self, until=None, max_refreshes=None):
+        """
+        Refreshes pairs as they become due, until `until` (a naive UTC time), after `max_refreshes` refreshes,
+        or until `stop` is called.
+        """
+        self._stopped = False
+        if not self.due:
+            self.schedule()
+        refreshes = 0
+        while self.due and not self._stopped and (max_refreshes is None or refreshes < max_refreshes):
+            wake = min(self.due.values()) + self.settle
+            if until is not None and wake > until:
+                await self.clock.sleep_until(until)
+                break
+            await self.clock.sleep_until(wake)
+            await self.refresh_due()
+            refreshes += 1
+
+    def stop(self):
+        self._stopped = True
+
+    async def refresh_due(self):
+        """Refreshes every pair due by now (see the class description) and schedules its next refresh."""
+        now = self.clock.now()
+        pairs = [pair for pair, due in self.due.items() if due + self.settle <= now]
+        if not pairs:
+            return
+
+        timeframes = {}
+        for ticker, name in pairs:
+            timeframes.setdefault(ticker, []).append(name)
+        series = {}
+        for ticker, names in timeframes.items():
+            for key, built in self.watchlist.fetcher.base_series(ticker, names, self.intraday_base, self.daily_base).items():
+                series[key] = built
+
+        with timer('refresh') as span:
+            results, requests, waited = await self._fetch(list(series))
+            await asyncio.to_thread(self._apply, timeframes, series, results, now)
+            span.add(pairs=len(pairs), series=len(series), requests=requests)
+        self.log.append({'time': now, 'pairs': len(pairs), 'items': len(timeframes), 'series': len(series), 'requests': requests, 'budget_wait': waited})
+
+    async def _fetch(self, series):
+        """
+        Fetches the series, in as few `fetch` calls as the budget allows: series are added to a call while their
+        requests fit in the available tokens, and the call is sent before waiting for more.
+        """
+        costs = {}
+        for key, _ in self.watchlist.fetcher.plan_requests(series):
+            costs[key] = costs.get(key, 0) + 1
+
+        results, batch, waited = {}, [], 0.0
+        for key in series:
+            cost = costs.get(key, 1)
+            if self.budget is not None and not self.budget.try_acquire(cost):
+                if batch:
+                    results.update(await asyncio.to_thread(self.fetch, batch))
+                    batch = []
+                wait = await self.budget.acquire(cost)
+                count('scheduler_budget_wait_seconds', wait)
+                waited += wait
+            batch.append(key)
+        if batch:
+            results.update(await asyncio.to_thread(self.fetch, batch))
+        return results, sum(costs.get(key, 1) for key in series), waited
+
+    def _apply(self, timeframes, series, results, now):
+        """Appends the newly closed bars of the due timeframes of each item, re-evaluates the items and reschedules the pairs."""
+        for ticker, names in timeframes.items():
+            item = self.watchlist.items.get(ticker)
+            if item is None or item.framework is None:
+                for name in names:
+                    self.due.pop((ticker, name), None)
+                continue
+            calendar = self.calendar(item.asset_type)
+            framework = item.framework
+
+            updated = False
+            for key, built in series.items():
+                if key[0] != ticker or key not in results or results[key].empty:
+                    continue
+                due_names = [name for name in built if name in names]
+                fresh = build_timeframes(results[key], due_names, item.asset_type, self.regular_hours)
+                for name, bars in fresh.items():
+                    updated |= self._append_closed_bars(framework, name, bars, calendar.last_closed_bar(name, now))
+
+            for name in names:
+                self._reschedule(ticker, name, framework.timeframes[name]['data'], calendar, now)
+            if updated:
+                item.evaluate_framework()
+
+    def _append_closed_bars(self, framework, name, bars, last_closed):
+        """
+        Appends the bars of a timeframe from its last stored bar (which may have been incomplete) up to its last
+        closed bar. Returns whether any bar was appended.
+        """
+        data = framework.timeframes[name]['data']
+        if last_closed is not None:
+            bars = bars[bars.index <= last_closed]
+        if not data.empty:
+            bars = bars[bars.index >= data.index[-1]]
+        if bars.empty:
+            return False
+        if data.empty:
+            framework.add_timeframe(name, bars)
+        else:
+            framework.append_bars(name, bars)
+        return True
+
+    def _reschedule(self, ticker, name, data, calendar, now):
+        last_closed = calendar.last_closed_bar(name, now)
+        missing = last_closed is not None and (data.empty or data.index[-1] < last_closed)
+        retries = self._retries.get((ticker, name), 0)
+        next_close = calendar.next_close(name, now)
+        if missing and retries < self.max_retries:
+            self._retries[(ticker, name)] = retries + 1
+            self.due[(ticker, name)] = min(now - self.settle + self.retry_interval, next_close)
+        else:
+            self._retries.pop((ticker, name), None)
+            self.due[(ticker, name)] = next_close
@@ -1,3 +1,12 @@
+import numpy as np
+import pandas as pd
+
+from cache import default_cache, frame_fingerprint, signal_definition
+from instrumentation import timer
+from specs import CompiledSpecs, SignalSpec
+from status import STATUS_LABELS, decode_statuses, encode_statuses, group_vote
+
+
 def generate_signal_score(df, column_name, signal_line=None, threshold_up=None, threshold_down=None, neutral_zone=None, inverted=False):
     """
     Generates a signal based on the analysis of a single column within a DataFrame.
@@ -52,25 +61,95 @@ def generate_signal_score(df, column_name, signal_line=None, threshold_up=None,
                 return 'positive' if inverted else 'negative'
             else:
                 return 'neutral'
-            
+
+
+def generate_signal_score_series(df, column_name, signal_line=None, threshold_up=None, threshold_down=None, neutral_zone=None, inverted=False, codes=False):
+    """
+    Generates the signal of `generate_signal_score` for every row of a DataFrame at once.
+    The same threshold, crossover, neutral zone and inverted rules are applied to whole columns with NumPy.
+
+    Parameters:
+    - df (pd.DataFrame): The DataFrame containing the data series to be analyzed.
+    - column_name (str): Column name in `df` to generate the signal for.
+    - signal_line (str, optional): The column name to be used as a signal line for crossover comparison.
+    - threshold_up (float, optional): The upper threshold value for generating a 'positive' signal.
+    - threshold_down (float, optional): The lower threshold value for generating a 'negative' signal.
+    - neutral_zone (tuple, optional): A tuple of (lower_bound, upper_bound) defining the neutral zone range.
+    - inverted (bool, optional): If True, inverts the interpretation of 'positive' and 'negative' signals.
+    - codes (bool, optional): If True, returns int8 status codes (1 = positive, 0 = neutral, -1 = negative) instead of strings.
+
+    Returns:
+    pd.Series: The generated signal ('positive', 'negative', 'neutral') for each row of `df`.
+    """
+    as_codes = codes
+    codes = np.zeros(len(df), dtype=np.int8)
+
+    if column_name in df and (not signal_line or signal_line in df):
+        values = df[column_name].to_numpy(dtype=float)
+        if signal_line:
+            tolerance = neutral_zone if neutral_zone else 0
+            codes = _signal_codes(values, signal_values=df[signal_line].to_numpy(dtype=float), tolerance=tolerance, inverted=inverted)
+        else:
+            # The neutral zone only ever resolves to 'neutral' in threshold mode, like the scalar version
+            codes = _signal_codes(values, threshold_up=threshold_up, threshold_down=threshold_down, inverted=inverted)
+
+    if as_codes:
+        return pd.Series(codes, index=df.index, name=column_name)
+    return pd.Series(STATUS_LABELS[codes + 1], index=df.index, name=column_name)
+
+
+def _signal_codes(values, signal_values=None, threshold_up=None, threshold_down=None, tolerance=0, inverted=False):
+    """
+    Array form of the `generate_signal_score` rules. Returns int8 codes (1 = positive, 0 = neutral, -1 = negative).
+    Thresholds, tolerance and `inverted` may be arrays that broadcast against `values`.
+    """
+    inverted = np.asarray(inverted, dtype=bool)
+    if signal_values is not None:
+        upper = signal_values + tolerance
+        lower = signal_values - tolerance
+        missing = np.isnan(values) | np.isnan(signal_values)
+    else:
+        upper = np.asarray(threshold_up, dtype=float)
+        lower = np.asarray(threshold_down, dtype=float)
+        missing = np.isnan(values)
+
+    above = (values > upper) ^ inverted
+    below = (values < lower) ^ inverted
+    above_code = np.where(inverted, -1, 1)
+    codes = np.where(above, above_code, np.where(below, -above_code, 0))
+    return np.where(missing, 0, codes).astype(np.int8)
+
+
 class Signal:
     """
     Represents a single trading signal within a trading strategy or framework.
 
     Attributes:
     - name (str): The name of the signal.
-    - eval_function (callable): The function used to evaluate the signal. Should accept a DataFrame as input and return a signal ('positive', 'negative', 'neutral').
+    - eval_function (callable or SignalSpec): The function used to evaluate the signal. Should accept a DataFrame as input and return a signal ('positive', 'negative', 'neutral').
+      A SignalSpec also declares its columns and its vectorized form, and is scored by the compiled kernel of its SignalGroup.
     - chart (bool): Indicates if the signal should be visualized on a chart.
     - subplot (bool): Indicates if the signal visualization should be on a separate subplot.
+    - series_function (callable, optional): Vectorized counterpart of `eval_function`. Should accept a DataFrame and return a pd.Series with the signal for every row, e.g. via `generate_signal_score_series`.
+    - columns (list, optional): The DataFrame columns the signal reads, e.g. ['RSI_14']. Lets the framework compute only the indicators its signals need,
+      and its SignalGroup fingerprint only those columns for the evaluation cache rather than the whole frame (see `cache.frame_fingerprint`).
+    - spec (SignalSpec): The spec passed as `eval_function`, or None for a Python callable.
 
     Methods:
     - evaluate(df): Evaluates the signal based on the provided DataFrame using `eval_function`.
+    - evaluate_series(df, codes): Evaluates the signal for every row of the provided DataFrame.
     """
-    def __init__(self, name, eval_function, chart=False, subplot=False):
+    def __init__(self, name, eval_function, chart=False, subplot=False, series_function=None, columns=None):
         self.name = name
         self.eval_function = eval_function
         self.chart = chart
         self.subplot = subplot
+        self.spec = eval_function if isinstance(eval_function, SignalSpec) else None
+        if self.spec is not None:
+            series_function = series_function or self.spec.series
+            columns = columns if columns is not None else self.spec.columns()
+        self.series_function = series_function
+        self.columns = list(columns) if columns is not None else None
 
     def evaluate(self, df):
         """
@@ -83,6 +162,32 @@ class Signal:
         str: The result of the signal evaluation ('positive', 'negative', 'neutral').
         """
         return self.eval_function(df)
+
+    def evaluate_series(self, df, codes=False):
+        """
+        Evaluates the signal at every row of the provided DataFrame, using only the data up to that row.
+
+        Uses `series_function` when one is defined, otherwise replays `eval_function` on every growing slice of `df`.
+
+        Parameters:
+        - df (pd.DataFrame): The DataFrame to evaluate the signal on.
+        - codes (bool, optional): If True, returns int8 status codes instead of strings.
+
+        Returns:
+        pd.Series: The signal ('positive', 'negative', 'neutral') for each row of `df`.
+        """
+        if self.series_function:
+            statuses = self.series_function(df)
+        else:
+            statuses = pd.Series([self.eval_function(df.iloc[:i+1]) for i in range(len(df))], index=df.index, dtype=object)
+
+        if pd.api.types.is_numeric_dtype(statuses.dtype):
+            status_codes = statuses.to_numpy(dtype=np.int8)
+        else:
+            status_codes = encode_statuses(statuses.to_numpy())
+        if codes:
+            return pd.Series(status_codes, index=df.index, name=self.name)
+        return pd.Series(decode_statuses(status_codes), index=df.index, name=self.name)
     
 
 class SignalGroup:
@@ -92,47 +197,173 @@ class SignalGroup:
     Attributes:
     - name (str): The name of the signal group.
     - signals (list): A list of Signal objects belonging to this group.
-    - cached_results (dict): Cached results of the last evaluation to optimize performance.
-    - last_calculated (datetime): Timestamp of the last evaluation.
+    - cached_results (dict): Results of the last evaluation.
+    - cached_codes (pd.Series): The results of the last evaluation as int8 status codes, indexed by signal name plus 'Overall'.
+    - cache (EvaluationCache): Cache of evaluation results, keyed by the evaluated data and the signal definitions.
+      Defaults to `cache.default_cache`, which is shared by all groups.
 
     Methods:
     - add_signal(signal): Adds a Signal object to the signal group.
-    - evaluate_group(df, update_timestamp): Evaluates all signals in the group based on the provided DataFrame.
+    - evaluate_group(df): Evaluates all signals in the group based on the provided DataFrame.
+    - evaluate_group_codes(df): Same as `evaluate_group`, returning int8 status codes.
+    - evaluate_group_series(df, codes): Evaluates all signals in the group, and the group's overall status, for every row of the provided DataFrame.
+    - evaluate_many(frames): Evaluates the group on the latest row of many DataFrames, e.g. one per asset.
+    - required_columns(): Returns the columns read by the signals of the group.
+    - compiled(): Returns the compiled kernel scoring the group's SignalSpec signals in one pass.
     """
-    def __init__(self, name):
+    def __init__(self, name, cache=None):
         self.name = name
         self.signals = []
         self.cached_results = {}
-        self.last_calculated = None
+        self.cached_codes = None
+        self.cache = cache if cache is not None else default_cache
+        self._compiled = None
 
     def add_signal(self, signal):
         self.signals.append(signal)
 
+    def required_columns(self):
+        """
+        Returns the set of columns read by the signals of the group, or None if any signal does not declare its columns.
+        """
+        columns = set()
+        for signal in self.signals:
+            if signal.columns is None:
+                return None
+            columns.update(signal.columns)
+        return columns
+
+    def cache_key(self, kind, df):
+        """Returns the key of an evaluation of `df` in `cache`: the kind of evaluation, the signal definitions and a fingerprint of the data they read."""
+        return kind, tuple(signal_definition(signal) for signal in self.signals), frame_fingerprint(df, self.required_columns())
+
     def evaluate_group(self, df, update_timestamp=None):
         """
-        Evaluates all signals in the group based on the provided DataFrame. Caches the results if the data has not changed since the last evaluation.
+        Evaluates all signals in the group based on the provided DataFrame. Results are reused from `cache`
+        if the same signals were already evaluated on the same data.
 
         Parameters:
         - df (pd.DataFrame): The DataFrame to evaluate the signals on.
-        - update_timestamp (datetime, optional): The timestamp of the data update to check if re-evaluation is necessary.
+        - update_timestamp (datetime, optional): Unused; kept for backwards compatibility.
 
         Returns:
         dict: A dictionary of signal evaluation results, including the overall status of the signal group.
         """
-        if self.cached_results and (self.last_calculated is not None and update_timestamp <= self.last_calculated):
-            return self.cached_results
-        else:
-            self.cached_results = {signal.name: signal.evaluate(df) for signal in self.signals}
-            positive_count = sum(status == 'positive' for status in self.cached_results.values())
-            negative_count = sum(status == 'negative' for status in self.cached_results.values())
-            if positive_count > negative_count:
-                self.cached_results['Overall'] = 'positive'
-            elif negative_count > positive_count:
-                self.cached_results['Overall'] = 'negative'
-            else: 
-                self.cached_results['Overall'] = 'neutral'
-
-            self.last_calculated = update_timestamp
-
-            return self.cached_results
-            
+        self.evaluate_group_codes(df, update_timestamp)
+        return self.cached_results
+
+    def evaluate_group_codes(self, df, update_timestamp=None):
+        """
+        Evaluates all signals in the group based on the provided DataFrame, using the same caching as `evaluate_group`.
+
+        Parameters:
+        - df (pd.DataFrame): The DataFrame to evaluate the signals on.
+        - update_timestamp (datetime, optional): Unused; kept for backwards compatibility.
+
+        Returns:
+        pd.Series: int8 status codes indexed by signal name, plus the group's 'Overall' status.
+        """
+        with timer('group', group=self.name):
+            # A copy, so callers modifying the result do not change what later cache hits return
+            self.cached_codes = self.cache.get_or_compute(self.cache_key('codes', df), lambda: self._evaluate_codes(df)).copy()
+        self.cached_results = dict(zip(self.cached_codes.index, decode_statuses(self.cached_codes.to_numpy()).tolist()))
+        return self.cached_codes
+
+    def compiled(self):
+        """
+        Returns the CompiledSpecs of the group's SignalSpec signals, compiled on first use and again whenever
+        the signals change, or None if no signal has a spec.
+        """
+        specs = tuple(signal.spec for signal in self.signals if signal.spec is not None)
+        if not specs:
+            return None
+        if self._compiled is None or self._compiled[0] != specs:
+            self._compiled = (specs, CompiledSpecs(specs))
+        return self._compiled[1]
+
+    def _spec_positions(self):
+        """Returns the positions of the spec signals (scored by the compiled kernel) and of the callable ones."""
+        specs = [i for i, signal in enumerate(self.signals) if signal.spec is not None]
+        callables = [i for i, signal in enumerate(self.signals) if signal.spec is None]
+        return specs, callables
+
+    def _evaluate_codes(self, df):
+        specs, callables = self._spec_positions()
+        signal_codes = np.zeros(len(self.signals), dtype=np.int8)
+        if specs and len(df):
+            with timer('signal_kernel', group=self.name) as span:
+                signal_codes[specs] = self.compiled().score_frame(df, slice(-1, None))[0]
+                span.add(signals=len(specs))
+        for i in callables:
+            with timer('signal', group=self.name, signal=self.signals[i].name):
+                signal_codes[i] = encode_statuses(self.signals[i].evaluate(df))
+        codes = np.append(signal_codes, group_vote(signal_codes))
+        return pd.Series(codes, index=[signal.name for signal in self.signals] + ['Overall'], dtype=np.int8)
+
+    def evaluate_many(self, frames):
+        """
+        Evaluates the group on the latest row of many DataFrames at once, e.g. the same timeframe of every asset
+        in a watchlist. The spec signals of all frames are scored in a single kernel call; callable signals are
+        evaluated frame by frame.
+
+        Parameters:
+        - frames (dict): The DataFrame to evaluate for each key (e.g. ticker).
+
+        Returns:
+        pd.DataFrame: int8 status codes, one row per key, one column per signal plus 'Overall'.
+        """
+        specs, callables = self._spec_positions()
+        keys = list(frames)
+        signal_codes = np.zeros((len(keys), len(self.signals)), dtype=np.int8)
+        if specs:
+            compiled = self.compiled()
+            latest = np.full((len(keys), len(compiled.columns)), np.nan)
+            for row, key in enumerate(keys):
+                df = frames[key]
+                for i, column in enumerate(compiled.columns):
+                    if column in df and len(df):
+                        latest[row, i] = df[column].iloc[-1]
+            signal_codes[:, specs] = compiled.score(latest)
+        for row, key in enumerate(keys):
+            for i in callables:
+                signal_codes[row, i] = encode_statuses(self.signals[i].evaluate(frames[key]))
+
+        results = pd.DataFrame(signal_codes, index=keys, columns=[signal.name for signal in self.signals])
+        results['Overall'] = group_vote(signal_codes, axis=1)
+        return results
+
+    def evaluate_group_series(self, df, codes=False):
+        """
+        Evaluates all signals in the group for every row of the provided DataFrame. The overall status of
+        each row follows the same majority rule as `evaluate_group`.
+
+        Parameters:
+        - df (pd.DataFrame): The DataFrame to evaluate the signals on.
+        - codes (bool, optional): If True, returns int8 status codes instead of strings.
+
+        Returns:
+        pd.DataFrame: The signal of each Signal per row, one column per signal name, plus an 'Overall' column.
+        """
+        with timer('group_series', group=self.name) as span:
+            results = self.cache.get_or_compute(self.cache_key('series', df), lambda: self._evaluate_series_codes(df)).copy()
+            span.add(rows=len(df))
+
+        if codes:
+            return results
+        return pd.DataFrame(decode_statuses(results.to_numpy()), index=results.index, columns=results.columns)
+
+    def _evaluate_series_codes(self, df):
+        specs, callables = self._spec_positions()
+        signal_codes = np.zeros((len(df), len(self.signals)), dtype=np.int8)
+        if specs:
+            with timer('signal_kernel_series', group=self.name) as span:
+                signal_codes[:, specs] = self.compiled().score_frame(df)
+                span.add(rows=len(df), signals=len(specs))
+        for i in callables:
+            with timer('signal_series', group=self.name, signal=self.signals[i].name) as span:
+                signal_codes[:, i] = self.signals[i].evaluate_series(df, codes=True).to_numpy()
+                span.add(rows=len(df))
+
+        results = pd.DataFrame(signal_codes, index=df.index, columns=[signal.name for signal in self.signals])
+        results['Overall'] = group_vote(signal_codes, axis=1)
+        return results
@@ -0,0 +1,265 @@
+import json
+import os
+import pickle
+import shutil
+from datetime import datetime
+
+import pandas as pd
+
+from framework import TradingFramework
+from indicators import strategy_definition
+from parallel import dumps
+from signals import Signal, SignalGroup
+from specs import SignalSpec
+from store import read_frame, write_frame
+from watchlist import Watchlist
+
+SNAPSHOT_VERSION = 1
+
+
+def save_watchlist(watchlist, path):
+    """
+    Saves a watchlist with the frameworks of its items to a snapshot directory, replacing it atomically.
+
+    The snapshot holds:
+    - manifest.json: The items (name, ticker, asset type, current price) and the fetcher's base URL. The API key
+      is not saved.
+    - signals.json: The signal groups of all frameworks, each saved once even if several timeframes or frameworks
+      share it. SignalSpec signals are saved declaratively; other signals are pickled to signals.pkl (with
+      cloudpickle when it is installed), so they can only be restored where their functions can be imported.
+    - frameworks/{i}/framework.json: A framework's settings, strategies, `last_update` / `last_calculation` times
+      and the signal groups of each timeframe.
+    - frameworks/{i}/timeframes/{j}/: The data of each timeframe, including its computed indicators, as raw
+      arrays (see `store.write_frame`).
+
+    Evaluations, backtest results and streaming listeners are not saved.
+
+    Parameters:
+    - watchlist (Watchlist): The watchlist to save.
+    - path (str): The snapshot directory.
+    """
+    def write(directory):
+        groups = _SignalGroups()
+        items = []
+        for i, item in enumerate(watchlist.items.values()):
+            framework_path = None
+            if item.framework is not None:
+                framework_path = f'frameworks/{i}'
+                _write_framework(item.framework, os.path.join(directory, framework_path), groups)
+            items.append({'name': item.name, 'ticker': item.ticker, 'asset_type': item.asset_type,
+                          'current_price': item.current_price, 'price_timestamp': _timestamp(item.price_timestamp),
+                          'framework': framework_path})
+        groups.write(directory)
+        _write_json(os.path.join(directory, 'manifest.json'),
+                    {'version': SNAPSHOT_VERSION, 'base_url': watchlist.fetcher.base_url, 'items': items})
+
+    _write_directory(path, write)
+
+
+def load_watchlist(path, api_key, fetcher=None, mmap_mode='c'):
+    """
+    Restores a watchlist saved with `save_watchlist`.
+
+    The timeframe data is memory-mapped rather than read, so restoring takes about as long as reading the JSON
+    files, and only the pages an evaluation touches are loaded. Since `last_update` and `last_calculation` are
+    restored as well, indicators are not recomputed until new data arrives.
+
+    Parameters:
+    - path (str): The snapshot directory.
+    - api_key (str): API key used for data fetching.
+    - fetcher (FetchData, optional): Fetcher for price updates. Defaults to one for the saved base URL.
+    - mmap_mode (str, optional): Passed to `np.load`. With the default copy-on-write mode the frames can be
+      modified, e.g. by appending bars, without touching the snapshot. None reads the arrays into memory.
+
+    Returns:
+    Watchlist: The restored watchlist.
+    """
+    manifest = _read_json(os.path.join(path, 'manifest.json'))
+    _check_version(path, manifest)
+    groups = _SignalGroups.read(path)
+
+    watchlist = Watchlist(api_key, fetcher=fetcher, base_url=manifest['base_url'])
+    for entry in manifest['items']:
+        framework = None
+        if entry['framework'] is not None:
+            framework = _read_framework(os.path.join(path, entry['framework']), groups, mmap_mode)
+        watchlist.add_item(entry['name'], entry['ticker'], entry['asset_type'], framework=framework)
+        item = watchlist.items[entry['ticker']]
+        item.current_price = entry['current_price']
+        item.price_timestamp = pd.Timestamp(entry['price_timestamp']) if entry['price_timestamp'] else None
+    return watchlist
+
+
+def save_framework(framework, path):
+    """
+    Saves a single framework to a snapshot directory, replacing it atomically. The layout is that of a framework
+    in `save_watchlist`, with its signals.json (and signals.pkl) next to its framework.json.
+
+    Parameters:
+    - framework (TradingFramework): The framework to save.
+    - path (str): The snapshot directory.
+    """
+    def write(directory):
+        groups = _SignalGroups()
+        _write_framework(framework, directory, groups)
+        groups.write(directory)
+
+    _write_directory(path, write)
+
+
+def load_framework(path, mmap_mode='c'):
+    """
+    Restores a framework saved with `save_framework`, memory-mapping its timeframe data (see `load_watchlist`).
+
+    Parameters:
+    - path (str): The snapshot directory.
+    - mmap_mode (str, optional): Passed to `np.load`; None reads the arrays into memory.
+
+    Returns:
+    TradingFramework: The restored framework.
+    """
+    return _read_framework(path, _SignalGroups.read(path), mmap_mode)
+
+
+class _SignalGroups:
+    """
+    The signal groups of a snapshot, numbered in the order they are first seen so that groups shared by several
+    timeframes or frameworks are saved once and shared again when restored.
+    """
+    def __init__(self):
+        self.groups = []
+        self.ids = {}
+        self.pickled = []
+
+    def add(self, group):
+        """Returns the number of a group, adding it if it was not seen yet."""
+        if id(group) not in self.ids:
+            self.ids[id(group)] = len(self.groups)
+            self.groups.append(group)
+        return self.ids[id(group)]
+
+    def write(self, directory):
+        definitions = [{'name': group.name, 'signals': [self._signal_definition(signal) for signal in group.signals]}
+                       for group in self.groups]
+        _write_json(os.path.join(directory, 'signals.json'), {'version': SNAPSHOT_VERSION, 'groups': definitions})
+        if self.pickled:
+            with open(os.path.join(directory, 'signals.pkl'), 'wb') as f:
+                f.write(dumps(self.pickled))
+
+    def _signal_definition(self, signal):
+        # Spec signals whose vectorized form is the spec's own are fully described by the spec
+        if signal.spec is not None and signal.series_function == signal.spec.series:
+            return {'name': signal.name, 'spec': signal.spec.to_dict(), 'chart': signal.chart, 'subplot': signal.subplot,
+                    'columns': signal.columns}
+        self.pickled.append(signal)
+        return {'name': signal.name, 'pickled': len(self.pickled) - 1}
+
+    @classmethod
+    def read(cls, directory):
+        """Returns the restored SignalGroups of a snapshot directory, by number."""
+        definitions = _read_json(os.path.join(directory, 'signals.json'))
+        _check_version(directory, definitions)
+        pickled = []
+        if os.path.exists(os.path.join(directory, 'signals.pkl')):
+            with open(os.path.join(directory, 'signals.pkl'), 'rb') as f:
+                pickled = pickle.load(f)
+
+        groups = []
+        for definition in definitions['groups']:
+            group = SignalGroup(definition['name'])
+            for signal in definition['signals']:
+                if 'pickled' in signal:
+                    group.add_signal(pickled[signal['pickled']])
+                else:
+                    group.add_signal(Signal(signal['name'], SignalSpec.from_dict(signal['spec']), signal['chart'], signal['subplot'],
+                                            columns=signal['columns']))
+            groups.append(group)
+        return groups
+
+
+def _write_framework(framework, directory, groups):
+    timeframes = {}
+    for i, (name, timeframe) in enumerate(framework.timeframes.items()):
+        data_path = f'timeframes/{i}'
+        write_frame(os.path.join(directory, data_path), timeframe['data'])
+        strategy = framework.strategies.get(name)
+        timeframes[name] = {'data': data_path,
+                            'signal_groups': [groups.add(group) for group in timeframe['signal_groups']],
+                            'strategy': strategy_definition(strategy) if strategy is not None else None,
+                            'last_update': _timestamp(framework.last_update.get(name)),
+                            'last_calculation': _timestamp(framework.last_calculation.get(name))}
+
+    _write_json(os.path.join(directory, 'framework.json'),
+                {'version': SNAPSHOT_VERSION, 'name': framework.name, 'active_time_frame': framework.active_time_frame,
+                 'bias_timeframes': framework.bias_timeframes, 'confirmation_timeframes': framework.confirmation_timeframes,
+                 'compact': framework.compact, 'stream_window': framework.stream_window, 'timeframes': timeframes})
+
+
+def _read_framework(directory, groups, mmap_mode):
+    state = _read_json(os.path.join(directory, 'framework.json'))
+    _check_version(directory, state)
+
+    framework = TradingFramework(state['name'], timeframes={}, active_time_frame=state['active_time_frame'],
+                                 bias_timeframes=state['bias_timeframes'], confirmation_timeframes=state['confirmation_timeframes'],
+                                 compact=state['compact'])
+    for name, timeframe in state['timeframes'].items():
+        # Set directly rather than with add_timeframe, which would mark the indicators as outdated
+        framework.timeframes[name] = {'data': read_frame(os.path.join(directory, timeframe['data']), mmap_mode=mmap_mode),
+                                      'signal_groups': [groups[i] for i in timeframe['signal_groups']]}
+        if timeframe['strategy'] is not None:
+            # Kept as a dict until indicators are computed, so restoring does not import pandas-ta
+            framework.strategies[name] = _strategy_fields(timeframe['strategy'])
+        for times, value in ((framework.last_update, timeframe['last_update']), (framework.last_calculation, timeframe['last_calculation'])):
+            if value is not None:
+                times[name] = datetime.fromisoformat(value)
+    framework.stream_window = state['stream_window']
+    return framework
+
+
+def _strategy_fields(definition):
+    """Restores what JSON changed in a strategy: pandas-ta expects `col_names` as a tuple."""
+    entries = definition.get('ta')
+    if entries:
+        entries = [{**entry, 'col_names': tuple(entry['col_names'])} if isinstance(entry.get('col_names'), list) else entry
+                   for entry in entries]
+    return {**definition, 'ta': entries}
+
+
+def _timestamp(value):
+    """Returns a datetime or pd.Timestamp as an ISO string, or None."""
+    if value is None:
+        return None
+    if isinstance(value, pd.Timestamp):
+        value = value.to_pydatetime()
+    return value.isoformat()
+
+
+def _write_directory(path, write):
+    """Calls `write` on a temporary directory and then swaps it in for `path`, like `store.write_frame` does."""
+    tmp_path = path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    write(tmp_path)
+
+    old_path = path + '.old'
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.rename(path, old_path)
+    os.rename(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+def _write_json(path, value):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(value, f, indent=1)
+
+
+def _read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _check_version(path, state):
+    if state.get('version') != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {state.get('version')} in {path}, expected {SNAPSHOT_VERSION}.")
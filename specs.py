@@ -0,0 +1,177 @@
+import sys
+from importlib.util import find_spec
+
+import numpy as np
+
+# Numba ships with vectorbt; the NumPy kernel is used without it. Numba is only imported for a kernel call of
+# at least NUMBA_MIN_ROWS rows (or once something else imported it), so a process that only evaluates the
+# latest rows never pays for importing and compiling it.
+NUMBA_AVAILABLE = find_spec('numba') is not None
+NUMBA_MIN_ROWS = 1000
+
+
+class SignalSpec:
+    """
+    Declarative form of a `generate_signal_score` call. A spec can be used wherever an `eval_function` is
+    expected, but unlike a Python callable it also declares the columns it reads and can be compiled together
+    with other specs into one array computation (see `CompiledSpecs`).
+
+    Attributes:
+    - column (str): The column to generate the signal for.
+    - signal_line (str, optional): The column used as a signal line for crossover comparison.
+    - threshold_up (float, optional): The upper threshold for a 'positive' signal when there is no signal line.
+    - threshold_down (float, optional): The lower threshold for a 'negative' signal when there is no signal line.
+    - neutral_zone (float, optional): The crossover tolerance around the signal line.
+    - inverted (bool): If True, inverts the interpretation of 'positive' and 'negative' signals.
+    """
+    FIELDS = ('column', 'signal_line', 'threshold_up', 'threshold_down', 'neutral_zone', 'inverted')
+
+    def __init__(self, column, signal_line=None, threshold_up=None, threshold_down=None, neutral_zone=None, inverted=False):
+        self.column = column
+        self.signal_line = signal_line
+        self.threshold_up = threshold_up
+        self.threshold_down = threshold_down
+        self.neutral_zone = neutral_zone
+        self.inverted = inverted
+
+    def __call__(self, df):
+        from signals import generate_signal_score
+        return generate_signal_score(df, self.column, self.signal_line, self.threshold_up, self.threshold_down, self.neutral_zone, self.inverted)
+
+    def series(self, df, codes=False):
+        """Evaluates the spec for every row of `df`, see `generate_signal_score_series`."""
+        from signals import generate_signal_score_series
+        return generate_signal_score_series(df, self.column, self.signal_line, self.threshold_up, self.threshold_down, self.neutral_zone, self.inverted, codes=codes)
+
+    def columns(self):
+        """Returns the columns the spec reads."""
+        return [self.column] + ([self.signal_line] if self.signal_line else [])
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, spec):
+        return cls(**{field: spec[field] for field in cls.FIELDS if field in spec})
+
+    def _key(self):
+        return tuple(getattr(self, field) for field in self.FIELDS)
+
+    def __eq__(self, other):
+        return isinstance(other, SignalSpec) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return f"SignalSpec({', '.join(f'{field}={getattr(self, field)!r}' for field in self.FIELDS)})"
+
+
+class CompiledSpecs:
+    """
+    A set of SignalSpecs compiled into flat arrays, scored together in one pass over a matrix of column values.
+
+    Attributes:
+    - columns (list): The distinct columns read by the specs, in the order the value matrix must have.
+    - use_numba (bool): Whether the Numba kernel is used instead of the NumPy one (see `NUMBA_MIN_ROWS`).
+
+    Methods:
+    - score(values): Scores every spec on a (..., len(columns)) array of values, e.g. the last row of one
+      asset, the last rows of many assets, or a whole history.
+    - score_frame(df, rows): Scores every spec on the rows of a DataFrame.
+    """
+    def __init__(self, specs, use_numba=True):
+        self.columns = list(dict.fromkeys(column for spec in specs for column in spec.columns()))
+        position = {column: i for i, column in enumerate(self.columns)}
+        crossover = [bool(spec.signal_line) for spec in specs]
+
+        self.value_index = np.array([position[spec.column] for spec in specs], dtype=np.intp)
+        self.line_index = np.array([position[spec.signal_line] if cross else -1 for spec, cross in zip(specs, crossover)], dtype=np.intp)
+        # Crossovers compare against line +/- tolerance, threshold specs against fixed bounds, as generate_signal_score does
+        self.tolerance = np.array([(spec.neutral_zone or 0) if cross else 0 for spec, cross in zip(specs, crossover)], dtype=float)
+        self.upper = np.array([np.nan if cross or spec.threshold_up is None else spec.threshold_up for spec, cross in zip(specs, crossover)], dtype=float)
+        self.lower = np.array([np.nan if cross or spec.threshold_down is None else spec.threshold_down for spec, cross in zip(specs, crossover)], dtype=float)
+        self.inverted = np.array([bool(spec.inverted) for spec in specs], dtype=bool)
+        self.use_numba = use_numba and NUMBA_AVAILABLE
+
+    def score(self, values):
+        """
+        Scores every spec.
+
+        Parameters:
+        - values (np.ndarray): Column values with the columns of `columns` on the last axis. Missing columns should be NaN.
+
+        Returns:
+        np.ndarray: int8 status codes with the specs on the last axis.
+        """
+        values = np.asarray(values, dtype=float)
+        flat = np.ascontiguousarray(values.reshape(-1, values.shape[-1]))
+        kernel = _numba_kernel(len(flat)) if self.use_numba else None
+        if kernel is not None:
+            codes = kernel(flat, self.value_index, self.line_index, self.upper, self.lower, self.tolerance, self.inverted)
+        else:
+            codes = _score_numpy(flat, self.value_index, self.line_index, self.upper, self.lower, self.tolerance, self.inverted)
+        return codes.reshape(values.shape[:-1] + (len(self.value_index),))
+
+    def score_frame(self, df, rows=None):
+        """Scores every spec on `df[rows]` (all rows by default). Columns missing from `df` score neutral."""
+        rows = rows if rows is not None else slice(None)
+        matrix = np.full((len(df.index[rows]), len(self.columns)), np.nan)
+        for i, column in enumerate(self.columns):
+            if column in df:
+                matrix[:, i] = df[column].to_numpy(dtype=float)[rows]
+        return self.score(matrix)
+
+
+def _score_numpy(values, value_index, line_index, upper, lower, tolerance, inverted):
+    current = values[:, value_index]
+    crossover = line_index >= 0
+    line = np.where(crossover, values[:, np.where(crossover, line_index, 0)], np.nan)
+    upper = np.where(crossover, line + tolerance, upper)
+    lower = np.where(crossover, line - tolerance, lower)
+
+    above = (current > upper) ^ inverted
+    below = (current < lower) ^ inverted
+    above_code = np.where(inverted, -1, 1)
+    codes = np.where(above, above_code, np.where(below, -above_code, 0))
+    missing = np.isnan(current) | (crossover & np.isnan(line))
+    return np.where(missing, 0, codes).astype(np.int8)
+
+
+def _score_loop(values, value_index, line_index, upper, lower, tolerance, inverted):
+    n_rows = values.shape[0]
+    n_specs = value_index.shape[0]
+    codes = np.zeros((n_rows, n_specs), dtype=np.int8)
+    for i in range(n_rows):
+        for j in range(n_specs):
+            current = values[i, value_index[j]]
+            if np.isnan(current):
+                continue
+            up = upper[j]
+            down = lower[j]
+            if line_index[j] >= 0:
+                line = values[i, line_index[j]]
+                if np.isnan(line):
+                    continue
+                up = line + tolerance[j]
+                down = line - tolerance[j]
+            if (current > up) != inverted[j]:
+                codes[i, j] = -1 if inverted[j] else 1
+            elif (current < down) != inverted[j]:
+                codes[i, j] = 1 if inverted[j] else -1
+    return codes
+
+
+_score_numba = None
+
+
+def _numba_kernel(rows):
+    """
+    Returns `_score_loop` compiled with Numba, or None while Numba is not imported yet and `rows` is too few
+    to be worth importing it for.
+    """
+    global _score_numba
+    if _score_numba is None and (rows >= NUMBA_MIN_ROWS or 'numba' in sys.modules):
+        from numba import njit
+        _score_numba = njit(cache=True)(_score_loop)
+    return _score_numba
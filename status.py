@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+
+
+POSITIVE = 1
+NEUTRAL = 0
+NEGATIVE = -1
+
+STATUS_CODES = {'positive': POSITIVE, 'neutral': NEUTRAL, 'negative': NEGATIVE}
+STATUS_LABELS = np.array(['negative', 'neutral', 'positive'])
+
+
+def encode_statuses(statuses):
+    """
+    Encodes status strings as int8 codes (1 = positive, 0 = neutral, -1 = negative).
+
+    Parameters:
+    - statuses (str, list, np.ndarray or pd.Series): The status strings to encode.
+
+    Returns:
+    np.int8 or np.ndarray: The encoded status codes. Unknown values are encoded as neutral.
+    """
+    if isinstance(statuses, str):
+        return np.int8(STATUS_CODES.get(statuses, NEUTRAL))
+    statuses = np.asarray(statuses, dtype=object)
+    codes = np.zeros(statuses.shape, dtype=np.int8)
+    codes[statuses == 'positive'] = POSITIVE
+    codes[statuses == 'negative'] = NEGATIVE
+    return codes
+
+
+def decode_statuses(codes):
+    """
+    Decodes int8 status codes back into 'positive', 'neutral' and 'negative' strings.
+
+    Parameters:
+    - codes (int or array-like): The status codes to decode.
+
+    Returns:
+    str or np.ndarray: The decoded status strings.
+    """
+    labels = STATUS_LABELS[np.asarray(codes, dtype=np.int64) + 1]
+    return str(labels) if labels.ndim == 0 else labels
+
+
+def group_vote(codes, axis=-1):
+    """
+    Net vote used by `SignalGroup`: positive if positives outnumber negatives, negative if the
+    reverse, neutral otherwise. Equivalent to the sign of the sum of the codes.
+    """
+    return np.sign(np.asarray(codes, dtype=np.int64).sum(axis=axis)).astype(np.int8)
+
+
+def plurality_vote(codes, axis=-1):
+    """
+    Plurality vote used by `TradingFramework.evaluate_timeframe`: the most common status wins, and ties
+    are broken in the order positive, neutral, negative.
+    """
+    codes = np.asarray(codes)
+    positive = (codes == POSITIVE).sum(axis=axis)
+    neutral = (codes == NEUTRAL).sum(axis=axis)
+    negative = (codes == NEGATIVE).sum(axis=axis)
+    return np.where((positive >= neutral) & (positive >= negative), POSITIVE,
+                    np.where(neutral >= negative, NEUTRAL, NEGATIVE)).astype(np.int8)
+
+
+def majority_vote(codes, axis=-1):
+    """
+    Strict majority vote used by `TradingFramework.determine_overall_status`: a status wins only if it
+    holds more than half of the votes, otherwise the result is neutral.
+    """
+    codes = np.asarray(codes)
+    half = codes.shape[axis] / 2
+    positive = (codes == POSITIVE).sum(axis=axis)
+    negative = (codes == NEGATIVE).sum(axis=axis)
+    return np.where(positive > half, POSITIVE, np.where(negative > half, NEGATIVE, NEUTRAL)).astype(np.int8)
+
+
+class EvaluationResult:
+    """
+    Array-backed result of a framework evaluation, holding one int8 status code per
+    timeframe x signal group x signal.
+
+    Group overall statuses are stored under the signal name 'Overall' and timeframe overall
+    statuses under the group name 'Overall', mirroring the keys of the nested dict results.
+
+    Attributes:
+    - codes (pd.Series): int8 status codes indexed by a (timeframe, group, signal) MultiIndex.
+
+    Methods:
+    - to_dict(): Returns the nested dict view produced by `TradingFramework.evaluate_all_timeframes`.
+    - timeframe_statuses(): Returns the overall status code of each timeframe.
+    - group_statuses(): Returns the overall status code of each group as a timeframe x group DataFrame.
+    - concat(results): Combines the results of several frameworks into one DataFrame of codes.
+    """
+    INDEX_NAMES = ['timeframe', 'group', 'signal']
+
+    def __init__(self, codes):
+        self.codes = codes.astype(np.int8)
+
+    @classmethod
+    def from_timeframes(cls, timeframe_codes):
+        """
+        Builds a result from a dict mapping each timeframe name to its codes, a pd.Series indexed by (group, signal).
+        """
+        if not timeframe_codes:
+            index = pd.MultiIndex.from_arrays([[], [], []], names=cls.INDEX_NAMES)
+            return cls(pd.Series([], index=index, dtype=np.int8))
+        codes = pd.concat(timeframe_codes, names=cls.INDEX_NAMES[:1])
+        codes.index.names = cls.INDEX_NAMES
+        return cls(codes)
+
+    def timeframe_statuses(self):
+        """Returns the overall status code of each timeframe as a pd.Series."""
+        return self.codes.xs(('Overall', 'Overall'), level=['group', 'signal'])
+
+    def group_statuses(self):
+        """Returns the overall status code of each signal group as a timeframe x group DataFrame."""
+        groups = self.codes.xs('Overall', level='signal')
+        groups = groups[groups.index.get_level_values('group') != 'Overall']
+        return groups.unstack('group', fill_value=NEUTRAL).astype(np.int8)
+
+    def to_dict(self):
+        """
+        Returns the nested dict view of the result: {timeframe: {group: {signal: status, 'Overall': status}, 'Overall': status}}.
+        """
+        results = {}
+        labels = decode_statuses(self.codes.to_numpy()).tolist()
+        for (timeframe, group, signal), label in zip(self.codes.index, labels):
+            timeframe_results = results.setdefault(timeframe, {})
+            if group == 'Overall':
+                timeframe_results['Overall'] = label
+            else:
+                timeframe_results.setdefault(group, {})[signal] = label
+        for timeframe_results in results.values():
+            # Keep 'Overall' as the last key, as evaluate_timeframe always did
+            if 'Overall' in timeframe_results:
+                timeframe_results['Overall'] = timeframe_results.pop('Overall')
+        return results
+
+    @staticmethod
+    def concat(results):
+        """
+        Combines several results into one DataFrame of int8 codes.
+
+        Parameters:
+        - results (dict): Maps a key (e.g. a ticker) to its EvaluationResult.
+
+        Returns:
+        pd.DataFrame: One row per key and one column per (timeframe, group, signal).
+        """
+        if not results:
+            return pd.DataFrame(dtype=np.int8)
+        return pd.DataFrame({key: result.codes for key, result in results.items()}).T.fillna(NEUTRAL).astype(np.int8)
+
+    def __repr__(self):
+        return f"EvaluationResult({len(self.codes)} statuses)"
@@ -0,0 +1,139 @@
+import json
+import os
+import re
+import shutil
+
+import numpy as np
+import pandas as pd
+
+
+def write_frame(path, df):
+    """
+    Writes a DataFrame with a DatetimeIndex to a directory of raw NumPy arrays: the index as int64
+    nanoseconds since the epoch, one 2D block per column dtype, and a small JSON header.
+    The directory is replaced atomically so readers never see a partially written frame.
+
+    Parameters:
+    - path (str): The directory to write the frame to.
+    - df (pd.DataFrame): The frame to write. Object columns are stored as float64.
+    """
+    tmp_path = path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    df = df.astype({column: float for column, dtype in df.dtypes.items() if dtype == object})
+    np.save(os.path.join(tmp_path, 'index.npy'), np.asarray(df.index, dtype='datetime64[ns]').view(np.int64))
+
+    blocks = []
+    columns_by_dtype = {}
+    for column, dtype in df.dtypes.items():
+        columns_by_dtype.setdefault(np.dtype(dtype).str, []).append(column)
+    for i, (dtype, columns) in enumerate(columns_by_dtype.items()):
+        file_name = f'block_{i}.npy'
+        np.save(os.path.join(tmp_path, file_name), np.ascontiguousarray(df[columns].to_numpy(dtype=dtype)))
+        blocks.append({'file': file_name, 'columns': columns})
+
+    header = {'columns': list(df.columns), 'index_name': df.index.name, 'rows': len(df), 'blocks': blocks}
+    with open(os.path.join(tmp_path, 'header.json'), 'w') as f:
+        json.dump(header, f)
+
+    old_path = path + '.old'
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.rename(path, old_path)
+    os.rename(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+def read_frame(path, mmap_mode=None):
+    """
+    Reads a frame written by `write_frame`.
+
+    Parameters:
+    - path (str): The directory the frame was written to.
+    - mmap_mode (str, optional): Passed to `np.load`. With 'r' or 'c' the arrays are memory-mapped instead
+      of read, and a single-dtype frame is returned without copying.
+
+    Returns:
+    pd.DataFrame: The stored frame.
+    """
+    with open(os.path.join(path, 'header.json')) as f:
+        header = json.load(f)
+
+    index = pd.DatetimeIndex(np.load(os.path.join(path, 'index.npy'), mmap_mode=mmap_mode).view('datetime64[ns]'), name=header['index_name'])
+    frames = [pd.DataFrame(np.load(os.path.join(path, block['file']), mmap_mode=mmap_mode), index=index, columns=block['columns'], copy=False)
+              for block in header['blocks']]
+
+    if not frames:
+        return pd.DataFrame(index=index)
+    if len(frames) == 1:
+        return frames[0]
+    return pd.concat(frames, axis=1)[header['columns']]
+
+
+def read_index(path, mmap_mode='r'):
+    """Reads only the DatetimeIndex of a frame written by `write_frame`."""
+    return pd.DatetimeIndex(np.load(os.path.join(path, 'index.npy'), mmap_mode=mmap_mode).view('datetime64[ns]'))
+
+
+class OHLCVStore:
+    """
+    A persistent local store of OHLCV bars, keyed by (ticker, timespan, multiplier).
+
+    Each key is stored as a directory of NumPy arrays (see `write_frame`), so loading a series is a raw
+    binary read rather than a parse, and the arrays can be memory-mapped.
+
+    Attributes:
+    - root (str): The directory holding the store.
+
+    Methods:
+    - load(ticker, timespan, multiplier): Loads the stored bars, or an empty DataFrame.
+    - last_timestamp(ticker, timespan, multiplier): Returns the timestamp of the last stored bar, or None.
+    - merge(ticker, timespan, multiplier, df): Merges new bars into the stored series, newer bars winning on overlap.
+    """
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, ticker, timespan, multiplier):
+        """Returns the directory used for a key. Characters that are not filename-safe (e.g. the ':' of 'X:BTCUSD') are replaced."""
+        return os.path.join(self.root, re.sub(r'[^A-Za-z0-9_.-]', '_', ticker), f'{multiplier}_{timespan}')
+
+    def exists(self, ticker, timespan, multiplier):
+        return os.path.exists(os.path.join(self.path(ticker, timespan, multiplier), 'header.json'))
+
+    def load(self, ticker, timespan, multiplier, mmap_mode=None):
+        """
+        Loads the stored bars for a key.
+
+        Returns:
+        pd.DataFrame: The stored bars indexed by timestamp, or an empty DataFrame if nothing is stored.
+        """
+        if not self.exists(ticker, timespan, multiplier):
+            return pd.DataFrame()
+        return read_frame(self.path(ticker, timespan, multiplier), mmap_mode=mmap_mode)
+
+    def last_timestamp(self, ticker, timespan, multiplier):
+        """Returns the timestamp of the last stored bar for a key, or None if nothing is stored."""
+        if not self.exists(ticker, timespan, multiplier):
+            return None
+        index = read_index(self.path(ticker, timespan, multiplier))
+        return index[-1] if len(index) else None
+
+    def save(self, ticker, timespan, multiplier, df):
+        """Replaces the stored bars for a key."""
+        write_frame(self.path(ticker, timespan, multiplier), df)
+
+    def merge(self, ticker, timespan, multiplier, df):
+        """
+        Merges new bars into the stored bars for a key. Bars with the same timestamp are replaced by
+        the new ones, since the last stored bar may have been incomplete when it was fetched.
+
+        Returns:
+        pd.DataFrame: The merged bars.
+        """
+        stored = self.load(ticker, timespan, multiplier)
+        combined = pd.concat([stored, df]) if not stored.empty else df
+        combined = combined[~combined.index.duplicated(keep='last')].sort_index()
+        self.save(ticker, timespan, multiplier, combined)
+        return combined
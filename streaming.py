@@ -0,0 +1,94 @@
+import asyncio
+
+import pandas as pd
+
+from resample import bar_close_times
+from status import decode_statuses
+
+
+# Bars kept per timeframe while streaming, unless the strategy's lookback needs more
+DEFAULT_STREAM_WINDOW = 500
+
+
+class StatusChange:
+    """
+    A change of a status while streaming bars into a `TradingFramework`.
+
+    Attributes:
+    - timestamp (pd.Timestamp): The timestamp of the bar that caused the change.
+    - timeframe (str): The timeframe whose status changed, or 'Overall' for the framework's overall status.
+    - group (str): The signal group, or 'Overall' for the timeframe's overall status.
+    - signal (str): The signal, or 'Overall' for the group's overall status.
+    - previous (str): The status before the bar ('positive', 'neutral', 'negative'), or None if there was none.
+    - status (str): The status after the bar.
+    """
+    def __init__(self, timestamp, timeframe, group, signal, previous, status):
+        self.timestamp = timestamp
+        self.timeframe = timeframe
+        self.group = group
+        self.signal = signal
+        self.previous = previous
+        self.status = status
+
+    def __repr__(self):
+        return f"StatusChange({self.timestamp}, {self.timeframe}/{self.group}/{self.signal}: {self.previous} -> {self.status})"
+
+
+def status_changes(previous, current, timestamp, timeframe):
+    """
+    Compares two evaluations of a timeframe and returns a StatusChange for every status that differs.
+
+    Parameters:
+    - previous (pd.Series): int8 codes indexed by (group, signal) before the bar, or None.
+    - current (pd.Series): int8 codes indexed by (group, signal) after the bar.
+    - timestamp (pd.Timestamp): The timestamp of the bar.
+    - timeframe (str): The timeframe that was evaluated.
+
+    Returns:
+    list: The StatusChange events.
+    """
+    before = previous.reindex(current.index) if previous is not None else pd.Series(index=current.index, dtype=float)
+    changed = before.to_numpy() != current.to_numpy()
+    events = []
+    for (group, signal), old, new in zip(current.index[changed], before.to_numpy()[changed], current.to_numpy()[changed]):
+        events.append(StatusChange(timestamp, timeframe, group, signal, None if pd.isna(old) else decode_statuses(old), decode_statuses(new)))
+    return events
+
+
+def iter_bars(timeframe_data):
+    """
+    Replays stored bars of several timeframes one at a time, in the order the bars closed (see
+    `resample.bar_close_times`, which the vectorized backtest aligns timeframes by as well). Bars closing at the
+    same time are replayed in the order of the timeframes.
+
+    Parameters:
+    - timeframe_data (dict): The bars of each timeframe, keyed by their pandas frequency strings, e.g. as
+      returned by `FetchData.fetch_timeframes`.
+
+    Yields:
+    tuple: (timeframe name, single-row pd.DataFrame).
+    """
+    closes = []
+    for order, (name, data) in enumerate(timeframe_data.items()):
+        if data.empty:
+            continue
+        closes.append(pd.DataFrame({'close_time': bar_close_times(data.index, name), 'order': order, 'name': name, 'position': range(len(data))}))
+    if not closes:
+        return
+
+    schedule = pd.concat(closes).sort_values(['close_time', 'order'], kind='stable')
+    for name, position in zip(schedule['name'], schedule['position']):
+        yield name, timeframe_data[name].iloc[position:position + 1]
+
+
+async def replay_bars(timeframe_data, delay=0):
+    """
+    Async counterpart of `iter_bars`, for testing `TradingFramework.stream` with a local replay of stored bars.
+
+    Parameters:
+    - timeframe_data (dict): The bars of each timeframe.
+    - delay (float, optional): Seconds to wait between bars.
+    """
+    for name, bar in iter_bars(timeframe_data):
+        await asyncio.sleep(delay)
+        yield name, bar
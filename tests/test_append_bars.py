@@ -0,0 +1,41 @@
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+import pandas_ta as ta
+import pytest
+
+from benchmarks.synthetic import generate_bars
+from framework import TradingFramework
+
+BARS = generate_bars('AAA', '1D', '2020-01-01', '2022-09-27')[['open', 'high', 'low', 'close', 'volume']]
+# Chunks of new bars after the first 600, starting one bar early to also replace an incomplete last bar
+CHUNKS = [(600, 601), (601, 606), (605, 655), (655, 800), (800, len(BARS))]
+
+STRATEGIES = {
+    'recursive': [{'kind': 'ema', 'length': 10}, {'kind': 'rsi', 'length': 14}, {'kind': 'macd', 'fast': 12, 'slow': 26, 'signal': 9}],
+    'ichimoku': [{'kind': 'ichimoku', 'tenkan': 9, 'kijun': 26, 'senkou': 52}, {'kind': 'sma', 'length': 20}],
+}
+
+
+def build_framework(data, entries):
+    framework = TradingFramework('AAA', timeframes={}, active_time_frame='1D')
+    with contextlib.redirect_stdout(io.StringIO()):
+        framework.add_timeframe('1D', data.copy(), ta.Strategy(name='Test', ta=entries))
+    return framework
+
+
+@pytest.mark.parametrize('kind', list(STRATEGIES))
+def test_appended_bars_match_full_recompute(kind):
+    incremental = build_framework(BARS.iloc[:600], STRATEGIES[kind])
+    for start, stop in CHUNKS:
+        incremental.append_bars('1D', BARS.iloc[start:stop])
+    full = build_framework(BARS, STRATEGIES[kind])
+    full.apply_strategy('1D')
+
+    appended, expected = incremental.timeframes['1D']['data'], full.timeframes['1D']['data']
+    assert appended.index.equals(expected.index)
+    assert set(appended.columns) == set(expected.columns) and len(expected.columns) > len(BARS.columns)
+    for column in expected.columns:
+        assert np.allclose(appended[column].to_numpy(dtype=float), expected[column].to_numpy(dtype=float), rtol=1e-6, atol=1e-6, equal_nan=True), column
@@ -0,0 +1,61 @@
+import contextlib
+import io
+
+import pandas as pd
+import pandas_ta as ta
+
+from benchmarks.synthetic import generate_bars
+from framework import TradingFramework
+from signals import Signal, SignalGroup
+from specs import SignalSpec
+
+# The replay evaluates every timeframe on slices of the first timeframe's bars and indicator columns, while the
+# vectorized backtest evaluates each timeframe on its own data and only takes a status once its bar has closed
+# (see `TradingFramework.status_matrix`). The two agree when every timeframe holds the same bars, the first
+# timeframe computes every column the others read, and the other voting timeframes are shorter than the active
+# one, so the status of a bar is known by the close of the same active bar. On genuinely higher timeframes the
+# vectorized backtest intentionally lags the replay, which reads the bar still in progress.
+GROUPS = {
+    '1D': [('Trend', [('SMA', SignalSpec('close', 'SMA_5')), ('Cross', SignalSpec('SMA_5', 'SMA_10'))]),
+           ('Momentum', [('RSI', SignalSpec('RSI_14', threshold_up=52, threshold_down=48))])],
+    '4h': [('Momentum', [('RSI', SignalSpec('RSI_14', threshold_up=55, threshold_down=45))])],
+    '1h': [('Trend', [('SMA', SignalSpec('close', 'SMA_10'))])],
+}
+
+
+def build_framework():
+    bars = generate_bars('AAA', '1D', '2023-01-01', '2023-07-01')
+    strategy = ta.Strategy(name='Test', ta=[{'kind': 'sma', 'length': 5}, {'kind': 'sma', 'length': 10}, {'kind': 'rsi', 'length': 14}])
+    framework = TradingFramework('AAA', timeframes={}, active_time_frame='1D', bias_timeframes=['4h'], confirmation_timeframes=['1h'])
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name, groups in GROUPS.items():
+            framework.add_timeframe(name, bars.copy(), strategy)
+            for group_name, signals in groups:
+                group = SignalGroup(group_name)
+                for signal_name, spec in signals:
+                    group.add_signal(Signal(signal_name, spec))
+                framework.add_signal_group_to_timeframe(name, group)
+            # The replay slices the bars as they are, so the indicators are computed up front on the whole history
+            framework.ensure_indicators(name)
+    return framework
+
+
+def test_vectorized_backtest_matches_replay():
+    framework = build_framework()
+    _, entries, exits = framework.backtest_signals()
+    vectorized = framework.backtest()
+    replay = build_framework().backtest(vectorized=False)
+
+    orders = replay.orders.records_readable
+    assert len(orders) >= 4
+    assert orders.equals(vectorized.orders.records_readable)
+    assert replay.trades.records_readable.equals(vectorized.trades.records_readable)
+    assert replay.total_return() == vectorized.total_return()
+
+    # The replay buys on the first positive status while flat and sells on the first negative one while
+    # holding; the vectorized entries and exits hold every positive and negative status
+    buys = orders.loc[orders['Side'] == 'Buy', 'Timestamp']
+    sells = orders.loc[orders['Side'] == 'Sell', 'Timestamp']
+    assert entries[buys].all() and exits[sells].all()
+    first_entries = entries & ~entries.shift(fill_value=False)
+    assert set(buys) <= set(first_entries[first_entries].index)
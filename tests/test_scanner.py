@@ -0,0 +1,94 @@
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+import pandas_ta as ta
+import pytest
+
+from benchmarks.polygon_stub import PolygonStub
+from data_extract import FetchData
+from framework import TradingFramework
+from panel import MarketPanel
+from scanner import MarketScanner
+from signals import Signal, SignalGroup
+from specs import SignalSpec
+
+END = '2024-06-28'
+DAYS = 120
+
+
+@pytest.fixture(scope='module')
+def stub():
+    with PolygonStub(universe=300) as stub:
+        yield stub
+
+
+@pytest.fixture
+def fetcher(stub):
+    return FetchData('test', base_url=stub.base_url, backoff=0, max_retries=0)
+
+
+def weekdays(end, days):
+    dates = pd.date_range(pd.Timestamp(end) - pd.Timedelta(days=days - 1), end, freq='D')
+    return dates[dates.weekday < 5]
+
+
+def test_update_fetches_each_session_once(stub, fetcher):
+    stub.reset()
+    panel = MarketPanel()
+    with contextlib.redirect_stdout(io.StringIO()):
+        added = panel.update(fetcher, end=END, days=DAYS)
+    sessions = weekdays(END, DAYS)
+    assert added == len(sessions) == stub.requests['grouped']
+    assert panel.dates().equals(sessions)
+    assert panel.fields['close'].shape[1] == 300
+
+    stub.reset()
+    assert panel.update(fetcher, end=END) == 0
+    assert stub.requests.get('grouped', 0) == 0
+
+
+def test_update_refetches_failed_dates(fetcher, monkeypatch, tmp_path):
+    failed = pd.Timestamp('2024-06-12')
+    fetch_grouped_daily = fetcher.fetch_grouped_daily
+    monkeypatch.setattr(fetcher, 'fetch_grouped_daily',
+                        lambda date, asset_type='Stock': None if pd.Timestamp(date) == failed else fetch_grouped_daily(date, asset_type))
+    panel = MarketPanel()
+    with contextlib.redirect_stdout(io.StringIO()):
+        panel.update(fetcher, end=END, days=DAYS)
+    assert failed not in panel.dates()
+    assert failed not in panel.closed
+
+    monkeypatch.setattr(fetcher, 'fetch_grouped_daily', fetch_grouped_daily)
+    panel.save(str(tmp_path / 'panel'))
+    panel = MarketPanel.load(str(tmp_path / 'panel'))
+    assert panel.update(fetcher, end=END) == 1
+    assert panel.dates().equals(weekdays(END, DAYS))
+
+
+def test_scan_ranks_tickers_like_their_own_evaluation(fetcher):
+    panel = MarketPanel()
+    with contextlib.redirect_stdout(io.StringIO()):
+        panel.update(fetcher, end=END, days=DAYS)
+        framework = TradingFramework('Template', timeframes={}, active_time_frame='1D')
+        framework.add_timeframe('1D', panel.history(panel.tickers[0]), ta.Strategy(name='Scan', ta=[{'kind': 'sma', 'length': 10}]))
+    group = SignalGroup('Trend')
+    group.add_signal(Signal('SMA', SignalSpec('close', 'SMA_10')))
+    framework.add_signal_group_to_timeframe('1D', group)
+
+    scanner = MarketScanner(framework, min_price=5, min_dollar_volume=1e6, min_history=50)
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = scanner.scan(panel)
+
+    assert len(results) and (results['close'] >= 5).all() and (results['dollar_volume'] >= 1e6).all()
+    ranks = results[['Overall', 'score', 'dollar_volume']].to_numpy()
+    assert all(tuple(ranks[i]) >= tuple(ranks[i + 1]) for i in range(len(ranks) - 1))
+    assert scanner.candidates(results, top=5) == list(results.index[results['Overall'] == 1][:5])
+
+    # Each ticker scores as its own bars would, including tickers that skipped dates
+    for ticker in results.index:
+        df = panel.history(ticker).tail(scanner.lookback).copy()
+        df['SMA_10'] = df['close'].rolling(10).mean()
+        expected = group.evaluate_group_codes(df)
+        assert scanner.signal_codes.loc[ticker, 'Trend'].equals(expected.rename(None)), ticker
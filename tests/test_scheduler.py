@@ -0,0 +1,89 @@
+import asyncio
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+import pandas_ta as ta
+
+from benchmarks.synthetic import generate_bars
+from framework import TradingFramework
+from resample import build_timeframes
+from scheduler import RefreshScheduler, SessionCalendar, SimulatedClock
+from signals import Signal, SignalGroup
+from specs import SignalSpec
+from watchlist import Watchlist
+
+TIMEFRAMES = ['30min', '1h', '4h', '1D']
+START = pd.Timestamp('2024-02-26')
+# Stock sessions around a weekend and the start of US daylight saving time on 2024-03-10
+REFRESH_START, REFRESH_END = pd.Timestamp('2024-03-07 12:07'), pd.Timestamp('2024-03-12 03:00')
+ITEMS = {'AAA': 'Stock', 'X:BBBUSD': 'Crypto'}
+
+
+def base_series(ticker, asset_type, timespan):
+    """The base bars the stand-in fetch serves, shaped like Polygon.io's: stock bars only in the extended session."""
+    df = generate_bars(ticker, '30min' if timespan == 'minute' else '1D', START, REFRESH_END + pd.Timedelta(days=2))
+    if asset_type != 'Stock':
+        return df
+    if timespan == 'day':
+        df.index = df.index.tz_localize('America/New_York').tz_convert('UTC').tz_localize(None)
+    local = df.index.tz_localize('UTC').tz_convert('America/New_York')
+    keep = local.weekday < 5
+    if timespan == 'minute':
+        keep &= (local.hour >= 4) & (local.hour < 20)
+    return df[keep]
+
+
+BASES = {(ticker, timespan, multiplier): base_series(ticker, asset_type, timespan)
+         for ticker, asset_type in ITEMS.items() for timespan, multiplier in [('minute', 30), ('day', 1)]}
+
+
+def build_framework(ticker, asset_type, upto):
+    """Builds a framework from the base bars known at `upto`, with the bars closed by then."""
+    framework = TradingFramework(ticker, timeframes={}, active_time_frame='1h')
+    group = SignalGroup('Trend')
+    group.add_signal(Signal('SMA', SignalSpec('close', 'SMA_5')))
+    calendar = SessionCalendar(asset_type)
+    data = {}
+    for timespan, multiplier in [('minute', 30), ('day', 1)]:
+        bars = BASES[(ticker, timespan, multiplier)]
+        data.update(build_timeframes(bars[bars.index <= upto], [name for name in TIMEFRAMES if (name == '1D') == (timespan == 'day')], asset_type))
+    for name, timeframe in data.items():
+        framework.add_timeframe(name, timeframe[timeframe.index <= calendar.last_closed_bar(name, upto)],
+                                ta.Strategy(name='Test', ta=[{'kind': 'sma', 'length': 5}]))
+        framework.add_signal_group_to_timeframe(name, group)
+    return framework
+
+
+def test_simulated_week_matches_full_rebuild():
+    clock = SimulatedClock(REFRESH_START)
+    fetched = []
+
+    def fetch(series):
+        fetched.append((clock.now(), list(series)))
+        return {key: BASES[key][BASES[key].index <= clock.now()] for key in series}
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        watchlist = Watchlist('test', base_url='http://127.0.0.1:1')
+        for ticker, asset_type in ITEMS.items():
+            watchlist.add_item(ticker, ticker, asset_type, framework=build_framework(ticker, asset_type, REFRESH_START - pd.Timedelta(hours=3)))
+        scheduler = RefreshScheduler(watchlist, clock=clock, fetch=fetch, budget=(5, 60))
+        asyncio.run(scheduler.run(until=REFRESH_END))
+
+    assert scheduler.log
+    # Stock bars do not close on New York weekends, so only crypto is fetched then
+    weekend = {key[0] for time, keys in fetched for key in keys
+               if pd.Timestamp(time).tz_localize('UTC').tz_convert('America/New_York').weekday() >= 5}
+    assert weekend == {'X:BBBUSD'}
+
+    for ticker, asset_type in ITEMS.items():
+        with contextlib.redirect_stdout(io.StringIO()):
+            expected = build_framework(ticker, asset_type, REFRESH_END - pd.Timedelta(seconds=15))
+        framework = watchlist.items[ticker].framework
+        for name in TIMEFRAMES:
+            want, got = expected.timeframes[name]['data'], framework.timeframes[name]['data']
+            assert got.index.equals(want.index), (ticker, name)
+            np.testing.assert_allclose(got[want.columns].to_numpy(float), want.to_numpy(float), err_msg=f'{ticker} {name}')
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert framework.evaluate().to_dict() == expected.evaluate().to_dict()
@@ -0,0 +1,66 @@
+import contextlib
+import io
+from datetime import datetime
+from urllib.parse import urlparse
+
+import pandas as pd
+import pytest
+
+from benchmarks.polygon_stub import PolygonStub
+from data_extract import FetchData
+from store import OHLCVStore
+
+
+@pytest.fixture(scope='module')
+def stub():
+    with PolygonStub() as stub:
+        yield stub
+
+
+def requested_ranges(fetcher):
+    """The (from, to) dates of the range requests a fetcher sent."""
+    return [tuple(urlparse(record['url']).path.split('/')[-2:]) for record in fetcher.request_log]
+
+
+def assert_same_bars(df, expected):
+    # The store keeps nanosecond timestamps, whatever the resolution pandas parses the response to
+    pd.testing.assert_frame_equal(df, expected, check_index_type=False)
+
+
+def test_store_fetches_only_bars_after_the_last_stored_bar(stub, tmp_path):
+    with contextlib.redirect_stdout(io.StringIO()):
+        full = FetchData('test', base_url=stub.base_url, backoff=0).fetch_data('AAA', 'day')
+        fetcher = FetchData('test', store=str(tmp_path), base_url=stub.base_url, backoff=0)
+        assert_same_bars(fetcher.fetch_data('AAA', 'day'), full)
+
+        # Drop the last month, as if the store had been filled a month ago
+        store = OHLCVStore(str(tmp_path))
+        stored = store.load('AAA', 'day', 1)
+        store.save('AAA', 'day', 1, stored.iloc[:-30])
+        last_bar = stored.index[-31]
+        fetcher.request_log.clear()
+        merged = fetcher.fetch_data('AAA', 'day')
+
+    today = datetime.now().strftime('%Y-%m-%d')
+    assert requested_ranges(fetcher) == [(last_bar.strftime('%Y-%m-%d'), today)]
+    assert_same_bars(merged, full)
+    assert_same_bars(store.load('AAA', 'day', 1), full)
+
+
+def test_fetch_many_reports_malformed_responses(stub, monkeypatch):
+    respond = stub.respond
+    bodies = {'/BAD/': b'<html>Bad gateway</html>', '/NOKEY/': b'{"status":"OK","results":[{"o":1.0,"c":2.0}]}'}
+
+    def respond_malformed(path, query):
+        for ticker, body in bodies.items():
+            if ticker in path:
+                return 200, {}, body
+        return respond(path, query)
+
+    monkeypatch.setattr(stub, 'respond', respond_malformed)
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        results = FetchData('test', base_url=stub.base_url, backoff=0).fetch_many([('AAA', 'day', 1), ('BAD', 'day', 1), ('NOKEY', 'day', 1)])
+
+    assert len(results[('AAA', 'day', 1)]) and results[('BAD', 'day', 1)].empty and results[('NOKEY', 'day', 1)].empty
+    assert '2 series could not be fetched completely: BAD 1 day, NOKEY 1 day' in output.getvalue()
@@ -0,0 +1,75 @@
+import contextlib
+import io
+
+import pandas as pd
+import pytest
+
+from benchmarks.polygon_stub import PolygonStub
+from data_extract import FetchData, SNAPSHOT_BATCH_SIZE
+from watchlist import Watchlist
+
+STOCKS = [f'S{i:03d}' for i in range(SNAPSHOT_BATCH_SIZE + 50)]
+CRYPTO = ['X:BTCUSD', 'X:ETHUSD']
+# A ticker the multi-ticker snapshots leave out, as Polygon.io does for tickers without a recent trade
+MISSING = 'S007'
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    with PolygonStub() as stub:
+        respond = stub.respond
+
+        def respond_without_missing(path, query):
+            if 'tickers' in query:
+                query = {**query, 'tickers': [','.join(ticker for ticker in query['tickers'][0].split(',') if ticker != MISSING)]}
+            return respond(path, query)
+
+        monkeypatch.setattr(stub, 'respond', respond_without_missing)
+        yield stub
+
+
+def build_watchlist(stub, stocks=STOCKS):
+    watchlist = Watchlist('test', fetcher=FetchData('test', base_url=stub.base_url, backoff=0, max_retries=0))
+    with contextlib.redirect_stdout(io.StringIO()):
+        for ticker in stocks:
+            watchlist.add_item(ticker, ticker, 'Stock')
+        for ticker in CRYPTO:
+            watchlist.add_item(ticker, ticker, 'Crypto')
+    return watchlist
+
+
+def check_prices(stub, watchlist, started, finished):
+    prices = watchlist.prices()
+    assert prices['price'].notna().all()
+    for ticker, row in prices.iterrows():
+        assert row['price'] == stub.snapshot(ticker)['min']['o']
+        # The stand-in's minute bars are the last completed minute
+        assert started.floor('min') - pd.Timedelta(minutes=1) <= row['timestamp'] <= finished.floor('min') - pd.Timedelta(minutes=1)
+        assert pd.Timedelta(0) <= row['staleness'] <= finished - row['timestamp']
+
+
+def test_batch_update_uses_multi_ticker_snapshots(stub):
+    watchlist = build_watchlist(stub)
+    started = pd.Timestamp.now(tz='UTC').tz_localize(None)
+    with contextlib.redirect_stdout(io.StringIO()):
+        watchlist.update_prices()
+    finished = pd.Timestamp.now(tz='UTC').tz_localize(None)
+
+    # Two stock batches and one crypto batch, then a single request for the ticker the batches left out
+    assert stub.requests == {'snapshots': 3, 'snapshot': 1}
+    assert len(watchlist.fetcher.request_log) == 4
+    check_prices(stub, watchlist, started, finished)
+    # Every batched item is measured against the same time
+    batched = watchlist.prices().drop(MISSING)
+    assert (batched['timestamp'] + batched['staleness']).nunique() == 1
+
+
+def test_sequential_update_requests_each_item(stub):
+    watchlist = build_watchlist(stub, STOCKS[:20])
+    started = pd.Timestamp.now(tz='UTC').tz_localize(None)
+    with contextlib.redirect_stdout(io.StringIO()):
+        watchlist.update_prices(batch=False)
+    finished = pd.Timestamp.now(tz='UTC').tz_localize(None)
+
+    assert stub.requests == {'snapshot': len(watchlist.items)}
+    check_prices(stub, watchlist, started, finished)
@@ -0,0 +1,213 @@
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from optimize import ParameterSweep, check_metric, portfolio_metrics
+from parallel import dumps
+
+
+def walk_forward_folds(length, train_size, test_size, step=None, anchored=False):
+    """
+    Splits `length` bars into consecutive train/test folds. Each test window directly follows its train window.
+    With the default `step`, consecutive test windows follow each other, so together they cover the history
+    after the first train window exactly once. A smaller step makes consecutive test windows overlap, and a
+    larger one leaves gaps between them. The last test window may be shorter.
+
+    Parameters:
+    - length (int): The number of bars.
+    - train_size (int): The number of bars of each train window (of the first one, if anchored).
+    - test_size (int): The number of bars of each test window.
+    - step (int, optional): The number of bars between the starts of consecutive folds. Defaults to `test_size`.
+    - anchored (bool, optional): If True, every train window starts at the first bar and grows fold by fold;
+      otherwise the train windows roll forward with a fixed size.
+
+    Returns:
+    list: (train slice, test slice) tuples of bar positions.
+    """
+    step = step or test_size
+    folds = []
+    for start in range(0, length - train_size, step):
+        train_end = start + train_size
+        folds.append((slice(0 if anchored else start, train_end), slice(train_end, min(train_end + test_size, length))))
+    return folds
+
+
+class WalkForwardResult:
+    """
+    The result of a walk-forward run.
+
+    Attributes:
+    - folds (pd.DataFrame): One row per fold with its train and test windows, the selected parameters (when
+      optimizing) and the train and test metrics.
+    - returns (pd.Series): The bar returns of the test windows, stitched together. Where test windows overlap,
+      each bar is taken once, from the earliest fold covering it; bars in gaps between test windows are left out.
+    - equity (pd.Series): The equity curve of the stitched test windows, compounding from the initial capital.
+    - metrics (pd.Series): Total return, max drawdown and, if the bar frequency is known, Sharpe ratio of the stitched equity.
+    """
+    def __init__(self, folds, returns, initial_capital, freq=None):
+        import vectorbt  # registers the .vbt accessor
+        self.folds = folds
+        self.returns = returns
+        self.equity = initial_capital * (1 + returns).cumprod()
+        accessor = returns.vbt.returns(freq=freq) if freq else returns.vbt.returns
+        metrics = {'total_return': accessor.total(), 'max_drawdown': accessor.max_drawdown()}
+        if freq:
+            metrics['sharpe_ratio'] = accessor.sharpe_ratio()
+        self.metrics = pd.Series(metrics)
+
+    def __repr__(self):
+        return f"WalkForwardResult({len(self.folds)} folds, total return {self.metrics['total_return']:.2%})"
+
+
+class WalkForward:
+    """
+    Walk-forward validation of a TradingFramework or a ParameterSweep: the history is split into train/test
+    folds, and each test window is backtested out of sample.
+
+    With a TradingFramework the overall status history is computed once over the whole history (see
+    `TradingFramework.backtest_signals`) and each fold backtests its slice of it. With a ParameterSweep the
+    combination that ranks best on each train window is backtested on the following test window. In both cases
+    the indicators are computed once on the whole history and shared by all folds. This is only valid for
+    indicators that read past bars alone: an indicator that reads later bars, such as ichimoku's chikou span
+    (see `indicators.FORWARD_PARAMETERS`), would leak test bars into the train results and later bars into
+    every signal, so a source whose signals read one is rejected.
+
+    Each test window starts flat with the initial capital; the stitched equity compounds the test windows' returns.
+
+    Attributes:
+    - source (TradingFramework or ParameterSweep): What to validate.
+    - folds (list): The (train slice, test slice) tuples, see `walk_forward_folds`.
+    - initial_capital (float): The starting capital of every backtest.
+    - fees (float): Fees per trade, as a fraction of the traded value.
+    - freq (str): The bar frequency used for annualized metrics. Inferred from the index if omitted.
+
+    Methods:
+    - run(workers, metric, chunk_size): Runs every fold and returns a WalkForwardResult.
+    """
+    def __init__(self, source, train_size, test_size, step=None, anchored=False, initial_capital=10000, fees=0.0, freq=None):
+        self.source = source
+        if isinstance(source, ParameterSweep):
+            leads = {'the sweep': source.lead()}
+        else:
+            leads = {f'the {name} timeframe': source.indicator_lead(name) for name in source.voting_timeframes()}
+        leaking = {where: lead for where, lead in leads.items() if lead}
+        if leaking:
+            raise ValueError("Walk-forward validation needs indicators that only read past bars, but the signals of "
+                             + ', '.join(f'{where} read indicators up to {lead} bars ahead' for where, lead in leaking.items())
+                             + " (e.g. ichimoku's chikou span). Remove those indicators or the signals reading them.")
+        if isinstance(source, ParameterSweep):
+            self.close = source.data['close']
+        else:
+            self.close, self.entries, self.exits = source.backtest_signals()
+        self.folds = walk_forward_folds(len(self.close), train_size, test_size, step, anchored)
+        self.initial_capital = initial_capital
+        self.fees = fees
+        self.freq = freq or pd.infer_freq(self.close.index)
+
+    def run(self, workers=None, metric='total_return', chunk_size=1000):
+        """
+        Runs every fold.
+
+        Parameters:
+        - workers (int, optional): If greater than 1, folds run in parallel in a pool of this many processes.
+          The validation setup is shipped to each worker once, not once per fold.
+        - metric (str, optional): The metric parameters are selected by on each train window, see `ParameterSweep.run`.
+        - chunk_size (int, optional): The number of combinations simulated per call when optimizing.
+
+        Returns:
+        WalkForwardResult: The per-fold and stitched results.
+        """
+        if not self.folds:
+            print("Not enough data for a single fold.")
+            return None
+        check_metric(metric, self.freq)
+
+        if not workers or workers <= 1:
+            results = [_run_fold(fold, metric, chunk_size, self) for fold in self.folds]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(dumps(self),)) as executor:
+                results = list(executor.map(_run_fold, self.folds, [metric] * len(self.folds), [chunk_size] * len(self.folds)))
+
+        index = self.close.index
+        rows = []
+        for i, ((train, test), (params, train_metrics, test_metrics, _)) in enumerate(zip(self.folds, results)):
+            row = {'fold': i, 'train_start': index[train.start], 'train_end': index[train.stop - 1],
+                   'test_start': index[test.start], 'test_end': index[test.stop - 1], **params}
+            row.update({f'train_{name}': value for name, value in train_metrics.items()})
+            row.update({f'test_{name}': value for name, value in test_metrics.items()})
+            rows.append(row)
+
+        # Overlapping test windows (step < test_size) would repeat bars, and compound their returns twice
+        stitched = []
+        for *_, fold_returns in results:
+            if stitched:
+                fold_returns = fold_returns[fold_returns.index > stitched[-1].index[-1]]
+            if len(fold_returns):
+                stitched.append(fold_returns)
+        returns = pd.concat(stitched)
+        return WalkForwardResult(pd.DataFrame(rows).set_index('fold'), returns, self.initial_capital, self.freq)
+
+    def backtest(self, rows, entries, exits):
+        """Backtests entries and exits (one column per combination) on a window of the close prices."""
+        import vectorbt as vbt
+        return vbt.Portfolio.from_signals(self.close.iloc[rows], entries, exits, init_cash=self.initial_capital, fees=self.fees, freq=self.freq)
+
+    def select(self, rows, metric, chunk_size):
+        """Returns the grid position of the sweep's best combination on a window by `metric`, or None if no combination could be ranked."""
+        best, best_score = None, -np.inf
+        for chunk, (entries, exits) in enumerate(self.source.signal_chunks(chunk_size, rows)):
+            scores = portfolio_metrics(self.backtest(rows, entries, exits), self.freq)[metric].to_numpy(dtype=float)
+            if np.all(np.isnan(scores)):
+                continue
+            column = int(np.nanargmax(scores))
+            if scores[column] > best_score:
+                best, best_score = chunk * chunk_size + column, scores[column]
+        return best
+
+
+# The WalkForward of the current process, set once per worker by _init_worker
+_walk_forward = None
+
+
+def _init_worker(payload):
+    global _walk_forward
+    _walk_forward = pickle.loads(payload)
+
+
+def _run_fold(fold, metric, chunk_size, walk_forward=None):
+    """
+    Runs one fold, on the worker's WalkForward unless one is given.
+
+    Returns:
+    tuple: (selected parameters, train metrics, test metrics, test returns).
+    """
+    walk_forward = walk_forward or _walk_forward
+    train, test = fold
+    window = slice(train.start, test.stop)
+    split = train.stop - train.start
+
+    if isinstance(walk_forward.source, ParameterSweep):
+        position = walk_forward.select(train, metric, chunk_size)
+        if position is None:
+            # No combination could be ranked on the train window; stay flat
+            entries = pd.DataFrame(False, index=walk_forward.close.index[window], columns=['flat'])
+            exits = entries
+            params = {}
+        else:
+            entries, exits = walk_forward.source.combination_signals(position, window)
+            params = dict(zip(entries.columns.names, entries.columns[0]))
+    else:
+        entries = walk_forward.entries.iloc[window].to_frame()
+        exits = walk_forward.exits.iloc[window].to_frame()
+        params = {}
+
+    train_portfolio = walk_forward.backtest(train, entries.iloc[:split], exits.iloc[:split])
+    test_portfolio = walk_forward.backtest(test, entries.iloc[split:], exits.iloc[split:])
+    train_metrics = portfolio_metrics(train_portfolio, walk_forward.freq).iloc[0].to_dict()
+    test_metrics = portfolio_metrics(test_portfolio, walk_forward.freq).iloc[0].to_dict()
+    test_returns = test_portfolio.returns()
+    if isinstance(test_returns, pd.DataFrame):
+        test_returns = test_returns.iloc[:, 0]
+    return params, train_metrics, test_metrics, test_returns.rename('returns')
@@ -1,5 +1,12 @@
-import requests
-import vectorbt as bt
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_extract import FetchData
+from instrumentation import tagged, timer
+from parallel import backtest_signals_task, backtest_task, evaluate_framework_task, run_in_processes
+from status import EvaluationResult
 
 class WatchlistItem:
     """
@@ -12,8 +19,11 @@ class WatchlistItem:
         asset_type (str): Type of the asset (e.g., 'Stock', 'Crypto').
         api_key (str): API key used for fetching data.
         current_price (float): Current price of the asset. Default is None.
+        price_timestamp (pd.Timestamp): Time (naive UTC) the current price refers to. Default is None.
+        price_staleness (pd.Timedelta): Age of the current price when it was last updated. Default is None.
         framework (TradingFramework): Trading framework associated with this asset. Default is None.
         framework_results (dict): Results from the latest framework evaluation. Default is None.
+        evaluation (EvaluationResult): Array-backed status codes from the latest framework evaluation. Default is None.
         backtest_results (object): Results object from the last backtest. Default is None.
         backtest_pnl_percent (float): Percentage P&L from the last backtest. Default is None.
     """
@@ -24,31 +34,51 @@ class WatchlistItem:
         self.asset_type = asset_type
         self.api_key = api_key
         self.current_price = current_price
+        self.price_timestamp = None
+        self.price_staleness = None
         self.framework = framework
         self.framework_results = {"timeframe_statuses": None, "overall_status": None}
+        self.evaluation = None
         self.backtest_results = None
         self.backtest_pnl_percent = None
 
-    def fetch_current_price(self):
+    def fetch_current_price(self, fetcher=None):
         """
         Fetches and updates the current price of the asset using the API.
         Handles both stock and crypto assets based on the asset_type.
+
+        Args:
+            fetcher (FetchData): Optional. Fetcher whose pooled session is used; a new one is created if omitted.
+        """
+        fetcher = fetcher or FetchData(self.api_key)
+        with tagged(ticker=self.ticker):
+            snapshot = fetcher.fetch_snapshot(self.ticker, self.asset_type)
+        if snapshot:
+            self.set_price(snapshot)
+
+    def set_price(self, snapshot, now=None):
+        """
+        Updates the current price, its timestamp and its staleness from a Polygon.io ticker snapshot.
+
+        Args:
+            snapshot (dict): The ticker's snapshot as returned by the snapshot endpoints.
+            now (pd.Timestamp): Optional. Naive UTC time the staleness is measured at. Defaults to the current time.
         """
-        url = ''
-        if self.asset_type == 'Stock':
-            url = f"https://api.polygon.io/v2/snapshot/locale/us/markets/stocks/tickers/{self.ticker}?apiKey={self.api_key}"
-        elif self.asset_type == 'Crypto':
-            url = f"https://api.polygon.io/v2/snapshot/locale/global/markets/crypto/tickers/{self.ticker}?apiKey={self.api_key}"
-        
-        response = requests.get(url)
-        if response.status_code == 200:
-            data = response.json()
-            if self.asset_type == 'Stock':
-                self.current_price = data['ticker']['min']['o']
-            elif self.asset_type == 'Crypto':
-                self.current_price = data['ticker']['min']['o']
+        minute = snapshot.get('min') or {}
+        last_trade = snapshot.get('lastTrade') or {}
+        if minute.get('o'):
+            self.current_price = minute['o']
+            timestamp = pd.to_datetime(minute['t'], unit='ms') if minute.get('t') else None
         else:
-            print(f"Failed to fetch current price for {self.ticker}: {response.text}")
+            # Outside of trading hours the minute bar may be empty; fall back to the last trade
+            self.current_price = last_trade.get('p', self.current_price)
+            timestamp = pd.to_datetime(last_trade['t'], unit='ns') if last_trade.get('t') else None
+        if timestamp is None and snapshot.get('updated'):
+            timestamp = pd.to_datetime(snapshot['updated'], unit='ns')
+
+        now = now if now is not None else pd.Timestamp.now(tz='UTC').tz_localize(None)
+        self.price_timestamp = timestamp
+        self.price_staleness = now - timestamp if timestamp is not None else None
 
     def evaluate_framework(self):
         """
@@ -57,14 +87,21 @@ class WatchlistItem:
         """
         if self.framework:
             print(f"Evaluating framework for {self.ticker}")
-            timeframe_statuses = self.framework.evaluate_all_timeframes()
-            overall_status = self.framework.determine_overall_status(self.framework.bias_timeframes, self.framework.confirmation_timeframes)
-            self.framework_results = {"timeframe_statuses": timeframe_statuses, "overall_status": overall_status}
-            print("Timeframe Statuses:", timeframe_statuses)
-            print("Overall Trading Status:", overall_status)
+            with tagged(ticker=self.ticker), timer('evaluate_framework'):
+                evaluation = self.framework.evaluate()
+                overall_status = self.framework.determine_overall_status(self.framework.bias_timeframes, self.framework.confirmation_timeframes)
+            self.set_evaluation(evaluation, overall_status)
         else:
             print(f"No framework assigned to {self.ticker}.")
 
+    def set_evaluation(self, evaluation, overall_status):
+        """Stores the result of a framework evaluation, which may have been computed in another process."""
+        self.evaluation = evaluation
+        timeframe_statuses = evaluation.to_dict()
+        self.framework_results = {"timeframe_statuses": timeframe_statuses, "overall_status": overall_status}
+        print("Timeframe Statuses:", timeframe_statuses)
+        print("Overall Trading Status:", overall_status)
+
     def perform_backtest(self, initial_capital=10000):
         """
         Performs backtesting on the asset using the associated framework and historical data.
@@ -75,13 +112,19 @@ class WatchlistItem:
         """
         if self.framework:
             print(f"Performing backtest for {self.ticker}")
-            self.backtest_results = self.framework.backtest(initial_capital=initial_capital)
-            self.backtest_pnl_percent = round(self.backtest_results.total_return() * 100, 2)
-            print(f"Backtest completed for {self.ticker}")
+            with tagged(ticker=self.ticker):
+                portfolio = self.framework.backtest(initial_capital=initial_capital)
+            self.set_backtest(portfolio)
         else:
             print(f"No framework assigned for backtesting {self.ticker}.")
             self.backtest_results = None
 
+    def set_backtest(self, portfolio):
+        """Stores the result of a backtest, which may have been computed in another process."""
+        self.backtest_results = portfolio
+        self.backtest_pnl_percent = round(self.backtest_results.total_return() * 100, 2)
+        print(f"Backtest completed for {self.ticker}")
+
     def __str__(self):
         return f"{self.name} ({self.ticker}) - {self.asset_type}: Current Price: {self.current_price}, Framework Overall Status: {self.framework_results['overall_status']}, Backtest P&L%: {self.backtest_pnl_percent}"
 
@@ -93,10 +136,14 @@ class Watchlist:
     Attributes:
         api_key (str): API key used for data fetching across all watchlist items.
         items (dict): Dictionary holding WatchlistItems, keyed by their ticker symbols.
+        fetcher (FetchData): Fetcher whose pooled session is used for price updates.
+        portfolio (vbt.Portfolio): Result of the last watchlist-level backtest (see `portfolio_backtest`). Default is None.
     """
-    def __init__(self, api_key):
+    def __init__(self, api_key, fetcher=None, base_url='https://api.polygon.io'):
         self.api_key = api_key
         self.items = {}  
+        self.fetcher = fetcher or FetchData(api_key, base_url=base_url)
+        self.portfolio = None
 
     def add_item(self, name, ticker, asset_type, framework=None):
         """
@@ -122,28 +169,244 @@ class Watchlist:
             print(f'Removing {ticker} from watchlist')
             del self.items[ticker]
 
-    def update_prices(self):
-        """Updates the current prices for all items in the watchlist."""
+    def update_prices(self, batch=True):
+        """
+        Updates the current prices for all items in the watchlist.
+
+        Args:
+            batch (bool): If True (default), items are grouped by asset type and updated with the multi-ticker
+                snapshot endpoints, falling back to concurrent single-ticker requests for tickers a batch
+                did not return. If False, every item is updated with its own request, one after another.
+        """
+        if not batch:
+            for ticker, item in self.items.items():
+                print(f'Updating price for {ticker}')
+                item.fetch_current_price(self.fetcher)
+            return
+
+        started = time.perf_counter()
+        first_request = len(self.fetcher.request_log)
+        tickers_by_type = {}
         for ticker, item in self.items.items():
-            print(f'Updating price for {ticker}')
-            item.fetch_current_price()
+            tickers_by_type.setdefault(item.asset_type, []).append(ticker)
 
-    def evaluate_frameworks(self):
-        """Evaluates the trading frameworks for all items in the watchlist."""
+        now = pd.Timestamp.now(tz='UTC').tz_localize(None)
+        updated = 0
+        with timer('update_prices') as span:
+            for asset_type, tickers in tickers_by_type.items():
+                snapshots = self.fetcher.fetch_snapshots(tickers, asset_type)
+                for ticker in tickers:
+                    if ticker in snapshots:
+                        self.items[ticker].set_price(snapshots[ticker], now=now)
+                        updated += 1
+                    else:
+                        print(f"Failed to fetch current price for {ticker}.")
+            span.add(rows=updated)
+
+        print(f"Updated prices for {updated} of {len(self.items)} items with "
+              f"{len(self.fetcher.request_log) - first_request} requests in {time.perf_counter() - started:.2f}s")
+
+    def prices(self):
+        """
+        Returns the current price of every item with its timestamp and staleness.
+
+        Returns:
+            pd.DataFrame: One row per ticker with the columns 'price', 'timestamp' and 'staleness'.
+        """
+        return pd.DataFrame({'price': [item.current_price for item in self.items.values()],
+                             'timestamp': [item.price_timestamp for item in self.items.values()],
+                             'staleness': [item.price_staleness for item in self.items.values()]},
+                            index=pd.Index(list(self.items), name='ticker'))
+
+    def evaluate_frameworks(self, workers=None):
+        """
+        Evaluates the trading frameworks for all items in the watchlist.
+
+        Args:
+            workers (int): Optional. If greater than 1, items are evaluated in parallel in a pool of this many
+                processes. A failing item is reported and does not stop the others.
+        """
         print("Evaluating frameworks for all watchlist items...")
-        for item in self.items.values():
-            item.evaluate_framework()
+        if not workers or workers <= 1:
+            for item in self.items.values():
+                item.evaluate_framework()
+            return
+
+        for item, result in self._run_in_processes(evaluate_framework_task, workers):
+            if isinstance(result, Exception):
+                print(f"Evaluating framework for {item.ticker} failed: {result!r}")
+            else:
+                print(f"Evaluated framework for {item.ticker}")
+                item.set_evaluation(*result)
 
-    def perform_backtests(self, initial_capital=10000):
+    def evaluation_results(self):
+        """
+        Combines the latest evaluations of all items into a single table of int8 status codes
+        (1 = positive, 0 = neutral, -1 = negative), one row per ticker and one column per
+        (timeframe, group, signal). Items that have not been evaluated are left out.
+        """
+        return EvaluationResult.concat({ticker: item.evaluation for ticker, item in self.items.items() if item.evaluation is not None})
+
+    def perform_backtests(self, initial_capital=10000, workers=None):
         """
         Initiates backtesting for all items in the watchlist using their associated frameworks.
 
         Args:
             initial_capital (float): The starting capital for the backtests. Default is 10,000.
+            workers (int): Optional. If greater than 1, items are backtested in parallel in a pool of this many
+                processes. A failing item is reported and does not stop the others.
         """
         print("Performing backtests for all watchlist items...")
+        if not workers or workers <= 1:
+            for item in self.items.values():
+                item.perform_backtest(initial_capital=initial_capital)
+            return
+
+        import vectorbt as bt
+        for item, result in self._run_in_processes(backtest_task, workers, initial_capital):
+            if isinstance(result, Exception):
+                print(f"Backtest for {item.ticker} failed: {result!r}")
+                item.backtest_results = None
+            else:
+                item.set_backtest(bt.Portfolio.loads(result))
+
+    def signal_panel(self, workers=None):
+        """
+        Aligns the close prices and entry/exit signals of every item's framework into wide arrays, one column per
+        ticker, on the union of all items' bars. Closes are forward-filled over bars an asset does not trade
+        (e.g. stock weekends in a panel with crypto) and missing signals are False.
+
+        Args:
+            workers (int): Optional. If greater than 1, the signals are computed in parallel in a pool of this many processes.
+
+        Returns:
+            tuple: (close, entries, exits) DataFrames indexed by timestamp with one column per ticker.
+        """
+        signals = {}
+        if not workers or workers <= 1:
+            for ticker, item in self.items.items():
+                if item.framework:
+                    signals[ticker] = item.framework.backtest_signals()
+                else:
+                    print(f"No framework assigned to {ticker}.")
+        else:
+            for item, result in self._run_in_processes(backtest_signals_task, workers):
+                if isinstance(result, Exception):
+                    print(f"Computing signals for {item.ticker} failed: {result!r}")
+                else:
+                    signals[item.ticker] = result
+
+        close = pd.DataFrame({ticker: result[0] for ticker, result in signals.items()}).sort_index().ffill()
+        entries = pd.DataFrame({ticker: result[1] for ticker, result in signals.items()}, index=close.index).fillna(False).astype(bool)
+        exits = pd.DataFrame({ticker: result[2] for ticker, result in signals.items()}, index=close.index).fillna(False).astype(bool)
+        return close, entries, exits
+
+    def portfolio_backtest(self, initial_capital=10000, allocation='equal', size=None, group_by=True, fees=0.0, freq=None, workers=None):
+        """
+        Backtests all items together as one portfolio, in a single vectorized `from_signals` run over the aligned
+        signals of `signal_panel`. The assets of a group draw on shared cash, and on bars with both exits and
+        entries the exits are executed first, so their proceeds fund the entries.
+
+        Args:
+            initial_capital (float): The starting capital of each group. Default is 10,000.
+            allocation (str or dict): How much each entry buys. 'equal' (default) invests `initial_capital / N` per
+                entry for the N assets of its group, 'percent' invests the fraction `size` of the cash available at
+                that bar, and a dict of weights by ticker invests `weight * initial_capital`. Entries are reduced to
+                the cash left.
+            size (float): Optional. The fraction of available cash used by 'percent' allocation. Defaults to 1 / N
+                for the N assets of the group.
+            group_by (bool or str): True (default) shares cash across all assets, 'asset_type' gives each asset
+                type its own group with its own capital, and False backtests every asset on its own.
+            fees (float): Fees per trade, as a fraction of the traded value.
+            freq (str): Optional. The bar frequency used for annualized stats, e.g. '1D'.
+            workers (int): Optional. If greater than 1, the signals are computed in parallel in a pool of this many processes.
+
+        Returns:
+            vbt.Portfolio: The portfolio, also stored in `portfolio`. See `asset_stats` for per-asset stats.
+        """
+        with timer('signal_panel'):
+            close, entries, exits = self.signal_panel(workers)
+        if close.empty:
+            print("No signals to backtest.")
+            return None
+
+        if group_by == 'asset_type':
+            # vectorbt needs the columns of a group to be adjacent
+            asset_types = pd.Series({ticker: self.items[ticker].asset_type for ticker in close.columns}).sort_values(kind='stable')
+            close, entries, exits = close[asset_types.index], entries[asset_types.index], exits[asset_types.index]
+            group_by = pd.Index(asset_types.to_numpy(), name='asset_type')
+
+        cash_sharing = group_by is not False and group_by is not None
+        # The number of assets in the group of each column, whose capital its entries share
+        if isinstance(group_by, pd.Index):
+            n_assets = group_by.map(group_by.value_counts()).to_numpy(dtype=float)
+        else:
+            n_assets = np.full(len(close.columns), len(close.columns) if cash_sharing else 1, dtype=float)
+        if isinstance(allocation, dict):
+            order_size, size_type = pd.Series(allocation).reindex(close.columns).fillna(0).to_numpy() * initial_capital, 'value'
+        elif allocation == 'percent':
+            order_size, size_type = size if size is not None else 1 / n_assets, 'percent'
+        else:
+            order_size, size_type = initial_capital / n_assets, 'value'
+
+        # vectorbt is imported on the first backtest, so processes that only evaluate never load it
+        import vectorbt as bt
+        with timer('portfolio_backtest') as span:
+            self.portfolio = bt.Portfolio.from_signals(close, entries, exits, init_cash=initial_capital, size=order_size, size_type=size_type,
+                                                       group_by=group_by if cash_sharing else None, cash_sharing=cash_sharing,
+                                                       call_seq='auto' if cash_sharing else None, fees=fees, freq=freq)
+            span.add(rows=close.size)
+        return self.portfolio
+
+    def asset_stats(self, portfolio=None):
+        """
+        Returns per-asset stats of a watchlist-level backtest.
+
+        Args:
+            portfolio (vbt.Portfolio): Optional. Defaults to the last `portfolio_backtest`.
+
+        Returns:
+            pd.DataFrame: One row per ticker with its number of trades, win rate, realized and open P&L, and its share of the total P&L.
+        """
+        portfolio = portfolio if portfolio is not None else self.portfolio
+        if portfolio is None:
+            print("No portfolio backtest to report on.")
+            return pd.DataFrame()
+
+        trades = portfolio.trades
+        pnl = trades.pnl.sum(group_by=False)
+        stats = pd.DataFrame({'trades': trades.count(group_by=False),
+                              'win_rate': trades.win_rate(group_by=False),
+                              'realized_pnl': trades.closed.pnl.sum(group_by=False),
+                              'open_pnl': trades.open.pnl.sum(group_by=False),
+                              'pnl': pnl})
+        stats['pnl_share'] = pnl / pnl.abs().sum() if pnl.abs().sum() else 0.0
+        return stats.rename_axis('ticker')
+
+    def memory_footprint(self):
+        """
+        Reports the memory held by the timeframe data of every item's framework.
+
+        Returns:
+            pd.DataFrame: One row per (ticker, timeframe) with its rows, columns, dtypes and bytes, see `TradingFramework.memory_footprint`.
+        """
+        footprints = {ticker: item.framework.memory_footprint() for ticker, item in self.items.items() if item.framework}
+        if not footprints:
+            return pd.DataFrame()
+        return pd.concat(footprints, names=['ticker'])
+
+    def _run_in_processes(self, task, workers, *args):
+        """Runs a worker task for every item with a framework and yields (item, result or exception) in watchlist order."""
+        items = []
         for item in self.items.values():
-            item.perform_backtest(initial_capital=initial_capital)
+            if item.framework:
+                items.append(item)
+            else:
+                print(f"No framework assigned to {item.ticker}.")
+
+        results = run_in_processes(items, task, workers, *args)
+        for item in items:
+            yield item, results[item.ticker]
 
     def show(self):
         for item in self.items.values():